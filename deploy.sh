@@ -31,16 +31,16 @@ npm run build
 cd ..
 
 # Create deployment archive
-echo -e "${YELLOW}📦 Creating deployment package...${NC}
+echo -e "${YELLOW}📦 Creating deployment package...${NC}"
 DEPLOY_ARCHIVE="deploy-$(date +%Y%m%d%H%M%S).tar.gz"
 tar --exclude='.git' --exclude='node_modules' --exclude='venv' --exclude='__pycache__' -czf "$DEPLOY_ARCHIVE" .
 
 # Upload to VPS
-echo -e "${YELLOW}📤 Uploading to VPS...${NC}
+echo -e "${YELLOW}📤 Uploading to VPS...${NC}"
 scp "$DEPLOY_ARCHIVE" "$VPS_USER@$VPS_IP:$REMOTE_DIR/"
 
 # Connect to VPS and deploy
-echo -e "${YELLOW}🚀 Deploying on VPS...${NC}
+echo -e "${YELLOW}🚀 Deploying on VPS...${NC}"
 ssh "$VPS_USER@$VPS_IP" << EOF
     set -e
     cd "$REMOTE_DIR"
@@ -51,10 +51,14 @@ ssh "$VPS_USER@$VPS_IP" << EOF
     
     echo "Setting up Docker..."
     docker-compose down || true
-    docker-compose up -d --build
+    docker-compose build
     
+    # Antes de levantar la API: el código nuevo depende de las tablas y columnas nuevas.
+    # Si una migración falla, set -e corta el despliegue aquí
     echo "Running database migrations..."
-    docker-compose exec backend alembic upgrade head || echo "No migrations to run"
+    docker-compose run --rm backend python migrar.py
+    
+    docker-compose up -d
     
     echo "Cleaning up..."
     docker system prune -f
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import {
   Container,
@@ -7,15 +7,26 @@ import {
   CircularProgress,
   Alert,
   Fade,
+  Button,
 } from '@mui/material';
 import { ProductCard } from '../components/ProductCard';
 import { ProductFilters } from '../components/ProductFilters';
 import { productService } from '../services/productService';
 import { Product, TipoProductoEnum } from '../types/Product';
 
+// Igual a las páginas que el backend precarga al arrancar
+const PAGE_SIZE = 100;
+
 export const Products: React.FC = () => {
   const [products, setProducts] = useState<Product[]>([]);
+  // Total del backend (no solo los cargados) y cursor de la página siguiente
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Descarta respuestas de filtros anteriores que lleguen tarde
+  const requestId = useRef(0);
   const [loading, setLoading] = useState(true);
+  const [initialLoad, setInitialLoad] = useState(true);
   const [error, setError] = useState<string | null>(null);
   
   // Estados de filtros
@@ -26,93 +37,81 @@ export const Products: React.FC = () => {
 
   const navigate = useNavigate();
 
-useEffect(() => {
-  const fetchProducts = async () => {
+  // Filtros, búsqueda y ordenamiento se resuelven en el backend
+  const fetchPage = useCallback(async (cursor: string | null, offset: number) => {
+    const [precioMin, precioMax] = priceRange ? priceRange.split('-').map(Number) : [];
+    const busqueda = searchTerm.trim();
+    const filtros = {
+      limit: PAGE_SIZE,
+      tipo_producto: (selectedCategory as TipoProductoEnum) || undefined,
+      precio_min: precioMin,
+      precio_max: precioMax,
+    };
+    // Con texto y orden por relevancia, los mejores resultados de la búsqueda primero (paginada por offset)
+    if (busqueda && sortBy === 'relevancia') {
+      const data = await productService.searchProducts(busqueda, { ...filtros, offset });
+      const productos = data.productos || [];
+      const masProductos = offset + productos.length < data.total;
+      return { productos, total: data.total, next: masProductos ? String(offset + productos.length) : null };
+    }
+    const data = await productService.getProducts({
+      ...filtros,
+      cursor: cursor || undefined,
+      search: busqueda || undefined,
+      orden: sortBy,
+    });
+    return { productos: data.productos || [], total: data.total, next: data.next_cursor || null };
+  }, [searchTerm, selectedCategory, sortBy, priceRange]);
+
+  useEffect(() => {
+    const fetchProducts = async () => {
+      const id = ++requestId.current;
+      try {
+        setLoading(true);
+        const pagina = await fetchPage(null, 0);
+        if (id !== requestId.current) return;
+        setProducts(pagina.productos);
+        setTotal(pagina.total ?? pagina.productos.length);
+        setNextCursor(pagina.next);
+      } catch (err) {
+        if (id !== requestId.current) return;
+        setError('Error al cargar productos. Verifique la conexión.');
+        console.error(err);
+      } finally {
+        if (id === requestId.current) {
+          setLoading(false);
+          setInitialLoad(false);
+        }
+      }
+    };
+
+    const timeout = setTimeout(fetchProducts, 300);
+    return () => clearTimeout(timeout);
+  }, [fetchPage]);
+
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    const id = requestId.current;
     try {
-      setLoading(true);
-      const data = await productService.getProducts({ limit: 100 });
-      
-    setProducts(data.productos || []);
-
+      setLoadingMore(true);
+      // En la búsqueda por relevancia el "cursor" es el offset siguiente
+      const pagina = await fetchPage(nextCursor, Number(nextCursor) || 0);
+      if (id !== requestId.current) return;
+      setProducts((anteriores) => [...anteriores, ...pagina.productos]);
+      setTotal(pagina.total ?? total);
+      setNextCursor(pagina.next);
     } catch (err) {
-      setError('Error al cargar productos. Verifique la conexión.');
       console.error(err);
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  fetchProducts();
-}, []);
-
-  // Función para filtrar y ordenar productos
-  const filteredProducts = useMemo(() => {
-    let filtered = [...products];
-
-    // Filtro por búsqueda
-    if (searchTerm) {
-      filtered = filtered.filter(product =>
-        product.nombre.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        (product.descripcion_producto?.toLowerCase().includes(searchTerm.toLowerCase()))
-      );
-    }
-
-    // Filtro por categoría
-    if (selectedCategory) {
-      filtered = filtered.filter(product => 
-        product.tipo_producto === selectedCategory
-      );
-    }
-
-    // Filtro por rango de precios
-    if (priceRange) {
-      const [min, max] = priceRange.split('-').map(Number);
-      filtered = filtered.filter(product => {
-        const precio = product.precio_descuento || product.precio_venta;
-        return precio >= min && precio <= max;
-      });
-    }
-
-    // Ordenamiento
-    switch (sortBy) {
-      case 'precio_asc':
-        filtered.sort((a, b) => {
-          const precioA = a.precio_descuento || a.precio_venta || 0;
-          const precioB = b.precio_descuento || b.precio_venta || 0;
-          return precioA - precioB;
-        });
-        break;
-      case 'precio_desc':
-        filtered.sort((a, b) => {
-          const precioA = a.precio_descuento || a.precio_venta || 0;
-          const precioB = b.precio_descuento || b.precio_venta || 0;
-          return precioB - precioA;
-        });
-        break;
-      case 'nombre_asc':
-        filtered.sort((a, b) => a.nombre.localeCompare(b.nombre));
-        break;
-      case 'visitas_desc':
-        filtered.sort((a, b) => (b.visitas || 0) - (a.visitas || 0));
-        break;
-      default:
-        // Relevancia - productos con descuento primero, luego por visitas
-        filtered.sort((a, b) => {
-          if (!!a.precio_descuento !== !!b.precio_descuento) {
-            return !!b.precio_descuento ? 1 : -1;
-          }
-          return (b.visitas || 0) - (a.visitas || 0);
-        });
-    }
-
-    return filtered;
-  }, [products, searchTerm, selectedCategory, sortBy, priceRange]);
-
   const handleViewDetails = (id: number) => {
     navigate(`/productos/${id}`);
   };
 
-  if (loading) {
+  if (loading && initialLoad) {
     return (
       <Container maxWidth="xl" sx={{ textAlign: 'center', py: 8 }}>
         <CircularProgress 
@@ -190,7 +189,7 @@ useEffect(() => {
             onSortChange={setSortBy}
             priceRange={priceRange}
             onPriceRangeChange={setPriceRange}
-            totalProducts={filteredProducts.length}
+            totalProducts={total}
           />
 
           {/* Productos usando flexbox */}
@@ -200,8 +199,8 @@ useEffect(() => {
             gap: 3, 
             justifyContent: 'center' 
           }}>
-            {filteredProducts.length > 0 ? (
-              filteredProducts.map((product, index) => (
+            {products.length > 0 ? (
+              products.map((product, index) => (
                 <Fade 
                   in={true} 
                   timeout={800 + index * 50}
@@ -232,6 +231,20 @@ useEffect(() => {
               </Box>
             )}
           </Box>
+
+          {/* Página siguiente */}
+          {nextCursor && products.length > 0 && (
+            <Box sx={{ textAlign: 'center', mt: 6, mb: 4 }}>
+              <Button
+                variant="outlined"
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                startIcon={loadingMore ? <CircularProgress size={18} /> : undefined}
+              >
+                {loadingMore ? 'Cargando...' : `Ver más productos (${products.length} de ${total})`}
+              </Button>
+            </Box>
+          )}
         </Box>
       </Fade>
     </Container>
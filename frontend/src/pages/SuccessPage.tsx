@@ -13,10 +13,22 @@ import CheckCircleIcon from '@mui/icons-material/CheckCircle';
 import HomeIcon from '@mui/icons-material/Home';
 import ReceiptIcon from '@mui/icons-material/Receipt';
 
+interface OrdenResumen {
+  numero_orden: string;
+  estado_pago: string;
+  unidades: number;
+  total: number;
+}
+
+// El pago puede tardar unos segundos en verse: consultar el resumen hasta que esté pagada
+const INTENTOS_RESUMEN = 10;
+const INTERVALO_RESUMEN_MS = 2000;
+
 export const SuccessPage: React.FC = () => {
   const [searchParams] = useSearchParams();
   const navigate = useNavigate();
   const [orden, setOrden] = useState('');
+  const [resumen, setResumen] = useState<OrdenResumen | null>(null);
 
   useEffect(() => {
     const ordenParam = searchParams.get('orden');
@@ -25,6 +37,42 @@ export const SuccessPage: React.FC = () => {
     }
   }, [searchParams]);
 
+  useEffect(() => {
+    if (!orden) return;
+    let cancelado = false;
+    let timer: ReturnType<typeof setTimeout>;
+
+    const consultar = async (intento: number) => {
+      try {
+        const res = await fetch(`${process.env.REACT_APP_API_URL}/ordenes/${orden}`);
+        if (res.ok) {
+          const data: OrdenResumen = await res.json();
+          if (cancelado) return;
+          setResumen(data);
+          if (data.estado_pago === 'pagada') return;
+        }
+      } catch (err) {
+        console.error(err);
+      }
+      if (!cancelado && intento + 1 < INTENTOS_RESUMEN) {
+        timer = setTimeout(() => consultar(intento + 1), INTERVALO_RESUMEN_MS);
+      }
+    };
+
+    consultar(0);
+    return () => {
+      cancelado = true;
+      clearTimeout(timer);
+    };
+  }, [orden]);
+
+  const formatPrice = (price: number) =>
+    new Intl.NumberFormat('es-CL', {
+      style: 'currency',
+      currency: 'CLP',
+      minimumFractionDigits: 0
+    }).format(price);
+
   return (
     <Container maxWidth="md" sx={{ py: 8, minHeight: '70vh' }}>
       <Paper elevation={3} sx={{ p: 4, textAlign: 'center' }}>
@@ -46,6 +94,11 @@ export const SuccessPage: React.FC = () => {
             <Typography variant="body1" gutterBottom>
               Número de orden: <strong>{orden}</strong>
             </Typography>
+            {resumen && (
+              <Typography variant="body1" gutterBottom>
+                {resumen.unidades} {resumen.unidades === 1 ? 'producto' : 'productos'} · Total: <strong>{formatPrice(resumen.total)}</strong>
+              </Typography>
+            )}
             <Typography variant="body2" color="text.secondary">
               Hemos enviado los detalles de tu compra a tu correo electrónico.
             </Typography>
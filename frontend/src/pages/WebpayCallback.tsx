@@ -16,23 +16,32 @@ import {
 } from '@mui/icons-material';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 
-interface Venta {
+interface LineaOrden {
   id: number;
-  numero_orden: string;
-  cliente_final: string;
   producto: string;
+  sku?: string;
   precio: number;
+  unidades: number;
+  subtotal: number;
+}
+
+interface OrdenResumen {
+  numero_orden: string;
+  cliente_final: string;
   estado: string;
   estado_pago: string;
   fecha_compra: string;
   codigo_autorizacion?: string;
+  unidades: number;
+  total: number;
+  items: LineaOrden[];
 }
 
 const WebpayCallback: React.FC = () => {
   const navigate = useNavigate();
   const [searchParams] = useSearchParams();
   const [loading, setLoading] = useState(true);
-  const [ventas, setVentas] = useState<Venta[]>([]);
+  const [orden, setOrden] = useState<OrdenResumen | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [infoPago, setInfoPago] = useState<{ codigo: string; monto: number } | null>(null);
 
@@ -77,11 +86,11 @@ const WebpayCallback: React.FC = () => {
         });
 
         // Obtener detalles de la orden
-        const ordenRes = await fetch(`${process.env.REACT_APP_API_URL}/ventas?numero_orden=${confirmData.numero_orden}`);
-        if (!ordenRes.ok) throw new Error('No se pudo obtener las órdenes asociadas');
+        const ordenRes = await fetch(`${process.env.REACT_APP_API_URL}/ordenes/${confirmData.numero_orden}`);
+        if (!ordenRes.ok) throw new Error('No se pudo obtener la orden');
 
-        const data = await ordenRes.json();
-        setVentas(data);
+        const data: OrdenResumen = await ordenRes.json();
+        setOrden(data);
       } catch (err) {
         console.error(err);
         setError('Error al procesar el pago. Si ya fue descontado, contáctanos.');
@@ -104,7 +113,7 @@ const WebpayCallback: React.FC = () => {
     );
   }
 
-  if (error || ventas.length === 0) {
+  if (error || !orden) {
     return (
       <Container maxWidth="sm" sx={{ py: 8 }}>
         <Paper sx={{ p: 6, textAlign: 'center' }}>
@@ -117,8 +126,8 @@ const WebpayCallback: React.FC = () => {
     );
   }
 
-  const numeroOrden = ventas[0].numero_orden;
-  const cliente = ventas[0].cliente_final;
+  const numeroOrden = orden.numero_orden;
+  const cliente = orden.cliente_final;
 
   return (
     <Container maxWidth="md" sx={{ py: 8 }}>
@@ -145,10 +154,11 @@ const WebpayCallback: React.FC = () => {
 
           <Divider sx={{ my: 2 }} />
 
-          {ventas.map((venta, idx) => (
-            <Box key={idx} sx={{ mb: 2 }}>
-              <Typography variant="body2">Producto: {venta.producto}</Typography>
-              <Typography variant="body2">Precio: {formatPrice(venta.precio)}</Typography>
+          {orden.items.map((item) => (
+            <Box key={item.id} sx={{ mb: 2 }}>
+              <Typography variant="body2">Producto: {item.producto}</Typography>
+              <Typography variant="body2">Cantidad: {item.unidades}</Typography>
+              <Typography variant="body2">Precio: {formatPrice(item.subtotal)}</Typography>
             </Box>
           ))}
         </Box>
@@ -2,12 +2,14 @@ import { api } from './api';
 import { Product, TipoProductoEnum } from '../types/Product';
 
 interface ProductFilters {
-  skip?: number;
+  cursor?: string;
+  offset?: number;
   limit?: number;
   tipo_producto?: TipoProductoEnum;
   precio_min?: number;
   precio_max?: number;
   search?: string;
+  orden?: string;
 }
 
 export const productService = {
@@ -15,20 +17,40 @@ export const productService = {
   getProducts: async (filters: ProductFilters = {}) => {
     const params = new URLSearchParams();
     
-    if (filters.skip) params.append('skip', filters.skip.toString());
+    if (filters.cursor) params.append('cursor', filters.cursor);
     if (filters.limit) params.append('limit', filters.limit.toString());
     if (filters.tipo_producto) params.append('tipo', filters.tipo_producto);
     if (filters.precio_min) params.append('precio_min', filters.precio_min.toString());
     if (filters.precio_max) params.append('precio_max', filters.precio_max.toString());
     if (filters.search) params.append('search', filters.search);
+    if (filters.orden) params.append('orden', filters.orden);
 
-    const response = await api.get(`/productos/?${params}`);
+    const response = await api.get(`/productos/pagina?${params}`);
     
     return {
-      productos: response.data,
-      total: response.data.length,
-      page: 1,
-      per_page: response.data.length
+      productos: response.data.productos,
+      total: response.data.total,
+      next_cursor: response.data.next_cursor,
+      per_page: response.data.productos.length
+    };
+  },
+
+  // Buscar por relevancia (plurales, tildes y errores de tipeo incluidos)
+  searchProducts: async (q: string, filters: ProductFilters = {}) => {
+    const params = new URLSearchParams({ q });
+
+    if (filters.limit) params.append('limit', filters.limit.toString());
+    if (filters.offset) params.append('offset', filters.offset.toString());
+    if (filters.tipo_producto) params.append('tipo', filters.tipo_producto);
+    if (filters.precio_min) params.append('precio_min', filters.precio_min.toString());
+    if (filters.precio_max) params.append('precio_max', filters.precio_max.toString());
+
+    const response = await api.get(`/productos/buscar?${params}`);
+
+    return {
+      productos: response.data.productos,
+      total: response.data.total,
+      per_page: response.data.productos.length
     };
   },
 
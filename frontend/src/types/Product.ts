@@ -5,6 +5,16 @@ export enum TipoProductoEnum {
   CAMAS = 'camas'
 }
 
+export interface ImagenProducto {
+  original: string;
+  miniatura: string;
+  mediana: string;
+  miniatura_webp?: string | null;
+  mediana_webp?: string | null;
+  ancho?: number | null;
+  alto?: number | null;
+}
+
 export interface Product {
   id: number;
   sku: string;
@@ -20,6 +30,8 @@ export interface Product {
   colores_hex?: string;
   visitas: number;
   imagenes: string[];
+  imagenes_webp?: string[];
+  imagenes_detalle?: ImagenProducto[] | null;
   created_at: string;
   updated_at?: string;
 }
@@ -27,6 +39,6 @@ export interface Product {
 export interface ProductResponse {
   productos: Product[];
   total: number;
-  page: number;
+  next_cursor?: string | null;
   per_page: number;
 }
\ No newline at end of file
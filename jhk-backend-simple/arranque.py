@@ -0,0 +1,107 @@
+import gc
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("jhk.arranque")
+
+
+class Arranque:
+    """Tiempos de cada fase del arranque de un worker: import, pools, caches, índice.
+
+    Se crea al importar este módulo (lo primero que importa main.py), así que
+    la fase `importar` incluye el import del SDK de Transbank, SQLAlchemy y el
+    resto de main. Una fase que falla se registra y el arranque sigue: el
+    calentamiento es una optimización, no una condición para atender.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.pid = os.getpid()
+        self.fases = {}
+        self.errores = []
+        # True en los workers que heredaron (fork) los datos precargados por el maestro
+        self.precargado = False
+        self.listo = False
+        self.total_ms = None
+
+    @contextmanager
+    def fase(self, nombre: str, **detalle):
+        inicio = time.perf_counter()
+        try:
+            yield detalle
+        except Exception:
+            self.errores.append(nombre)
+            log.exception("Error en fase de arranque", extra={"fase": nombre})
+        finally:
+            self.fases[nombre] = {"ms": round((time.perf_counter() - inicio) * 1000, 1), **detalle}
+
+    def marcar(self, nombre: str) -> None:
+        """Fase que va desde el inicio del proceso hasta ahora (p. ej. el import)"""
+        self.fases[nombre] = {"ms": round((time.perf_counter() - self.inicio) * 1000, 1)}
+
+    def terminar(self) -> None:
+        self.listo = True
+        self.total_ms = round((time.perf_counter() - self.inicio) * 1000, 1)
+        log.info("Worker listo", extra={
+            "pid": os.getpid(),
+            "total_ms": self.total_ms,
+            "precargado": self.precargado,
+            "fases": self.fases,
+        })
+
+    def despues_de_fork(self) -> None:
+        """En el worker recién creado: los datos vienen del maestro, los tiempos se miden de nuevo"""
+        self.precargado = True
+        self.pid = os.getpid()
+        self.inicio = time.perf_counter()
+        self.fases = {"precarga_maestro": self.fases}
+        self.errores = []
+        self.listo = False
+
+    def estado(self) -> dict:
+        return {
+            "pid": self.pid,
+            "listo": self.listo,
+            "precargado": self.precargado,
+            "total_ms": self.total_ms,
+            "fases": self.fases,
+            "errores": self.errores,
+        }
+
+
+def abrir_conexiones(engine, cantidad: int) -> int:
+    """Abrir `cantidad` conexiones a la vez y devolverlas al pool, que las mantiene abiertas"""
+    conexiones = []
+    try:
+        for _ in range(cantidad):
+            conexiones.append(engine.connect())
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+    return len(conexiones)
+
+
+async def abrir_conexiones_async(engine, cantidad: int) -> int:
+    conexiones = []
+    try:
+        for _ in range(cantidad):
+            conexiones.append(await engine.connect())
+    finally:
+        for conexion in conexiones:
+            await conexion.close()
+    return len(conexiones)
+
+
+def congelar_memoria() -> None:
+    """Antes del fork: sacar los objetos precargados del recolector de ciclos.
+
+    Si no, cada pasada del GC en un worker escribe en esos objetos y copia sus
+    páginas (se pierde el copy-on-write con el maestro).
+    """
+    gc.collect()
+    gc.freeze()
+
+
+arranque = Arranque()
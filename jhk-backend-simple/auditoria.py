@@ -0,0 +1,209 @@
+import collections
+import fcntl
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import SessionLocal, LogsWebpay
+
+log = logging.getLogger("jhk.auditoria")
+
+
+class AuditoriaWebpay:
+    """Registra eventos de Webpay en `logs_webpay` en lotes, desde un hilo aparte.
+
+    `registrar()` nunca bloquea ni toca archivos (se llama desde el event loop):
+    encola el evento en una cola acotada. Si la cola está llena, el evento pasa
+    a una lista de desborde del mismo tamaño que el hilo respalda en un archivo
+    JSONL; si esa también está llena se descarta y se cuenta. El respaldo (y lo
+    que quede si la base no responde al cerrar) se vuelve a insertar en el
+    siguiente lote exitoso.
+
+    Todos los workers comparten el archivo de respaldo: se escribe con `flock` y
+    quien lo reinserta primero lo renombra (con el lock tomado), así un worker
+    nunca borra eventos que otro agregó después de leerlo.
+    """
+
+    def __init__(self, max_pendientes: int = 10000, lote: int = 200, intervalo: float = 1.0,
+                 archivo_respaldo: str = "logs_webpay_pendientes.jsonl"):
+        self.lote = lote
+        self.intervalo = intervalo
+        self.archivo_respaldo = archivo_respaldo
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._desborde = collections.deque()
+        self._lock_respaldo = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.escritos = 0
+        self.respaldados = 0
+        self.errores = 0
+        self.descartados = 0
+
+    def registrar(self, tipo: str, mensaje: str, numero_orden: str = None, token: str = None) -> None:
+        evento = {
+            "numero_orden": numero_orden or None,
+            "token": token or None,
+            "tipo": tipo,
+            "mensaje": mensaje,
+            "created_at": datetime.now(),
+        }
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            if len(self._desborde) < self._cola.maxsize:
+                # Lo respalda el hilo: aquí no se hace I/O ni se toma el flock compartido
+                self._desborde.append(evento)
+                return
+            self.descartados += 1
+            if self.descartados % 1000 == 1:
+                log.warning("Auditoría saturada: eventos descartados", extra={"descartados": self.descartados})
+
+    def _respaldar_desborde(self) -> None:
+        eventos = []
+        while self._desborde:
+            eventos.append(self._desborde.popleft())
+        if eventos:
+            self._respaldar(eventos)
+
+    def _tomar(self, n: int) -> list:
+        if n <= 0:
+            # Lote lleno (la base no responde): no sacar más de la cola, que respalda al llenarse
+            return []
+        eventos = []
+        try:
+            espera = None if self._detener.is_set() else self.intervalo
+            eventos.append(self._cola.get(block=espera is not None, timeout=espera))
+            while len(eventos) < n:
+                eventos.append(self._cola.get_nowait())
+        except queue.Empty:
+            pass
+        return eventos
+
+    def _escribir(self, eventos: list) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(LogsWebpay), eventos)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.escritos += len(eventos)
+
+    def _abrir_respaldo(self):
+        """Archivo de respaldo abierto para agregar, con flock exclusivo"""
+        while True:
+            f = open(self.archivo_respaldo, "a", encoding="utf-8")
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.archivo_respaldo).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            # Otro worker lo renombró mientras esperábamos el lock: abrir el nuevo
+            f.close()
+
+    def _respaldar(self, eventos: list) -> None:
+        with self._lock_respaldo:
+            with self._abrir_respaldo() as f:
+                for evento in eventos:
+                    f.write(json.dumps({**evento, "created_at": evento["created_at"].isoformat()}) + "\n")
+            self.respaldados += len(eventos)
+
+    def _tomados(self) -> list:
+        """Respaldos ya renombrados para reinsertar (de este u otro worker, también de uno que murió)"""
+        return sorted(glob.glob(glob.escape(self.archivo_respaldo) + ".*"))
+
+    def _reinsertar_respaldo(self) -> None:
+        with self._lock_respaldo:
+            if os.path.exists(self.archivo_respaldo):
+                with self._abrir_respaldo():
+                    os.rename(self.archivo_respaldo, f"{self.archivo_respaldo}.{os.getpid()}.{time.time_ns()}")
+            for ruta in self._tomados():
+                self._reinsertar_archivo(ruta)
+
+    def _reinsertar_archivo(self, ruta: str) -> None:
+        try:
+            f = open(ruta, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Lo está reinsertando otro worker
+                return
+            if not os.path.exists(ruta):
+                # Otro worker lo terminó y borró antes de que tomáramos el lock
+                return
+            eventos = [json.loads(linea) for linea in f if linea.strip()]
+            for evento in eventos:
+                evento["created_at"] = datetime.fromisoformat(evento["created_at"])
+            if eventos:
+                self._escribir(eventos)
+            os.remove(ruta)
+        log.info("Eventos respaldados reinsertados", extra={"eventos": len(eventos)})
+
+    def _loop(self) -> None:
+        try:
+            self._reinsertar_respaldo()
+        except Exception:
+            log.exception("Error reinsertando eventos respaldados")
+
+        pendientes = []
+        while True:
+            try:
+                self._respaldar_desborde()
+            except Exception:
+                log.exception("Error respaldando eventos desbordados")
+            pendientes.extend(self._tomar(self.lote - len(pendientes)))
+            if pendientes:
+                try:
+                    self._escribir(pendientes)
+                    pendientes = []
+                    self._reinsertar_respaldo()
+                except Exception:
+                    self.errores += 1
+                    log.exception("Error escribiendo logs_webpay", extra={"eventos": len(pendientes)})
+                    if self._detener.is_set():
+                        # Cerrando sin base de datos: respaldar todo lo que quede
+                        self._respaldar(pendientes + self._tomar(self._cola.qsize()))
+                        self._respaldar_desborde()
+                        return
+                    self._detener.wait(self.intervalo)
+            elif self._detener.is_set():
+                self._respaldar_desborde()
+                return
+
+    def iniciar(self) -> None:
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="auditoria-webpay", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> None:
+        """Escribir lo que quede en la cola y detener el hilo"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def estado(self) -> dict:
+        return {
+            "pendientes": self._cola.qsize(),
+            "max_pendientes": self._cola.maxsize,
+            "escritos": self.escritos,
+            "respaldados": self.respaldados,
+            "desborde": len(self._desborde),
+            "descartados": self.descartados,
+            "errores": self.errores,
+            "respaldo_pendiente": os.path.exists(self.archivo_respaldo) or bool(self._tomados()),
+        }
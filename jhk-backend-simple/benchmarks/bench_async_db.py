@@ -0,0 +1,168 @@
+"""Benchmark: sesión sync vs sesión async dentro de endpoints `async def`.
+
+Compara el patrón anterior de los handlers de Webpay (Session bloqueante dentro
+de `async def`) con AsyncSession. Mientras corre la carga se mide la latencia de
+un endpoint trivial (/ping) para ver cuánto se bloquea el event loop.
+
+Uso:
+    python benchmarks/bench_async_db.py                     # SQLite local
+    python benchmarks/bench_async_db.py --url mysql+pymysql://root:@localhost:3306/bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from models import Base, TransaccionesWebpay
+
+
+def url_async(url: str) -> str:
+    if url.startswith("mysql+pymysql://"):
+        return url.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    raise ValueError(f"URL no soportada: {url}")
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    k = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+
+def crear_app(url: str, filas: int, concurrencia: int) -> FastAPI:
+    # Con Session sync dentro de `async def`, si el pool es menor que la
+    # concurrencia el event loop se bloquea esperando una conexión que solo
+    # otra corrutina (también bloqueada) puede devolver.
+    pool = {"pool_size": concurrencia, "max_overflow": 0}
+    engine = create_engine(url, **pool)
+    async_engine = create_async_engine(url_async(url), **({} if url.startswith("sqlite") else pool))
+    SyncSession = sessionmaker(bind=engine, autoflush=False)
+    AsyncSessionBench = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    Base.metadata.create_all(engine, tables=[TransaccionesWebpay.__table__])
+    with SyncSession() as db:
+        if db.query(TransaccionesWebpay).count() < filas:
+            db.query(TransaccionesWebpay).delete()
+            db.bulk_insert_mappings(TransaccionesWebpay, [
+                {"numero_orden": f"{i:09d}", "token": f"tok{i}", "monto": 1000, "estado": "iniciada"}
+                for i in range(filas)
+            ])
+            db.commit()
+
+    def get_sync():
+        with SyncSession() as db:
+            yield db
+
+    async def get_async():
+        async with AsyncSessionBench() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync/{i}")
+    async def con_sesion_sync(i: int, db: Session = Depends(get_sync)):
+        t = db.query(TransaccionesWebpay).filter(TransaccionesWebpay.token == f"tok{i % filas}").first()
+        return {"orden": t.numero_orden}
+
+    @app.get("/async/{i}")
+    async def con_sesion_async(i: int, db: AsyncSession = Depends(get_async)):
+        t = (await db.execute(
+            select(TransaccionesWebpay).where(TransaccionesWebpay.token == f"tok{i % filas}")
+        )).scalars().first()
+        return {"orden": t.numero_orden}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.state.engines = (engine, async_engine)
+    return app
+
+
+async def correr(app: FastAPI, ruta: str, total: int, concurrencia: int):
+    transporte = httpx.ASGITransport(app=app)
+    latencias, pings = [], []
+    siguiente = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+        async def trabajador():
+            for i in siguiente:
+                t0 = time.perf_counter()
+                r = await client.get(f"/{ruta}/{i}")
+                r.raise_for_status()
+                latencias.append(time.perf_counter() - t0)
+
+        async def sonda(fin: asyncio.Event):
+            while not fin.is_set():
+                t0 = time.perf_counter()
+                await client.get("/ping")
+                pings.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.005)
+
+        fin = asyncio.Event()
+        tarea_sonda = asyncio.create_task(sonda(fin))
+        t0 = time.perf_counter()
+        await asyncio.gather(*[trabajador() for _ in range(concurrencia)])
+        duracion = time.perf_counter() - t0
+        fin.set()
+        await tarea_sonda
+
+    ms = lambda x: round(x * 1000, 3)
+    return {
+        "modo": ruta,
+        "requests": total,
+        "concurrencia": concurrencia,
+        "rps": round(total / duracion, 1),
+        "p50_ms": ms(statistics.median(latencias)),
+        "p95_ms": ms(percentil(latencias, 95)),
+        "p99_ms": ms(percentil(latencias, 99)),
+        "ping_p95_ms": ms(percentil(pings, 95)),
+        "ping_max_ms": ms(max(pings) if pings else 0.0),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL SQLAlchemy sync (mysql+pymysql:// o sqlite:///)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'jhk_bench_async.db')}"
+    app = crear_app(url, args.filas, args.concurrencia)
+
+    resultados = []
+    for ruta in ("sync", "async"):
+        await correr(app, ruta, min(100, args.requests), args.concurrencia)  # calentamiento
+        resultados.append(await correr(app, ruta, args.requests, args.concurrencia))
+
+    engine, async_engine = app.state.engines
+    engine.dispose()
+    await async_engine.dispose()
+
+    salida = {"url": url.split("@")[-1], "resultados": resultados}
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
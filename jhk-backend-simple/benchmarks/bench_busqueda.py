@@ -0,0 +1,140 @@
+"""Benchmark: índice de búsqueda del catálogo con muchos SKUs.
+
+Arma el índice en memoria con productos sintéticos (100k por defecto) y mide
+la latencia de consultas típicas: una palabra, plural/tildes, prefijo mientras
+se escribe, error de tipeo, varias palabras y con filtros. También mide
+reindexar un producto (actualización incremental). Objetivo: p95 < 10 ms.
+
+Uso:
+    python benchmarks/bench_busqueda.py
+    python benchmarks/bench_busqueda.py --productos 20000 --repeticiones 200 --salida busqueda.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from busqueda import IndiceBusqueda
+
+TIPOS = ["sofas", "seccionales", "poltronas", "sitiales", "camas", "respaldos", "futones", "sillones"]
+NOMBRES = {
+    "sofas": "Sofá", "seccionales": "Seccional", "poltronas": "Poltrona", "sitiales": "Sitial",
+    "camas": "Cama", "respaldos": "Respaldo", "futones": "Futón", "sillones": "Sillón",
+}
+MODELOS = ["Milán", "Oslo", "Valdivia", "Chiloé", "Atacama", "Lyon", "Nórdico", "Bauhaus", "Toscana", "Ñuble",
+           "Berlín", "Lisboa", "Aysén", "Pucón", "Elqui", "Colchagua"]
+MATERIALES = ["Tela antimanchas", "Lino", "Chenille", "Cuero ecológico", "Felpa", "Bouclé", "Terciopelo"]
+COLORES = ["gris", "beige", "azul", "verde", "terracota", "negro", "mostaza", "rosado", "café"]
+FRASES = [
+    "estructura de madera nativa", "patas de acero", "espuma de alta densidad", "cojines desmontables",
+    "tapiz antimanchas", "resortes ensacados", "ideal para living", "respaldo reclinable", "brazos anchos",
+    "fácil de limpiar", "fabricado en Chile", "garantía de cinco años",
+]
+
+CONSULTAS = {
+    "una_palabra": ["sofa", "cama", "poltrona", "seccional", "respaldo"],
+    "plural_tildes": ["sofás", "sillones", "camas", "poltronas", "futón"],
+    "prefijo": ["sof", "sill", "secci", "polt", "terc"],
+    "error_tipeo": ["sfoa", "silon", "poltorna", "seccinal", "terciopleo"],
+    "varias_palabras": ["sofa gris lino", "cama madera nativa", "sillon cuero", "seccional chenille azul"],
+    "modelo": ["milan", "chiloe", "nuble", "sofa oslo"],
+}
+
+
+def producto_falso(i: int, rnd: random.Random):
+    tipo = rnd.choice(TIPOS)
+    return SimpleNamespace(
+        id=i,
+        sku=f"JHK-{i:06d}",
+        nombre=f"{NOMBRES[tipo]} {rnd.choice(MODELOS)} {rnd.choice(COLORES)}",
+        tipo_producto=tipo,
+        material=rnd.choice(MATERIALES),
+        descripcion_producto=". ".join(rnd.sample(FRASES, 4)) + f". Color {rnd.choice(COLORES)}.",
+        visitas=int(rnd.paretovariate(1.2) * 20),
+        precio_venta=float(rnd.randint(150, 2500) * 1000),
+        precio_descuento=None,
+        tipo_producto_venta="local",
+    )
+
+
+def medir(funciones, repeticiones: int):
+    """Percentiles de latencia por llamada, repitiendo cada función `repeticiones` veces"""
+    tiempos = []
+    for _ in range(repeticiones):
+        for funcion in funciones:
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    ms = lambda x: round(x * 1000, 3)
+    return {
+        "p50_ms": ms(tiempos[len(tiempos) // 2]),
+        "p95_ms": ms(tiempos[int(len(tiempos) * 0.95)]),
+        "p99_ms": ms(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=100, help="Repeticiones por consulta")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    productos = [producto_falso(i, rnd) for i in range(1, args.productos + 1)]
+
+    indice = IndiceBusqueda()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice.cargar(productos)
+    carga_s = time.perf_counter() - inicio
+    memoria_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+
+    resultados = {}
+    for grupo, consultas in CONSULTAS.items():
+        total = [indice.buscar(q)[1] for q in consultas]
+        assert all(total), (grupo, dict(zip(consultas, total)))
+        resultados[grupo] = {
+            **medir([lambda q=q: indice.buscar(q) for q in consultas], args.repeticiones),
+            "consultas": len(consultas),
+            "coincidencias_promedio": round(sum(total) / len(total)),
+        }
+
+    resultados["con_filtros"] = medir(
+        [lambda: indice.buscar("sofa", tipo="sofas", precio_min=300000, precio_max=900000)], args.repeticiones
+    )
+    resultados["pagina_5"] = medir([lambda: indice.buscar("sofa", limite=24, offset=96)], args.repeticiones)
+
+    reindexar = [rnd.choice(productos) for _ in range(args.repeticiones)]
+    for producto in reindexar:
+        producto.visitas += 1
+    iterador = iter(reindexar)
+    resultados["reindexar_producto"] = medir([lambda: indice.actualizar(next(iterador))], args.repeticiones)
+
+    p95_max = max(r["p95_ms"] for nombre, r in resultados.items() if nombre != "reindexar_producto")
+    salida = {
+        "productos": args.productos,
+        "indice": indice.estado(),
+        "carga_s": round(carga_s, 2),
+        "memoria_mb": round(memoria_mb, 1),
+        "consultas": resultados,
+        "p95_max_ms": p95_max,
+        "objetivo_ms": 10,
+        "ok": p95_max < 10,
+    }
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""Prueba de carga reproducible de la API: catálogo, checkout y pago.
+
+Siembra una base (SQLite local por defecto, o MariaDB/MySQL con --url) con un
+catálogo y un historial de órdenes realistas, reemplaza Transbank por un falso
+con latencia configurable y ejecuta, uno tras otro, estos escenarios con N
+clientes concurrentes durante un tiempo fijo:
+
+- listado:  GET /productos/pagina con filtros/orden al azar, y a veces la página siguiente;
+- detalle:  GET /productos/{id}, con productos populares más pedidos que el resto;
+- checkout: POST /ventas/multiple de 1 a 3 productos;
+- pago:     checkout + POST /webpay/iniciar + POST /webpay/confirmar + GET /ordenes/{n}.
+
+Reporta requests por segundo y latencias p50/p95/p99 por paso, y guarda un JSON
+(con el commit actual) que se puede comparar contra el de otro commit.
+
+Por defecto la app corre en el mismo proceso (httpx.ASGITransport), sin red.
+Con --base-url se mide un servidor ya levantado: ese servidor debe usar la misma
+base (--url) y el Transbank falso (WEBPAY_FAKE_URL, ver fake_transbank.py).
+
+MariaDB en docker (la base se recrea: usar una dedicada):
+    docker run -d --name jhk-bench -e MARIADB_ALLOW_EMPTY_ROOT_PASSWORD=1 \\
+        -e MARIADB_DATABASE=bench -p 3307:3306 mariadb:10.11
+
+Uso:
+    python benchmarks/bench_carga.py --salida base.json
+    python benchmarks/bench_carga.py --salida nuevo.json --comparar base.json
+    python benchmarks/bench_carga.py --url mysql+pymysql://root:@127.0.0.1:3307/bench --concurrencia 32
+    python benchmarks/bench_carga.py --escenarios detalle,pago --duracion 20 --latencia-webpay-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import models
+
+ESCENARIOS = ("listado", "detalle", "checkout", "pago")
+
+TIPOS = ["sofas", "seccionales", "poltronas", "sitiales", "camas", "respaldos", "futones"]
+MODELOS = ["Milán", "Oslo", "Valdivia", "Chiloé", "Atacama", "Lyon", "Nórdico", "Bauhaus", "Toscana", "Ñuble"]
+MATERIALES = ["Tela antimanchas", "Lino", "Chenille", "Cuero ecológico", "Felpa", "Bouclé"]
+PLAZOS = ["5 días hábiles", "7-10 días hábiles", "2 semanas", "15 días", None]
+REGIONES = [
+    ("Metropolitana", ["Santiago", "Providencia", "Ñuñoa", "Maipú", "La Florida", "Las Condes"]),
+    ("Valparaíso", ["Viña del Mar", "Valparaíso", "Quilpué"]),
+    ("Biobío", ["Concepción", "Talcahuano"]),
+    ("Los Lagos", ["Puerto Montt", "Castro"]),
+]
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    k = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+
+def url_async(url: str) -> str:
+    for sync, asinc in (("sqlite://", "sqlite+aiosqlite://"), ("+pymysql", "+aiomysql")):
+        if url.startswith(sync) or sync in url:
+            return url.replace(sync, asinc, 1)
+    raise SystemExit(f"No sé derivar la URL async de {url} (usar sqlite:// o mysql+pymysql://)")
+
+
+def crear_engines(url: str):
+    if url.startswith("sqlite"):
+        opciones = {"connect_args": {"timeout": 30}}
+        return create_engine(url, **opciones), create_async_engine(url_async(url), **opciones)
+    return (
+        create_engine(url, poolclass=models.QueuePoolMedido, **models.OPCIONES_POOL),
+        create_async_engine(url_async(url), poolclass=models.AsyncQueuePoolMedido, **models.OPCIONES_POOL),
+    )
+
+
+def sembrar(engine, productos: int, ordenes: int, rnd: random.Random) -> None:
+    """Recrear las tablas y cargar catálogo, imágenes y órdenes históricas"""
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            # WAL: lecturas del catálogo sin bloquearse con los checkouts
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+
+    filas_productos, filas_imagenes = [], []
+    for i in range(1, productos + 1):
+        tipo = rnd.choice(TIPOS)
+        precio = rnd.randint(150, 2500) * 1000 - 10
+        cantidad_imagenes = rnd.randint(1, 6)
+        archivos = [f"{tipo}/{i}_{n}.jpg" for n in range(1, cantidad_imagenes + 1)]
+        filas_productos.append({
+            "id": i,
+            "sku": f"JHK-{i:05d}",
+            "nombre": f"{tipo[:-1].capitalize()} {rnd.choice(MODELOS)} {i}",
+            "precio_venta": float(precio),
+            "precio_descuento": float(precio * 0.85 // 10 * 10) if rnd.random() < 0.3 else None,
+            "tipo_producto": tipo,
+            "tipo_producto_venta": "local" if rnd.random() < 0.9 else "web",
+            "descripcion_producto": "Estructura de madera nativa, espuma de alta densidad y patas de acero. " * 3,
+            # Pocos productos concentran la mayoría de las visitas
+            "visitas": int(rnd.paretovariate(1.2) * 20),
+            "dimensiones": f"{rnd.randint(80, 320)} x {rnd.randint(70, 180)} x {rnd.randint(70, 100)} cm",
+            "material": rnd.choice(MATERIALES),
+            "tiempo_entrega": rnd.choice(PLAZOS),
+            # Algunos con control de stock (holgado, para que el checkout no dé 409)
+            "stock": 1_000_000 if rnd.random() < 0.3 else None,
+            "stock_reservado": 0,
+            **{f"img_{n}": archivo for n, archivo in enumerate(archivos, 1)},
+        })
+        procesadas = rnd.random() < 0.8
+        for posicion, archivo in enumerate(archivos, 1):
+            base = archivo.rsplit(".", 1)[0]
+            filas_imagenes.append({
+                "producto_id": i, "posicion": posicion, "archivo": archivo, "ancho": 1600, "alto": 1200,
+                "miniatura": f"miniatura/{base}.jpg" if procesadas else None,
+                "mediana": f"mediana/{base}.jpg" if procesadas else None,
+                "miniatura_webp": f"miniatura/{base}.webp" if procesadas else None,
+                "mediana_webp": f"mediana/{base}.webp" if procesadas else None,
+            })
+
+    filas_ventas, filas_transacciones = [], []
+    ahora = datetime.now()
+    for n in range(ordenes):
+        numero_orden = f"B{n:09d}"
+        region, comunas = rnd.choice(REGIONES)
+        fecha_compra = ahora - timedelta(minutes=rnd.randint(0, 365 * 24 * 60))
+        pagada = rnd.random() < 0.85
+        monto = 0
+        for producto in rnd.sample(filas_productos, k=rnd.choice((1, 1, 1, 2, 2, 3))):
+            unidades = rnd.choice((1, 1, 1, 2))
+            precio = producto["precio_descuento"] or producto["precio_venta"]
+            monto += precio * unidades
+            filas_ventas.append({
+                "cliente_id": 9, "numero_orden": numero_orden, "cliente_final": f"Cliente {n}",
+                "rut_documento": "11111111-1", "email": f"cliente{n}@example.com", "telefono": "+56900000000",
+                "fecha_compra": fecha_compra, "fecha_entrega": fecha_compra + timedelta(days=7),
+                "producto": producto["nombre"], "precio": precio, "comuna": rnd.choice(comunas),
+                "direccion": "Calle Falsa 123", "region": region, "sku": producto["sku"], "unidades": unidades,
+                "metodo_pago": "webpay", "estado": "nueva",
+                "estado_pago": "pagada" if pagada else "pendiente",
+                "fecha_pago": fecha_compra + timedelta(minutes=5) if pagada else None,
+                "codigo_autorizacion": f"AUTH{n % 900000 + 100000}" if pagada else None,
+            })
+        filas_transacciones.append({
+            "numero_orden": numero_orden, "token": f"bench{n:09d}", "monto": int(monto),
+            "estado": "completada" if pagada else rnd.choice(("iniciada", "fallida")),
+            "authorization_code": f"AUTH{n % 900000 + 100000}" if pagada else None,
+        })
+
+    with engine.begin() as conn:
+        for tabla, filas in (
+            (models.Producto, filas_productos),
+            (models.ProductoImagen, filas_imagenes),
+            (models.VentaRetail, filas_ventas),
+            (models.TransaccionesWebpay, filas_transacciones),
+        ):
+            for inicio in range(0, len(filas), 2000):
+                conn.execute(insert(tabla), filas[inicio:inicio + 2000])
+
+
+def leer_catalogo(engine):
+    """(id, precio) de los productos a la venta, ordenados por visitas"""
+    with engine.connect() as conn:
+        return [tuple(fila) for fila in conn.execute(text(
+            "SELECT id, COALESCE(NULLIF(precio_descuento, 0), precio_venta) FROM productos "
+            "WHERE tipo_producto_venta = 'local' ORDER BY visitas DESC, id"
+        ))]
+
+
+class TransbankFalso:
+    """Reemplaza al SDK dentro del proceso: responde después de `latencia` segundos"""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+
+    def create(self, buy_order, session_id, amount, return_url):
+        time.sleep(self.latencia)
+        return {"token": uuid.uuid4().hex, "url": f"http://bench/webpay/formulario?orden={buy_order}"}
+
+
+class Registro:
+    """Latencias y códigos de respuesta por paso de un escenario"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.codigos = defaultdict(Counter)
+
+    async def medir(self, paso: str, peticion, esperado=(200, 304)):
+        t0 = time.perf_counter()
+        try:
+            respuesta = await peticion
+        except httpx.HTTPError as e:
+            self.codigos[paso][type(e).__name__] += 1
+            return None
+        self.latencias[paso].append(time.perf_counter() - t0)
+        self.codigos[paso][respuesta.status_code] += 1
+        return respuesta if respuesta.status_code in esperado else None
+
+    def resumen(self, duracion: float) -> dict:
+        ms = lambda x: round(x * 1000, 2)
+        pasos = {}
+        for paso, latencias in self.latencias.items():
+            errores = sum(n for codigo, n in self.codigos[paso].items() if codigo not in (200, 304))
+            pasos[paso] = {
+                "requests": len(latencias),
+                "errores": errores,
+                "rps": round(len(latencias) / duracion, 1),
+                "p50_ms": ms(statistics.median(latencias)),
+                "p95_ms": ms(percentil(latencias, 95)),
+                "p99_ms": ms(percentil(latencias, 99)),
+                "max_ms": ms(max(latencias)),
+                "codigos": {str(codigo): n for codigo, n in sorted(self.codigos[paso].items(), key=str)},
+            }
+        return pasos
+
+
+class Cliente:
+    """Estado compartido por los trabajadores: catálogo sembrado y generador al azar"""
+
+    def __init__(self, http: httpx.AsyncClient, catalogo, semilla: int):
+        self.http = http
+        self.catalogo = catalogo
+        self.precios = dict(catalogo)
+        self.rnd = random.Random(semilla)
+        # Popularidad tipo Zipf sobre el orden por visitas
+        self.acumulados = list(accumulate(1 / (rango + 1) for rango in range(len(catalogo))))
+
+    def producto_popular(self) -> int:
+        return self.rnd.choices(self.catalogo, cum_weights=self.acumulados)[0][0]
+
+    def carrito(self):
+        return [
+            {"producto_id": self.producto_popular(), "cantidad": self.rnd.choice((1, 1, 2))}
+            for _ in range(self.rnd.choice((1, 1, 2, 3)))
+        ]
+
+    def comprador(self, productos):
+        region, comunas = self.rnd.choice(REGIONES)
+        return {
+            "cliente_final": "Cliente Bench", "rut_documento": "11111111-1", "email": "bench@example.com",
+            "telefono": "+56900000000", "region": region, "comuna": self.rnd.choice(comunas),
+            "direccion": "Calle Falsa 123", "productos": productos,
+        }
+
+
+async def listado(c: Cliente, registro: Registro):
+    params = {"limit": c.rnd.choice((24, 24, 48))}
+    if c.rnd.random() < 0.6:
+        params["tipo"] = c.rnd.choice(TIPOS)
+    if c.rnd.random() < 0.5:
+        params["orden"] = c.rnd.choice(("relevancia", "precio_asc", "precio_desc", "visitas_desc"))
+    if c.rnd.random() < 0.15:
+        params["search"] = c.rnd.choice(MODELOS)
+    respuesta = await registro.medir("listado", c.http.get("/productos/pagina", params=params))
+    if respuesta is not None and c.rnd.random() < 0.3:
+        cursor = respuesta.json().get("next_cursor")
+        if cursor:
+            await registro.medir("listado_siguiente", c.http.get("/productos/pagina", params={**params, "cursor": cursor}))
+
+
+async def detalle(c: Cliente, registro: Registro):
+    await registro.medir("detalle", c.http.get(f"/productos/{c.producto_popular()}"))
+
+
+async def checkout(c: Cliente, registro: Registro):
+    productos = c.carrito()
+    respuesta = await registro.medir("checkout", c.http.post("/ventas/multiple", json=c.comprador(productos)))
+    if respuesta is None:
+        return None
+    monto = sum(c.precios[p["producto_id"]] * p["cantidad"] for p in productos)
+    return respuesta.json()["numero_orden"], int(monto)
+
+
+async def pago(c: Cliente, registro: Registro):
+    t0 = time.perf_counter()
+    orden = await checkout(c, registro)
+    if orden is None:
+        return
+    numero_orden, monto = orden
+    respuesta = await registro.medir(
+        "webpay_iniciar", c.http.post("/webpay/iniciar", json={"numero_orden": numero_orden, "monto": monto})
+    )
+    if respuesta is None:
+        return
+    token = respuesta.json()["token"]
+    if await registro.medir("webpay_confirmar", c.http.post("/webpay/confirmar", params={"token": token})) is None:
+        return
+    respuesta = await registro.medir("orden", c.http.get(f"/ordenes/{numero_orden}"))
+    if respuesta is not None:
+        if respuesta.json()["estado_pago"] != "pagada":
+            registro.codigos["orden"]["no_pagada"] += 1
+        registro.latencias["flujo_completo"].append(time.perf_counter() - t0)
+        registro.codigos["flujo_completo"][200] += 1
+
+
+async def correr_escenario(c: Cliente, escenario, concurrencia: int, duracion: float, calentamiento: float):
+    async def trabajador(registro: Registro, fin: float):
+        while time.perf_counter() < fin:
+            await escenario(c, registro)
+
+    if calentamiento > 0:
+        fin = time.perf_counter() + calentamiento
+        await asyncio.gather(*[trabajador(Registro(), fin) for _ in range(concurrencia)])
+
+    registro = Registro()
+    inicio = time.perf_counter()
+    await asyncio.gather(*[trabajador(registro, inicio + duracion) for _ in range(concurrencia)])
+    return registro.resumen(time.perf_counter() - inicio)
+
+
+def commit_actual() -> dict:
+    raiz = os.path.join(os.path.dirname(__file__), "..")
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=raiz,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        cambios = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=raiz,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "modificado": None}
+    return {"commit": commit, "modificado": bool(cambios)}
+
+
+def comparar(base: dict, actual: dict) -> list:
+    """Diferencias de rps y p95/p99 por escenario y paso (en %, positivo = más)"""
+    delta = lambda a, b: round((b - a) / a * 100, 1) if a else None
+    filas = []
+    for escenario, pasos in actual["escenarios"].items():
+        for paso, medicion in pasos.items():
+            anterior = base.get("escenarios", {}).get(escenario, {}).get(paso)
+            if anterior is None:
+                continue
+            filas.append({
+                "escenario": escenario,
+                "paso": paso,
+                "rps": [anterior["rps"], medicion["rps"], delta(anterior["rps"], medicion["rps"])],
+                "p95_ms": [anterior["p95_ms"], medicion["p95_ms"], delta(anterior["p95_ms"], medicion["p95_ms"])],
+                "p99_ms": [anterior["p99_ms"], medicion["p99_ms"], delta(anterior["p99_ms"], medicion["p99_ms"])],
+            })
+    return filas
+
+
+def imprimir_comparacion(filas: list, base: dict, actual: dict) -> None:
+    print(f"\nComparación {base.get('commit')} -> {actual.get('commit')}  (rps / p95 / p99, cambio %)", file=sys.stderr)
+    for f in filas:
+        texto = "  ".join(f"{nombre} {a} -> {b} ({d:+}%)" if d is not None else f"{nombre} {a} -> {b}"
+                          for nombre, (a, b, d) in (("rps", f["rps"]), ("p95", f["p95_ms"]), ("p99", f["p99_ms"])))
+        print(f"  {f['escenario']:>9} {f['paso']:<18} {texto}", file=sys.stderr)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL SQLAlchemy sync de una base dedicada (por defecto SQLite en /tmp)")
+    parser.add_argument("--base-url", help="Medir un servidor ya levantado en vez de la app en proceso")
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--ordenes", type=int, default=20000, help="Órdenes históricas sembradas")
+    parser.add_argument("--sin-sembrar", action="store_true", help="Reusar la base ya sembrada")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos medidos por escenario")
+    parser.add_argument("--calentamiento", type=float, default=2, help="Segundos previos sin medir")
+    parser.add_argument("--latencia-webpay-ms", type=float, default=0, help="Latencia del Transbank falso en proceso")
+    parser.add_argument("--sin-cache", action="store_true", help="Desactivar los caches en memoria del catálogo")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'jhk_bench_carga.db')}"
+    engine, async_engine = crear_engines(url)
+    if not args.sin_sembrar:
+        t0 = time.perf_counter()
+        sembrar(engine, args.productos, args.ordenes, random.Random(args.semilla))
+        print(f"Base sembrada en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    catalogo = leer_catalogo(engine)
+
+    app = None
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+    else:
+        # La app se importa después de apuntar los engines a la base del benchmark
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("AUDITORIA_RESPALDO", os.path.join(tempfile.gettempdir(), "jhk_bench_auditoria.jsonl"))
+        if args.sin_cache:
+            os.environ["CATALOGO_CACHE_TTL"] = "0"
+            os.environ["ORDEN_CACHE_TTL"] = "0"
+        models.engine, models.async_engine = engine, async_engine
+        models.SessionLocal.configure(bind=engine)
+        # Sin réplica en el benchmark: las lecturas van a la misma base
+        models.ReplicaSessionLocal.configure(bind=engine)
+        models.AsyncSessionLocal.configure(bind=async_engine)
+        import main as api
+
+        api.cliente_transbank.transaction = TransbankFalso(args.latencia_webpay_ms / 1000)
+        app = api.app
+        await app.router.startup()
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    resultados = {}
+    try:
+        async with http:
+            cliente = Cliente(http, catalogo, args.semilla)
+            for nombre in escenarios:
+                print(f"Escenario {nombre}: {args.concurrencia} clientes x {args.duracion}s", file=sys.stderr)
+                resultados[nombre] = await correr_escenario(
+                    cliente, globals()[nombre], args.concurrencia, args.duracion, args.calentamiento
+                )
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+        await async_engine.dispose()
+        engine.dispose()
+
+    salida = {
+        **commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "base": engine.dialect.name,
+        "modo": "http" if args.base_url else "en_proceso",
+        "parametros": {
+            "sembrado": not args.sin_sembrar, "productos": args.productos, "ordenes": args.ordenes,
+            "productos_a_la_venta": len(catalogo), "concurrencia": args.concurrencia,
+            "duracion": args.duracion, "latencia_webpay_ms": args.latencia_webpay_ms,
+            "sin_cache": args.sin_cache, "semilla": args.semilla,
+        },
+        "escenarios": resultados,
+    }
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        salida["comparacion"] = {"contra": base.get("commit"), "pasos": comparar(base, salida)}
+        imprimir_comparacion(salida["comparacion"]["pasos"], base, salida)
+
+    print(json.dumps(salida, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Microbenchmark: cálculo de fecha de entrega con bucle día a día vs calendario precalculado.
+
+El bucle es el `calcular_fecha_entrega` anterior, extendido para saltar también
+feriados (que es lo que tendría que hacer para ser correcto). Además verifica
+que ambos den la misma fecha para todas las compras probadas.
+
+Uso:
+    python benchmarks/bench_fecha_entrega.py
+    python benchmarks/bench_fecha_entrega.py --iteraciones 200000 --dias 10 --salida bench.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from entregas import CalendarioEntregas, feriados_chile
+
+
+def fecha_entrega_bucle(fecha_compra: datetime, dias: int, feriados) -> datetime:
+    dias_agregados = 0
+    fecha_actual = fecha_compra
+    while dias_agregados < dias:
+        fecha_actual += timedelta(days=1)
+        if fecha_actual.weekday() < 5 and fecha_actual.date() not in feriados:
+            dias_agregados += 1
+    return fecha_actual
+
+
+def medir(funcion, compras) -> float:
+    inicio = time.perf_counter()
+    for fecha in compras:
+        funcion(fecha)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteraciones", type=int, default=100000)
+    parser.add_argument("--dias", type=int, default=3, help="Días hábiles de plazo")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    ahora = datetime.now()
+    compras = [ahora + timedelta(minutes=random.randint(0, 60 * 24 * 365)) for _ in range(args.iteraciones)]
+
+    inicio = time.perf_counter()
+    calendario = CalendarioEntregas()
+    construccion = time.perf_counter() - inicio
+
+    feriados = {}
+    for anio in range(ahora.year - 1, ahora.year + 3):
+        feriados.update(feriados_chile(anio))
+
+    for fecha in compras[:1000]:
+        esperado = fecha_entrega_bucle(fecha, args.dias, feriados)
+        obtenido = datetime.combine(calendario.sumar_dias_habiles(fecha.date(), args.dias), fecha.time())
+        assert esperado == obtenido, (fecha, esperado, obtenido)
+
+    t_bucle = medir(lambda f: fecha_entrega_bucle(f, args.dias, feriados), compras)
+    t_calendario = medir(lambda f: datetime.combine(calendario.sumar_dias_habiles(f.date(), args.dias), f.time()), compras)
+
+    salida = {
+        "iteraciones": args.iteraciones,
+        "dias_habiles": args.dias,
+        "construccion_calendario_ms": round(construccion * 1000, 3),
+        "bucle_us_por_llamada": round(t_bucle / args.iteraciones * 1e6, 3),
+        "calendario_us_por_llamada": round(t_calendario / args.iteraciones * 1e6, 3),
+        "aceleracion": round(t_bucle / t_calendario, 2),
+    }
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
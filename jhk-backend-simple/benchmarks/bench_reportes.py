@@ -0,0 +1,152 @@
+"""Benchmark: reporte de ventas recorriendo ventas_retail vs sobre ventas_diarias.
+
+Genera ventas sintéticas de `--dias` días, las suma a ventas_diarias con las
+mismas funciones que usan los endpoints (registrar_ventas y mover_estado_pago
+para las pagadas) y mide el reporte de 30 días por día y por SKU con ambos
+métodos. Verifica que los totales coincidan y que `reconstruir` dé lo mismo
+que las sumas incrementales.
+
+Uso:
+    python benchmarks/bench_reportes.py                     # SQLite temporal
+    python benchmarks/bench_reportes.py --ventas 500000 --url mysql+pymysql://root:@localhost:3306/bench
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, func, insert, select, update
+
+from models import Base, SessionLocal, VentaDiaria, VentaRetail
+from reportes import consultar, mover_estado_pago, reconstruir, registrar_ventas
+
+REGIONES = {"RM": ["Santiago", "Ñuñoa", "Maipú", "Providencia", "La Florida"], "V": ["Valparaíso", "Viña del Mar"]}
+
+
+def generar(ventas: int, dias: int, skus: int, lote: int = 1000) -> None:
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    with SessionLocal() as db:
+        for inicio in range(0, ventas, lote):
+            filas = []
+            for i in range(inicio, min(inicio + lote, ventas)):
+                region = random.choice(list(REGIONES))
+                filas.append({
+                    "numero_orden": f"B{i}",
+                    "fecha_compra": hoy - timedelta(days=random.randrange(dias), minutes=random.randrange(1440)),
+                    # Las columnas de la orden también, para que las filas pesen como las reales
+                    "cliente_final": f"Cliente de prueba {i}",
+                    "rut_documento": f"{random.randrange(5_000_000, 25_000_000)}-{random.randrange(10)}",
+                    "email": f"cliente{i}@correo.cl",
+                    "telefono": f"+569{random.randrange(10 ** 8):08d}",
+                    "direccion": f"Avenida de prueba {random.randrange(9999)}, departamento {random.randrange(999)}",
+                    "producto": f"Sofá seccional modelo {random.randrange(skus)} tela gris",
+                    "sku": f"SKU{random.randrange(skus)}",
+                    "precio": float(random.randrange(50, 900) * 1000),
+                    "unidades": random.randint(1, 3),
+                    "region": region,
+                    "comuna": random.choice(REGIONES[region]),
+                    "estado": "nueva",
+                    "estado_pago": "pendiente",
+                })
+            db.execute(insert(VentaRetail), filas)
+            registrar_ventas(db, filas)
+            # Dos de cada tres órdenes se pagan
+            pagadas = [fila for i, fila in enumerate(filas) if i % 3]
+            mover_estado_pago(db, [SimpleNamespace(**fila) for fila in pagadas], "pagada")
+            db.execute(
+                update(VentaRetail)
+                .where(VentaRetail.numero_orden.in_([fila["numero_orden"] for fila in pagadas]))
+                .values(estado_pago="pagada")
+            )
+            db.commit()
+
+
+def reporte_directo(db, desde: date, hasta: date, agrupar: str):
+    """Lo que habría que hacer sin ventas_diarias: agrupar ventas_retail del rango"""
+    grupo = func.date(VentaRetail.fecha_compra) if agrupar == "fecha" else VentaRetail.sku
+    return db.execute(
+        select(grupo, func.count(VentaRetail.id), func.sum(VentaRetail.unidades),
+               func.sum(VentaRetail.precio * VentaRetail.unidades))
+        .where(
+            VentaRetail.fecha_compra >= datetime.combine(desde, datetime.min.time()),
+            VentaRetail.fecha_compra < datetime.combine(hasta + timedelta(days=1), datetime.min.time()),
+            VentaRetail.estado_pago == "pagada",
+        )
+        .group_by(grupo)
+    ).all()
+
+
+def medir(funcion, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {"p50_ms": round(statistics.median(tiempos), 2), "max_ms": round(max(tiempos), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL de SQLAlchemy (por defecto SQLite temporal)")
+    parser.add_argument("--ventas", type=int, default=200000)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--skus", type=int, default=300)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+    engine = create_engine(url)
+    tablas = [VentaRetail.__table__, VentaDiaria.__table__]
+    Base.metadata.drop_all(engine, tables=tablas)
+    Base.metadata.create_all(engine, tables=tablas)
+    SessionLocal.configure(bind=engine)
+
+    inicio = time.perf_counter()
+    generar(args.ventas, args.dias, args.skus)
+    generacion = time.perf_counter() - inicio
+
+    hasta = date.today()
+    desde = hasta - timedelta(days=29)
+    salida = {"ventas": args.ventas, "dias": args.dias, "generacion_s": round(generacion, 1)}
+    with SessionLocal() as db:
+        salida["filas_ventas_diarias"] = db.scalar(select(func.count(VentaDiaria.id)))
+        for agrupar in ("fecha", "sku"):
+            directo = reporte_directo(db, desde, hasta, agrupar)
+            resumen = consultar(db, desde, hasta, [agrupar], {"estado_pago": "pagada"}, limite=10000)
+            assert len(directo) == len(resumen["filas"]), (len(directo), len(resumen["filas"]))
+            assert round(sum(fila[3] for fila in directo)) == round(resumen["totales"]["monto"])
+            salida[f"por_{agrupar}"] = {
+                "ventas_retail": medir(lambda: reporte_directo(db, desde, hasta, agrupar), args.repeticiones),
+                "ventas_diarias": medir(
+                    lambda: consultar(db, desde, hasta, [agrupar], {"estado_pago": "pagada"}, limite=10000),
+                    args.repeticiones
+                ),
+            }
+
+        # Las sumas incrementales deben coincidir con recalcular desde ventas_retail
+        antes = consultar(db, hasta - timedelta(days=args.dias), hasta, ["fecha", "sku", "comuna", "estado_pago"], {},
+                          limite=10 ** 7)
+        inicio = time.perf_counter()
+        reconstruir(db, hasta - timedelta(days=args.dias), hasta)
+        salida["reconstruir_s"] = round(time.perf_counter() - inicio, 2)
+        despues = consultar(db, hasta - timedelta(days=args.dias), hasta, ["fecha", "sku", "comuna", "estado_pago"], {},
+                            limite=10 ** 7)
+        assert antes == despues, "ventas_diarias no coincide con reconstruir"
+
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
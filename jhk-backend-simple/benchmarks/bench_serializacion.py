@@ -0,0 +1,121 @@
+"""Benchmark: serialización de listados del catálogo y bytes transferidos.
+
+Compara, para listados de 50 y 500 productos:
+
+- antes: ProductoResponse(...).model_dump() por producto, luego la validación de
+  `response_model` (List[ProductoResponse]) y json.dumps, como hacía FastAPI;
+- ahora: dict armado desde la fila (main.serializar_producto) y orjson.dumps.
+
+Y el tamaño del cuerpo sin comprimir, con gzip y con brotli (si está instalado).
+
+Uso:
+    python benchmarks/bench_serializacion.py
+    python benchmarks/bench_serializacion.py --repeticiones 50 --salida serializacion.json
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import main
+from compresion import brotli
+from logger import detener_logging
+
+
+def producto_falso(i: int):
+    campos = {f"img_{n}": (f"producto_{i}_{n}.jpg" if n <= 4 else None) for n in range(1, 11)}
+    return SimpleNamespace(
+        id=i,
+        sku=f"JHK-{i:05d}",
+        nombre=f"Sofá seccional modelo {i}",
+        precio_venta=float(random.randint(150, 2500) * 1000),
+        tipo_producto=random.choice(["sofas", "seccionales", "poltronas", "camas"]),
+        descripcion_producto="Sofá tapizado en tela antimanchas, estructura de madera nativa y patas de acero. " * 3,
+        precio_descuento=float(random.randint(100, 2000) * 1000) if i % 3 == 0 else None,
+        visitas=random.randint(0, 5000),
+        dimensiones="220 x 90 x 85 cm",
+        material="Tela antimanchas",
+        tiempo_entrega="7-10 días hábiles",
+        **campos,
+    )
+
+
+# FastAPI arma el validador del response_model una vez por ruta
+VALIDADOR_LISTADO = TypeAdapter(List[main.ProductoResponse])
+
+
+def serializar_antes(productos) -> bytes:
+    filas = [
+        main.ProductoResponse(
+            id=p.id, sku=p.sku, nombre=p.nombre, precio_venta=p.precio_venta,
+            tipo_producto=p.tipo_producto, descripcion_producto=p.descripcion_producto,
+            precio_descuento=p.precio_descuento, visitas=p.visitas, dimensiones=p.dimensiones,
+            material=p.material, tiempo_entrega=p.tiempo_entrega,
+            imagenes=main.obtener_imagenes_producto(p),
+            imagenes_webp=main.obtener_imagenes_producto(p)
+        ).model_dump()
+        for p in productos
+    ]
+    validados = VALIDADOR_LISTADO.validate_python(filas)
+    return json.dumps(jsonable_encoder(validados), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def serializar_ahora(productos) -> bytes:
+    return orjson.dumps([main.serializar_producto(p) for p in productos])
+
+
+def medir_ms(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return round(tiempos[len(tiempos) // 2] * 1000, 3)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    random.seed(1)
+    resultados = []
+    for n in (50, 500):
+        productos = [producto_falso(i) for i in range(1, n + 1)]
+        cuerpo = serializar_ahora(productos)
+        assert json.loads(cuerpo) == json.loads(serializar_antes(productos))
+
+        resultado = {
+            "productos": n,
+            "antes_ms_p50": medir_ms(lambda: serializar_antes(productos), args.repeticiones),
+            "ahora_ms_p50": medir_ms(lambda: serializar_ahora(productos), args.repeticiones),
+            "bytes": len(cuerpo),
+            "bytes_gzip": len(gzip.compress(cuerpo, compresslevel=6)),
+        }
+        if brotli is not None:
+            resultado["bytes_brotli"] = len(brotli.compress(cuerpo, quality=4))
+        resultados.append(resultado)
+
+    detener_logging()
+    salida = {"resultados": resultados}
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,58 @@
+"""Transbank falso para pruebas locales de /webpay/iniciar.
+
+Responde como la API de Webpay Plus con latencia y tasa de error configurables.
+
+Uso:
+    python benchmarks/fake_transbank.py --puerto 8099 --latencia-ms 800 --error 0.2
+    WEBPAY_FAKE_URL=http://localhost:8099 uvicorn main:app --port 8000
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+WEBPAY_ENDPOINT = "/rswebpaytransaction/api/webpay/v1.2"
+
+app = FastAPI(title="Transbank falso")
+app.state.latencia = 0.0
+app.state.error = 0.0
+
+
+@app.post(WEBPAY_ENDPOINT + "/transactions/")
+async def crear_transaccion(request: Request):
+    body = await request.json()
+    await asyncio.sleep(app.state.latencia)
+    if random.random() < app.state.error:
+        return JSONResponse(status_code=503, content={"error_message": "Servicio no disponible (simulado)"})
+    return {
+        "token": uuid.uuid4().hex + uuid.uuid4().hex[:30],
+        "url": f"http://localhost/webpay/formulario?orden={body.get('buy_order')}",
+    }
+
+
+@app.put(WEBPAY_ENDPOINT + "/transactions/{token}")
+async def confirmar_transaccion(token: str):
+    await asyncio.sleep(app.state.latencia)
+    return {
+        "status": "AUTHORIZED",
+        "response_code": 0,
+        "authorization_code": f"{random.randint(100000, 999999)}",
+        "payment_type_code": "VD",
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8099)
+    parser.add_argument("--latencia-ms", type=float, default=300)
+    parser.add_argument("--error", type=float, default=0.0, help="Proporción de respuestas 503 (0-1)")
+    args = parser.parse_args()
+
+    app.state.latencia = args.latencia_ms / 1000
+    app.state.error = args.error
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto, log_level="warning")
@@ -0,0 +1,176 @@
+"""Prueba de estrés: reservas de stock con checkouts concurrentes.
+
+Lanza muchos hilos que intentan reservar a la vez los mismos productos (órdenes
+de uno o dos productos, en distinto orden) y verifica que:
+
+- nunca se reservan más unidades que el stock (sin sobreventa);
+- stock_reservado coincide con la suma de reservas activas;
+- al confirmar la mitad de las órdenes y vencer el resto, el stock final es
+  stock inicial - unidades confirmadas y stock_reservado vuelve a 0.
+
+Las tablas `productos` y `reservas_stock` se recrean: con --url usar una base
+dedicada (si `productos` tiene filas que no son de esta prueba, no corre).
+
+Uso:
+    python benchmarks/stress_reservas.py                    # SQLite temporal
+    python benchmarks/stress_reservas.py --url mysql+pymysql://root:@localhost:3306/bench --hilos 64
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, func, inspect, or_, select
+from sqlalchemy.exc import OperationalError
+
+from models import Base, SessionLocal, Producto, ReservaStock
+from inventario import SinStock, reservar_stock, confirmar_reservas, liberar_vencidas
+
+
+def preparar(url: str, productos: int, stock: int):
+    opciones = {"connect_args": {"timeout": 30}} if url.startswith("sqlite") else {"pool_size": 64, "max_overflow": 0}
+    engine = create_engine(url, **opciones)
+    tablas = [Producto.__table__, ReservaStock.__table__]
+    if inspect(engine).has_table(Producto.__tablename__):
+        with engine.connect() as conexion:
+            nombre = Producto.__table__.c.nombre
+            # Sin el IS NULL, NOT LIKE da NULL para los productos sin nombre y no se contarían
+            ajenos = conexion.scalar(
+                select(func.count()).select_from(Producto.__table__).where(or_(nombre.is_(None), ~nombre.like("Stress %")))
+            )
+        if ajenos:
+            raise SystemExit(f"{url.split('@')[-1]} tiene {ajenos} productos que no son de la prueba: usar una base dedicada")
+    # Recrear: con el esquema actual aunque la base venga de una corrida anterior
+    Base.metadata.drop_all(engine, tables=tablas)
+    Base.metadata.create_all(engine, tables=tablas)
+    SessionLocal.configure(bind=engine)
+    with SessionLocal() as db:
+        db.add_all([
+            Producto(id=i, nombre=f"Stress {i}", tipo_producto_venta="local", stock=stock, stock_reservado=0)
+            for i in range(1, productos + 1)
+        ])
+        db.commit()
+    return engine
+
+
+def checkout(numero_orden: str, lineas: dict, reintentos: int = 5) -> bool:
+    for intento in range(reintentos):
+        db = SessionLocal()
+        try:
+            reservar_stock(db, numero_orden, lineas, minutos=20)
+            db.commit()
+            return True
+        except SinStock:
+            db.rollback()
+            return False
+        except OperationalError:
+            # Deadlock / lock wait (MySQL) o base bloqueada (SQLite): reintentar
+            db.rollback()
+            time.sleep(0.01 * (intento + 1))
+        finally:
+            db.close()
+    raise RuntimeError(f"Orden {numero_orden} no pudo reservar tras {reintentos} intentos")
+
+
+def verificar_reservado(productos: int):
+    with SessionLocal() as db:
+        activas = dict(db.execute(
+            select(ReservaStock.producto_id, func.sum(ReservaStock.unidades))
+            .where(ReservaStock.estado == "activa")
+            .group_by(ReservaStock.producto_id)
+        ).all())
+        filas = db.execute(select(Producto.id, Producto.stock, Producto.stock_reservado).where(Producto.id <= productos)).all()
+    for producto_id, stock, reservado in filas:
+        assert reservado == activas.get(producto_id, 0), (producto_id, reservado, activas.get(producto_id))
+        assert reservado <= stock, f"Sobreventa en producto {producto_id}: {reservado} > {stock}"
+    return {producto_id: (stock, reservado) for producto_id, stock, reservado in filas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL SQLAlchemy sync de una base dedicada (por defecto SQLite temporal)")
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--ordenes", type=int, default=2000)
+    parser.add_argument("--productos", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    archivo = None
+    if not args.url:
+        descriptor, archivo = tempfile.mkstemp(prefix="jhk_stress_reservas_", suffix=".db")
+        os.close(descriptor)
+    url = args.url or f"sqlite:///{archivo}"
+    engine = preparar(url, args.productos, args.stock)
+
+    random.seed(7)
+    ordenes = {}
+    for n in range(args.ordenes):
+        ids = random.sample(range(1, args.productos + 1), k=min(2, args.productos) if n % 2 else 1)
+        ordenes[f"S{n:08d}"] = {producto_id: random.randint(1, 3) for producto_id in ids}
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        exitos = dict(zip(ordenes, pool.map(lambda o: checkout(o, ordenes[o]), ordenes)))
+    duracion = time.perf_counter() - inicio
+
+    antes = verificar_reservado(args.productos)
+    reservadas = {o for o, ok in exitos.items() if ok}
+
+    # Confirmar la mitad (en paralelo, como callbacks de Webpay) y vencer el resto
+    confirmar = set(sorted(reservadas)[::2])
+    lock = threading.Lock()
+    sobreventas = []
+
+    def pagar(numero_orden):
+        with SessionLocal() as db:
+            resultado = confirmar_reservas(db, numero_orden)
+            db.commit()
+        with lock:
+            sobreventas.extend(resultado)
+
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        list(pool.map(pagar, confirmar))
+    # Una reserva por producto de cada orden
+    pendientes = sum(len(ordenes[o]) for o in reservadas - confirmar)
+    liberadas = liberar_vencidas(datetime.now() + timedelta(hours=1), limite=pendientes + 1)
+
+    despues = verificar_reservado(args.productos)
+    for producto_id, (stock, reservado) in despues.items():
+        vendidas = sum(ordenes[o].get(producto_id, 0) for o in confirmar)
+        assert stock == args.stock - vendidas, (producto_id, stock, args.stock - vendidas)
+        assert reservado == 0, (producto_id, reservado)
+    assert not sobreventas and liberadas == pendientes, (sobreventas, liberadas, pendientes)
+
+    engine.dispose()
+    if archivo:
+        os.remove(archivo)
+    salida = {
+        "url": url.split("@")[-1],
+        "hilos": args.hilos,
+        "ordenes": args.ordenes,
+        "reservadas": len(reservadas),
+        "rechazadas_sin_stock": args.ordenes - len(reservadas),
+        "checkouts_por_segundo": round(args.ordenes / duracion, 1),
+        "reservado_por_producto": {p: r for p, (_, r) in antes.items()},
+        "confirmadas": len(confirmar),
+        "liberadas": liberadas,
+        "stock_final": {p: s for p, (s, _) in despues.items()},
+        "ok": True,
+    }
+    print(json.dumps(salida, indent=2))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
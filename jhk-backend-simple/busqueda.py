@@ -0,0 +1,506 @@
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import select
+
+from models import ReplicaSessionLocal, Producto
+
+log = logging.getLogger("jhk.busqueda")
+
+# Peso de cada campo: un término en el nombre pesa más que en la descripción
+PESOS_CAMPOS = {"nombre": 5, "sku": 5, "tipo_producto": 3, "material": 2, "descripcion_producto": 1}
+# Cuánto suben las visitas el puntaje: 1 + PESO_VISITAS * ln(1 + visitas)
+PESO_VISITAS = 0.15
+# Factor del puntaje para coincidencias que no son exactas
+FACTOR_PREFIJO = 0.7
+FACTOR_ERROR = 0.5
+MAX_EXPANSIONES = 50
+# Términos con al menos tantos productos se dejan ordenados al cargar el índice
+PREORDENAR_DESDE = 1000
+# Con hasta tantas coincidencias se puntúan todas; con más, se recorren las listas ordenadas
+PUNTUAR_HASTA = 500
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los", "o", "para",
+    "por", "se", "sin", "su", "sus", "un", "una", "unos", "unas", "y",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes ni diéresis (sofá -> sofa, ñ -> n)"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def raiz(palabra: str) -> str:
+    """Stemming liviano para español: plural y género (Savoy, como el SpanishLightStemmer de Lucene).
+
+    sofá/sofás -> sof, sillón/sillones -> sillon, luces -> luz. Deja intactos
+    números y palabras de menos de 4 letras.
+    """
+    if len(palabra) < 4 or palabra.isdigit():
+        return palabra
+    if palabra.endswith("eses") and len(palabra) > 5:
+        return palabra[:-2]
+    if palabra.endswith("ces"):
+        return palabra[:-3] + "z"
+    if palabra[-1] == "s" and palabra[-2] in "aeo" and len(palabra) > 4:
+        return palabra[:-2]
+    if palabra[-1] in "aeo":
+        return palabra[:-1]
+    return palabra
+
+
+def palabras(texto: str) -> list:
+    return _TOKEN.findall(normalizar(texto or ""))
+
+
+def _borrados(termino: str) -> set:
+    return {termino[:i] + termino[i + 1:] for i in range(len(termino))}
+
+
+def _a_un_error(a: str, b: str) -> bool:
+    """Distancia de edición <= 1 (inserción, borrado, sustitución o dos letras traspuestas)"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        distintas = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(distintas) == 1:
+            return True
+        return (len(distintas) == 2 and distintas[1] == distintas[0] + 1
+                and a[distintas[0]] == b[distintas[1]] and a[distintas[1]] == b[distintas[0]])
+    corta, larga = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(corta) and corta[i] == larga[i]:
+        i += 1
+    return corta[i:] == larga[i + 1:]
+
+
+def precio_de(producto) -> float:
+    return producto.precio_descuento or producto.precio_venta or 0.0
+
+
+class IndiceBusqueda:
+    """Índice invertido en memoria del catálogo local.
+
+    Por término (raíz normalizada) guarda {producto_id: peso}, donde el peso es
+    la suma de PESOS_CAMPOS de los campos en que aparece. Las palabras de 4+
+    letras se indexan además por sus variantes con una letra borrada (symmetric
+    delete) para encontrar errores de tipeo sin recorrer el vocabulario.
+
+    Para no puntuar miles de productos en Python, cada término guarda sus
+    productos ordenados por peso x popularidad y la página sale de recorrer
+    esas listas en paralelo hasta que ningún producto no visto pueda superar a
+    los ya encontrados (threshold algorithm de Fagin). Los totales salen de
+    intersecciones de sets, y el filtro de precio de una lista ordenada por
+    precio, que resuelve C. Lecturas y escrituras se serializan con un lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._ordenados = {}
+        self._terminos_producto = {}
+        self._productos = {}
+        self._por_tipo = {}
+        self._precios = []
+        self._ids_por_precio = []
+        self._formas = {}
+        self._variantes = {}
+        self._vocabulario = []
+        self.listo = False
+
+    # --- Escritura ---
+
+    def cargar(self, productos) -> int:
+        """Reconstruir el índice completo con los productos dados"""
+        nuevo = IndiceBusqueda()
+        for producto in productos:
+            nuevo._agregar(producto)
+        nuevo._vocabulario = sorted(nuevo._postings)
+        for termino, posting in nuevo._postings.items():
+            if len(posting) >= PREORDENAR_DESDE:
+                nuevo._ordenado(termino)
+        por_precio = sorted((datos[1], producto_id) for producto_id, datos in nuevo._productos.items())
+        nuevo._precios = [precio for precio, _ in por_precio]
+        nuevo._ids_por_precio = [producto_id for _, producto_id in por_precio]
+        with self._lock:
+            for atributo in ("_postings", "_ordenados", "_terminos_producto", "_productos", "_por_tipo",
+                             "_precios", "_ids_por_precio", "_formas", "_variantes", "_vocabulario"):
+                setattr(self, atributo, getattr(nuevo, atributo))
+            self.listo = True
+        return len(self._productos)
+
+    def actualizar(self, producto) -> None:
+        """Reindexar un producto (o sacarlo si ya no se vende en la tienda local)"""
+        with self._lock:
+            self._quitar(producto.id, ordenado=True)
+            self._agregar(producto, ordenado=True)
+
+    def eliminar(self, producto_id: int) -> None:
+        with self._lock:
+            self._quitar(producto_id, ordenado=True)
+
+    def _agregar(self, producto, ordenado: bool = False) -> None:
+        if producto.tipo_producto_venta != "local":
+            return
+        pesos, formas = {}, {}
+        for campo, peso in PESOS_CAMPOS.items():
+            campo_terminos = set()
+            for palabra in palabras(getattr(producto, campo)):
+                if palabra not in STOPWORDS:
+                    termino = raiz(palabra)
+                    campo_terminos.add(termino)
+                    formas.setdefault(termino, set()).add(palabra)
+            for termino in campo_terminos:
+                pesos[termino] = pesos.get(termino, 0) + peso
+
+        self._productos[producto.id] = (
+            producto.tipo_producto,
+            precio_de(producto),
+            1 + PESO_VISITAS * math.log1p(max(producto.visitas or 0, 0)),
+        )
+        self._por_tipo.setdefault(producto.tipo_producto, set()).add(producto.id)
+        self._terminos_producto[producto.id] = tuple(pesos)
+        if ordenado:
+            posicion = bisect.bisect_right(self._precios, precio_de(producto))
+            self._precios.insert(posicion, precio_de(producto))
+            self._ids_por_precio.insert(posicion, producto.id)
+
+        for termino, peso in pesos.items():
+            posting = self._postings.get(termino)
+            if posting is None:
+                posting = self._postings[termino] = {}
+                if ordenado:
+                    bisect.insort(self._vocabulario, termino)
+            posting[producto.id] = peso
+            lista = self._ordenados.get(termino)
+            if lista is not None:
+                bisect.insort(lista, producto.id, key=self._clave_orden(termino))
+            # Palabras tal como se escriben (sofa, sofas), para los errores de tipeo
+            conocidas = self._formas.setdefault(termino, set())
+            for palabra in formas[termino] - conocidas:
+                conocidas.add(palabra)
+                if len(palabra) >= 4 and not palabra.isdigit():
+                    for variante in _borrados(palabra) | {palabra}:
+                        self._variantes.setdefault(variante, set()).add(palabra)
+
+    def _quitar(self, producto_id: int, ordenado: bool = False) -> None:
+        for termino in self._terminos_producto.pop(producto_id, ()):
+            posting = self._postings[termino]
+            lista = self._ordenados.get(termino)
+            if lista is not None:
+                # La clave aún es la vieja: el producto sigue en _productos y en el posting
+                clave = self._clave_orden(termino)
+                del lista[bisect.bisect_left(lista, clave(producto_id), key=clave)]
+            del posting[producto_id]
+            if posting:
+                continue
+            del self._postings[termino]
+            self._ordenados.pop(termino, None)
+            if ordenado:
+                del self._vocabulario[bisect.bisect_left(self._vocabulario, termino)]
+            for palabra in self._formas.pop(termino, ()):
+                if len(palabra) < 4 or palabra.isdigit():
+                    continue
+                for variante in _borrados(palabra) | {palabra}:
+                    palabras_variante = self._variantes.get(variante)
+                    if palabras_variante is not None:
+                        palabras_variante.discard(palabra)
+                        if not palabras_variante:
+                            del self._variantes[variante]
+        anterior = self._productos.pop(producto_id, None)
+        if anterior is not None:
+            self._por_tipo[anterior[0]].discard(producto_id)
+            posicion = bisect.bisect_left(self._precios, anterior[1])
+            while self._ids_por_precio[posicion] != producto_id:
+                posicion += 1
+            del self._precios[posicion]
+            del self._ids_por_precio[posicion]
+
+    # --- Lectura ---
+
+    def _expansiones(self, palabra: str, ultima: bool) -> list:
+        """[(término, factor)] de los términos del índice que calzan con una palabra de la consulta"""
+        termino = raiz(palabra)
+        encontrados = {}
+        if termino in self._postings:
+            encontrados[termino] = 1.0
+        if ultima and len(palabra) >= 2:
+            # Se está escribiendo: la última palabra también vale como prefijo
+            inicio = bisect.bisect_left(self._vocabulario, palabra)
+            for candidato in self._vocabulario[inicio:inicio + MAX_EXPANSIONES]:
+                if not candidato.startswith(palabra):
+                    break
+                encontrados.setdefault(candidato, FACTOR_PREFIJO)
+        if not encontrados and len(palabra) >= 4:
+            candidatos = set()
+            for variante in _borrados(palabra) | {palabra}:
+                candidatos |= self._variantes.get(variante, set())
+            for candidato in sorted(candidatos)[:MAX_EXPANSIONES]:
+                if _a_un_error(palabra, candidato) and raiz(candidato) in self._postings:
+                    encontrados.setdefault(raiz(candidato), FACTOR_ERROR)
+
+        # idf: un término que aparece en pocos productos discrimina más
+        total = len(self._productos) or 1
+        return [(t, factor * math.log(1 + total / len(self._postings[t]))) for t, factor in encontrados.items()]
+
+    def _grupos(self, consulta: str) -> list:
+        """Una lista de expansiones por palabra; [] si alguna palabra no calza con nada"""
+        lista = [p for p in palabras(consulta) if p not in STOPWORDS] or palabras(consulta)
+        grupos = [self._expansiones(p, i == len(lista) - 1) for i, p in enumerate(lista)]
+        return grupos if grupos and all(grupos) else []
+
+    def _ids_grupo(self, grupo):
+        if len(grupo) == 1:
+            return self._postings[grupo[0][0]].keys()
+        return set().union(*(self._postings[termino] for termino, _ in grupo))
+
+    def _coincidencias(self, grupos):
+        """Ids con todas las palabras (intersección de las uniones de cada grupo)"""
+        conjuntos = sorted((self._ids_grupo(grupo) for grupo in grupos), key=len)
+        ids = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            # Entre sets/dict_keys, & recorre el más chico de los dos
+            ids = ids & conjunto
+        return ids
+
+    def _clave_orden(self, termino: str):
+        posting, productos = self._postings[termino], self._productos
+        return lambda i: (-posting[i] * productos[i][2], i)
+
+    def _ordenado(self, termino: str) -> list:
+        """Productos del término por peso x popularidad; se arma al primer uso y después
+        se mantiene al reindexar (sacar e insertar en su lugar)"""
+        lista = self._ordenados.get(termino)
+        if lista is None:
+            lista = self._ordenados[termino] = sorted(self._postings[termino], key=self._clave_orden(termino))
+        return lista
+
+    def _filtrar_precio(self, ids, precio_min, precio_max):
+        inicio = 0 if precio_min is None else bisect.bisect_left(self._precios, precio_min)
+        fin = len(self._precios) if precio_max is None else bisect.bisect_right(self._precios, precio_max)
+        if len(ids) * 4 < fin - inicio:
+            # Pocas coincidencias para el rango: más barato revisar el precio de cada una
+            minimo = -math.inf if precio_min is None else precio_min
+            maximo = math.inf if precio_max is None else precio_max
+            productos = self._productos
+            return {producto_id for producto_id in ids if minimo <= productos[producto_id][1] <= maximo}
+        if fin - inicio <= len(self._precios) // 2:
+            return ids & set(self._ids_por_precio[inicio:fin])
+        # Rango amplio: sacar los que quedan fuera (menos elementos que copiar)
+        return ids - set(self._ids_por_precio[:inicio] + self._ids_por_precio[fin:])
+
+    def _puntaje(self, producto_id: int, grupos) -> float:
+        puntaje = 0.0
+        for grupo in grupos:
+            puntaje += max(self._postings[termino].get(producto_id, 0) * factor for termino, factor in grupo)
+        return puntaje * self._productos[producto_id][2]
+
+    def _flujo(self, termino: str, factor: float):
+        """(-impacto, id) del término en orden: impacto = peso x factor x popularidad"""
+        posting, productos = self._postings[termino], self._productos
+        for producto_id in self._ordenado(termino):
+            yield -posting[producto_id] * factor * productos[producto_id][2], producto_id
+
+    def _mejores(self, grupos, ids, cantidad: int) -> list:
+        """Los `cantidad` ids de `ids` con mayor puntaje (suma por palabra x popularidad)"""
+        if len(ids) <= PUNTUAR_HASTA:
+            puntajes = [(self._puntaje(producto_id, grupos), -producto_id) for producto_id in ids]
+            return [-producto_id for _, producto_id in heapq.nlargest(cantidad, puntajes)]
+
+        # Una lista por palabra (las expansiones mezcladas: la primera aparición de
+        # un producto es su mejor impacto). Un producto que todavía no aparece en
+        # ninguna lista no puede sumar más que los impactos actuales de cada una
+        flujos = [
+            heapq.merge(*(self._flujo(t, f) for t, f in grupo)) if len(grupo) > 1 else self._flujo(*grupo[0])
+            for grupo in grupos
+        ]
+        frontera = [0.0] * len(flujos)
+        mejores, vistos = [], set()
+        while True:
+            for n, flujo in enumerate(flujos):
+                siguiente = next(flujo, None)
+                if siguiente is None:
+                    # Todos los productos que calzan están en cada lista: ya se vieron todos
+                    return [-producto_id for _, producto_id in sorted(mejores, reverse=True)]
+                impacto, producto_id = siguiente
+                frontera[n] = -impacto
+                if producto_id in vistos:
+                    continue
+                vistos.add(producto_id)
+                if producto_id not in ids:
+                    continue
+                entrada = (self._puntaje(producto_id, grupos), -producto_id)
+                if len(mejores) < cantidad:
+                    heapq.heappush(mejores, entrada)
+                elif entrada > mejores[0]:
+                    heapq.heapreplace(mejores, entrada)
+            if len(mejores) >= cantidad and mejores[0][0] >= sum(frontera):
+                return [-producto_id for _, producto_id in sorted(mejores, reverse=True)]
+
+    def _filtrados(self, consulta: str, tipo, precio_min, precio_max):
+        """(grupos de la consulta, ids que coinciden con tipo y rango de precio)"""
+        grupos = self._grupos(consulta)
+        if not grupos:
+            return grupos, set()
+        ids = self._coincidencias(grupos)
+        if tipo:
+            ids = self._por_tipo.get(tipo, set()) & ids
+        if precio_min is not None or precio_max is not None:
+            ids = self._filtrar_precio(ids, precio_min, precio_max)
+        return grupos, ids
+
+    def buscar(self, consulta: str, limite: int = 24, offset: int = 0,
+               tipo=None, precio_min=None, precio_max=None):
+        """(ids de la página ordenados por relevancia, total de coincidencias)"""
+        with self._lock:
+            grupos, ids = self._filtrados(consulta, tipo, precio_min, precio_max)
+            if not ids:
+                return [], 0
+            return self._mejores(grupos, ids, offset + limite)[offset:], len(ids)
+
+    def ids(self, consulta: str, tipo=None, precio_min=None, precio_max=None, limite: Optional[int] = None) -> list:
+        """Ids que coinciden, sin orden (para filtrar los listados).
+
+        Con `limite` y más coincidencias que eso, solo los `limite` más
+        relevantes: el listado los pasa en un IN (...) y no conviene que sean miles.
+        """
+        with self._lock:
+            grupos, ids = self._filtrados(consulta, tipo, precio_min, precio_max)
+            if limite is not None and len(ids) > limite:
+                return self._mejores(grupos, ids, limite)
+            return list(ids)
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "listo": self.listo,
+                "productos": len(self._productos),
+                "terminos": len(self._postings),
+                "variantes": len(self._variantes),
+            }
+
+
+COLUMNAS_INDICE = (
+    Producto.id, Producto.nombre, Producto.sku, Producto.tipo_producto, Producto.material,
+    Producto.descripcion_producto, Producto.visitas, Producto.precio_venta, Producto.precio_descuento,
+    Producto.tipo_producto_venta, Producto.actualizado_en,
+)
+
+
+class SincronizadorBusqueda:
+    """Hilo que mantiene el índice al día con la tabla productos.
+
+    Arranca con una carga completa; después, cada `intervalo` segundos reindexa
+    solo los productos con `actualizado_en` posterior a la última marca vista,
+    y cada `reconstruir_cada` segundos rehace todo (productos borrados).
+    `avisar()` adelanta la próxima pasada. Lee de la réplica si hay una
+    configurada.
+    """
+
+    def __init__(self, indice: IndiceBusqueda, intervalo: float = 10.0, reconstruir_cada: float = 3600.0):
+        self.indice = indice
+        self.intervalo = intervalo
+        self.reconstruir_cada = reconstruir_cada
+        self._detener = threading.Event()
+        self._aviso = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._marca = None
+        self._ultima_carga = 0.0
+        self.cargas = 0
+        self.carga_ms = 0.0
+        self.actualizados = 0
+
+    def avisar(self) -> None:
+        """Sincronizar ya, desde el hilo (sin bloquear a quien avisa)"""
+        self._aviso.set()
+
+    def cargar_todo(self) -> int:
+        with self._lock:
+            inicio = time.perf_counter()
+            db = ReplicaSessionLocal()
+            try:
+                filas = db.execute(
+                    select(*COLUMNAS_INDICE).where(Producto.tipo_producto_venta == "local")
+                ).all()
+            finally:
+                db.close()
+            productos = self.indice.cargar(filas)
+            self._marca = max((f.actualizado_en for f in filas if f.actualizado_en), default=self._marca)
+            self._ultima_carga = time.monotonic()
+            self.cargas += 1
+            self.carga_ms = round((time.perf_counter() - inicio) * 1000, 1)
+        log.info("Índice de búsqueda cargado", extra={"productos": productos, "duracion_ms": self.carga_ms})
+        return productos
+
+    def sincronizar(self) -> int:
+        """Reindexar los productos modificados desde la última pasada; retorna cuántos"""
+        if self._marca is None:
+            return self.cargar_todo()
+        with self._lock:
+            db = ReplicaSessionLocal()
+            try:
+                # >= : las marcas tienen resolución de segundos; reindexar dos veces no cambia nada
+                filas = db.execute(select(*COLUMNAS_INDICE).where(Producto.actualizado_en >= self._marca)).all()
+            finally:
+                db.close()
+            for fila in filas:
+                self.indice.actualizar(fila)
+            self._marca = max((f.actualizado_en for f in filas if f.actualizado_en), default=self._marca)
+            self.actualizados += len(filas)
+        return len(filas)
+
+    def _loop(self) -> None:
+        # Puede venir cargado del arranque (o del maestro, con gunicorn --preload)
+        if not self.indice.listo:
+            try:
+                self.cargar_todo()
+            except Exception:
+                log.exception("Error cargando el índice de búsqueda")
+        while True:
+            self._aviso.wait(self.intervalo)
+            self._aviso.clear()
+            if self._detener.is_set():
+                return
+            try:
+                if time.monotonic() - self._ultima_carga >= self.reconstruir_cada:
+                    self.cargar_todo()
+                else:
+                    self.sincronizar()
+            except Exception:
+                log.exception("Error sincronizando el índice de búsqueda")
+
+    def iniciar(self) -> None:
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="indice-busqueda", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._aviso.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def estado(self) -> dict:
+        return {
+            **self.indice.estado(),
+            "intervalo": self.intervalo,
+            "cargas": self.cargas,
+            "carga_ms": self.carga_ms,
+            "actualizados": self.actualizados,
+        }
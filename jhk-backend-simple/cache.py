@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+log = logging.getLogger("jhk.cache")
+
+
+class VersionCompartida:
+    """Versión de un grupo de caches guardada en la base, para invalidarlos en todos los workers.
+
+    Cada worker tiene sus propios caches: quien invalida sube la versión
+    (`incrementar`) y los demás la leen a lo más cada `intervalo` segundos al
+    consultar su cache (`revisar`); si cambió, llaman a `al_cambiar`. Si la
+    base no responde se sigue con el cache local (y su TTL).
+    """
+
+    def __init__(self, leer: Callable[[], int], incrementar: Callable[[], None],
+                 al_cambiar: Callable[[], None], intervalo: float = 2.0):
+        self._leer = leer
+        self._incrementar = incrementar
+        self._al_cambiar = al_cambiar
+        self.intervalo = intervalo
+        self.version = None
+        self.cambios = 0
+        self.errores = 0
+        self._proxima = 0.0
+        self._lock = threading.Lock()
+
+    def revisar(self, forzar: bool = False) -> None:
+        if not forzar and time.monotonic() < self._proxima:
+            return
+        # Un solo hilo consulta; los demás siguen con lo que hay en cache
+        if not self._lock.acquire(blocking=forzar):
+            return
+        try:
+            self._proxima = time.monotonic() + self.intervalo
+            version = self._leer()
+            if self.version is not None and version != self.version:
+                self.cambios += 1
+                self._al_cambiar()
+            self.version = version
+        except Exception:
+            self.errores += 1
+            if self.errores == 1:
+                log.exception("No se pudo leer la versión del cache")
+        finally:
+            self._lock.release()
+
+    def incrementar(self) -> None:
+        """Avisar a los demás workers; este ya vació sus caches"""
+        self._incrementar()
+        with self._lock:
+            self.version = self._leer()
+            self._proxima = time.monotonic() + self.intervalo
+
+    def estado(self) -> Dict[str, Any]:
+        return {"version": self.version, "intervalo": self.intervalo, "cambios": self.cambios, "errores": self.errores}
+
+
+class TTLCache:
+    """Cache en memoria con expiración por TTL y contadores de aciertos/fallos"""
+
+    def __init__(self, ttl: float, max_entries: int = 1024, version: Optional[VersionCompartida] = None):
+        self.ttl = ttl
+        self.version = version
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.version is not None:
+            self.version.revisar()
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._data.get(key)
+            if entrada is None or entrada[0] <= ahora:
+                if entrada is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entrada[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                # Descartar la entrada más antigua (orden de inserción)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self.invalidaciones += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._data),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "invalidaciones": self.invalidaciones,
+            }
@@ -0,0 +1,43 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import orjson
+from fastapi import Request, Response
+
+
+class RespuestaCacheable:
+    """Payload ya serializado a JSON, con su ETag fuerte y Last-Modified.
+
+    Se guarda así en los caches del catálogo: un hit no vuelve a serializar
+    ni a calcular el hash, y un request condicional válido responde 304 sin cuerpo.
+    """
+
+    __slots__ = ("cuerpo", "etag", "modificado", "last_modified")
+
+    def __init__(self, payload):
+        self.cuerpo = orjson.dumps(payload)
+        self.etag = '"' + hashlib.blake2b(self.cuerpo, digest_size=16).hexdigest() + '"'
+        self.modificado = datetime.now(timezone.utc).replace(microsecond=0)
+        self.last_modified = format_datetime(self.modificado, usegmt=True)
+
+    def no_modificado(self, request: Request) -> bool:
+        # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110 13.2.2)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(",")]
+            return "*" in etags or self.etag in [e[2:] if e.startswith("W/") else e for e in etags]
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.modificado <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def responder(self, request: Request, cache_control: str) -> Response:
+        headers = {"ETag": self.etag, "Last-Modified": self.last_modified, "Cache-Control": cache_control}
+        if self.no_modificado(request):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.cuerpo, media_type="application/json", headers=headers)
@@ -0,0 +1,100 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se usa gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def elegir_codificacion(accept_encoding: str) -> str:
+    """br si el cliente lo acepta (y brotli está instalado), si no gzip; '' si ninguno"""
+    calidades = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        calidades[nombre.strip()] = q
+    comodin = calidades.get("*", 0.0)
+    if brotli is not None and calidades.get("br", comodin) > 0:
+        return "br"
+    if calidades.get("gzip", comodin) > 0:
+        return "gzip"
+    return ""
+
+
+class CompresionMiddleware:
+    """Comprime con brotli o gzip las respuestas de texto/JSON de al menos `minimo` bytes.
+
+    Las respuestas en streaming, las que ya vienen comprimidas y las de otros
+    tipos (imágenes) pasan sin tocar. Al comprimir, el ETag pasa a débil
+    (igual que hace nginx) porque el cuerpo ya no es byte a byte el mismo.
+    """
+
+    def __init__(self, app, minimo: int = 1024, nivel_gzip: int = 6, calidad_brotli: int = 4):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.calidad_brotli = calidad_brotli
+
+    def comprimir(self, cuerpo: bytes, codificacion: str) -> bytes:
+        if codificacion == "br":
+            return brotli.compress(cuerpo, quality=self.calidad_brotli)
+        return gzip.compress(cuerpo, compresslevel=self.nivel_gzip, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if not codificacion:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        directo = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, directo
+            if mensaje["type"] == "http.response.start":
+                headers = Headers(raw=mensaje["headers"])
+                tipo = headers.get("content-type", "")
+                directo = "content-encoding" in headers or not tipo.startswith(TIPOS_COMPRIMIBLES)
+                if directo:
+                    await send(mensaje)
+                else:
+                    inicio = mensaje
+                return
+
+            if directo:
+                await send(mensaje)
+                return
+
+            if mensaje.get("more_body", False):
+                # Respuesta en streaming: enviarla tal cual
+                directo = True
+                await send(inicio)
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            headers = MutableHeaders(raw=inicio["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(cuerpo) >= self.minimo:
+                cuerpo = self.comprimir(cuerpo, codificacion)
+                headers["Content-Encoding"] = codificacion
+                headers["Content-Length"] = str(len(cuerpo))
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+            await send(inicio)
+            await send({"type": "http.response.body", "body": cuerpo})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,164 @@
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+DIAS_ENTREGA_DEFAULT = 3
+# Tope para textos mal cargados en tiempo_entrega (p. ej. "2024"); ~1 año hábil
+DIAS_ENTREGA_MAX = 250
+
+# Día de los Pueblos Indígenas = solsticio de invierno (hora de Chile)
+SOLSTICIO_JUNIO = {2024: 20, 2025: 20, 2026: 21, 2027: 21, 2028: 20, 2029: 20, 2030: 21}
+
+
+def domingo_de_pascua(anio: int) -> date:
+    """Algoritmo de Meeus/Jones/Butcher (calendario gregoriano)"""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return date(anio, mes, dia)
+
+
+def trasladar_a_lunes(fecha: date) -> date:
+    """Ley 19.668: mar/mié/jue pasan al lunes anterior, viernes al lunes siguiente"""
+    dia = fecha.weekday()
+    if dia in (1, 2, 3):
+        return fecha - timedelta(days=dia)
+    if dia == 4:
+        return fecha + timedelta(days=3)
+    return fecha
+
+
+def feriados_chile(anio: int) -> Dict[date, str]:
+    """Feriados legales nacionales de Chile (los extraordinarios van en la tabla `feriados`)"""
+    pascua = domingo_de_pascua(anio)
+    feriados = {
+        date(anio, 1, 1): "Año Nuevo",
+        pascua - timedelta(days=2): "Viernes Santo",
+        pascua - timedelta(days=1): "Sábado Santo",
+        date(anio, 5, 1): "Día del Trabajo",
+        date(anio, 5, 21): "Día de las Glorias Navales",
+        date(anio, 6, SOLSTICIO_JUNIO.get(anio, 21)): "Día de los Pueblos Indígenas",
+        trasladar_a_lunes(date(anio, 6, 29)): "San Pedro y San Pablo",
+        date(anio, 7, 16): "Virgen del Carmen",
+        date(anio, 8, 15): "Asunción de la Virgen",
+        date(anio, 9, 18): "Independencia Nacional",
+        date(anio, 9, 19): "Glorias del Ejército",
+        trasladar_a_lunes(date(anio, 10, 12)): "Encuentro de Dos Mundos",
+        date(anio, 11, 1): "Día de Todos los Santos",
+        date(anio, 12, 8): "Inmaculada Concepción",
+        date(anio, 12, 25): "Navidad",
+    }
+
+    # Fiestas Patrias: se agrega el 17 si el 18 cae martes y el 20 si el 19 cae jueves
+    if date(anio, 9, 18).weekday() == 1:
+        feriados[date(anio, 9, 17)] = "Fiestas Patrias"
+    if date(anio, 9, 19).weekday() == 3:
+        feriados[date(anio, 9, 20)] = "Fiestas Patrias"
+
+    # Iglesias Evangélicas: si el 31 cae martes pasa al viernes anterior, si cae miércoles al siguiente
+    evangelicas = date(anio, 10, 31)
+    if evangelicas.weekday() == 1:
+        evangelicas -= timedelta(days=4)
+    elif evangelicas.weekday() == 2:
+        evangelicas += timedelta(days=2)
+    feriados[evangelicas] = "Día de las Iglesias Evangélicas"
+
+    return feriados
+
+
+def parsear_tiempo_entrega(texto: Optional[str]) -> Optional[int]:
+    """Días hábiles a partir de Producto.tiempo_entrega ("5 días", "7-10 días hábiles", "2 semanas")"""
+    if not texto:
+        return None
+    numeros = [int(n) for n in re.findall(r"\d+", texto)]
+    if not numeros:
+        return None
+    dias = max(numeros)
+    if "semana" in texto.lower():
+        dias *= 5
+    return dias
+
+
+def normalizar(texto: Optional[str]) -> str:
+    return (texto or "").strip().lower()
+
+
+class CalendarioEntregas:
+    """Calendario precalculado de días hábiles para calcular fechas de entrega en O(1).
+
+    `siguiente[i]` es la posición en `habiles` del primer día hábil posterior
+    al día `inicio + i`, así que sumar n días hábiles es un acceso a lista. La
+    tabla se reemplaza completa al recalcular, sin afectar lecturas en curso.
+    """
+
+    def __init__(self, dias_atras: int = 30, dias_adelante: int = 730):
+        self.dias_atras = dias_atras
+        self.dias_adelante = dias_adelante
+        self._lock = threading.Lock()
+        self._feriados_extra: Dict[date, str] = {}
+        self._plazos: Dict[Tuple[str, str], int] = {}
+        self._construir(date.today())
+
+    def _construir(self, centro: date) -> None:
+        inicio = centro - timedelta(days=self.dias_atras)
+        fin = centro + timedelta(days=self.dias_adelante)
+
+        feriados = {}
+        for anio in range(inicio.year, fin.year + 1):
+            feriados.update(feriados_chile(anio))
+        feriados.update(self._feriados_extra)
+
+        dias = [inicio + timedelta(days=i) for i in range((fin - inicio).days + 1)]
+        habiles = [dia for dia in dias if dia.weekday() < 5 and dia not in feriados]
+        siguiente, j = [], 0
+        for dia in dias:
+            while j < len(habiles) and habiles[j] <= dia:
+                j += 1
+            siguiente.append(j)
+
+        self.feriados = feriados
+        self._tabla = (inicio, habiles, siguiente)
+
+    def cargar(self, feriados_extra: Iterable[Tuple[date, str]], plazos: Iterable[Tuple[str, str, int]]) -> None:
+        """Agregar feriados extraordinarios y plazos por región/comuna (tablas `feriados` y `plazos_entrega`)"""
+        with self._lock:
+            self._feriados_extra = dict(feriados_extra)
+            self._plazos = {(normalizar(region), normalizar(comuna)): dias for region, comuna, dias in plazos}
+            self._construir(date.today())
+
+    def es_habil(self, dia: date) -> bool:
+        return dia.weekday() < 5 and dia not in self.feriados
+
+    def sumar_dias_habiles(self, desde: date, dias: int) -> date:
+        dias = max(dias, 1)
+        inicio, habiles, siguiente = self._tabla
+        i = (desde - inicio).days
+        if not 0 <= i < len(siguiente) or siguiente[i] + dias > len(habiles):
+            # Fuera de la ventana precalculada: recalcular centrado en la fecha pedida
+            with self._lock:
+                self._construir(desde)
+            inicio, habiles, siguiente = self._tabla
+            i = (desde - inicio).days
+        return habiles[siguiente[i] + dias - 1]
+
+    def dias_entrega(self, region: str = None, comuna: str = None, tiempo_entrega: str = None) -> int:
+        """Plazo en días hábiles: el mayor entre el de la comuna/región y el del producto"""
+        plazo = self._plazos.get((normalizar(region), normalizar(comuna)))
+        if plazo is None:
+            plazo = self._plazos.get((normalizar(region), ""), DIAS_ENTREGA_DEFAULT)
+        dias_producto = parsear_tiempo_entrega(tiempo_entrega)
+        return min(max(plazo, dias_producto or 0), DIAS_ENTREGA_MAX)
+
+    def fecha_entrega(self, fecha_compra: datetime, region: str = None, comuna: str = None,
+                      tiempo_entrega: str = None) -> datetime:
+        dias = self.dias_entrega(region, comuna, tiempo_entrega)
+        dia = self.sumar_dias_habiles(fecha_compra.date(), dias)
+        return datetime.combine(dia, fecha_compra.time())
@@ -0,0 +1,38 @@
+"""Gunicorn con workers de uvicorn y la app precargada en el maestro.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+El maestro importa main (SDK de Transbank, SQLAlchemy, ...), carga el
+catálogo, los productos destacados y el índice de búsqueda, y recién entonces
+crea los workers con fork: todos comparten esa memoria (copy-on-write) y cada
+uno solo abre sus conexiones antes de atender. Ver arranque.py.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# El arranque de un worker (pools + precarga si no vino del maestro) cuenta para este timeout
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Con preload_app, main ya está importado; esto corre una vez, antes del primer fork
+    import main
+    main.precargar_maestro()
+    server.log.info("Precarga en el maestro: %s", main.arranque.fases)
+
+
+def post_fork(server, worker):
+    import main
+    main.despues_de_fork()
+
+
+def child_exit(server, worker):
+    # Métricas de un worker que terminó (PROMETHEUS_MULTIPROC_DIR)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
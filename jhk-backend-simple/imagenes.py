@@ -0,0 +1,159 @@
+"""Proceso offline de imágenes de productos.
+
+1. Sincroniza `producto_imagenes` con las columnas img_1 ... img_10: agrega las nuevas,
+   actualiza las que cambiaron de archivo (sus versiones se regeneran) y borra las vaciadas.
+2. Genera para cada imagen sin procesar una miniatura y una mediana en JPEG y WebP
+   dentro de IMAGES_PATH, y guarda sus rutas y las dimensiones del original.
+
+Uso:
+    python imagenes.py                  # solo imágenes pendientes
+    python imagenes.py --forzar         # regenerar todas
+    python imagenes.py --procesos 4
+
+Requiere Pillow. Después de correrlo, POST /admin/cache/invalidar para que el
+catálogo sirva las versiones nuevas sin esperar al TTL del cache.
+"""
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import delete, insert, select, update
+
+from models import SessionLocal, Producto, ProductoImagen
+
+log = logging.getLogger("jhk.imagenes")
+
+IMAGES_PATH = os.getenv("IMAGES_PATH", "/var/www/imagenes_jhk/productos")
+
+# Lado mayor en píxeles de cada versión (la tarjeta del catálogo ~300px, el detalle ~900px)
+TAMANOS = {"miniatura": 320, "mediana": 960}
+CALIDAD_JPEG = 82
+CALIDAD_WEBP = 80
+
+
+# Columnas derivadas del archivo: si el archivo cambia vuelven a NULL y se regeneran
+VERSIONES_NULAS = {"ancho": None, "alto": None, "miniatura": None, "mediana": None,
+                   "miniatura_webp": None, "mediana_webp": None}
+
+
+def sincronizar_desde_columnas(db) -> dict:
+    """Dejar producto_imagenes igual a las columnas img_N (mismo criterio que la migración 005)"""
+    existentes = {
+        (producto_id, posicion): (imagen_id, archivo)
+        for imagen_id, producto_id, posicion, archivo in db.execute(
+            select(ProductoImagen.id, ProductoImagen.producto_id, ProductoImagen.posicion, ProductoImagen.archivo)
+        )
+    }
+    columnas = [getattr(Producto, f"img_{i}") for i in range(1, 11)]
+    nuevas, cambiadas = [], []
+    for producto_id, *imagenes in db.execute(select(Producto.id, *columnas)):
+        for posicion, archivo in enumerate(imagenes, start=1):
+            if not archivo:
+                continue
+            actual = existentes.pop((producto_id, posicion), None)
+            if actual is None:
+                nuevas.append({"producto_id": producto_id, "posicion": posicion, "archivo": archivo})
+            elif actual[1] != archivo:
+                cambiadas.append((actual[0], archivo))
+
+    # Lo que queda: img_N vacías y productos borrados
+    sobrantes = [imagen_id for imagen_id, _ in existentes.values()]
+    if nuevas:
+        db.execute(insert(ProductoImagen), nuevas)
+    for imagen_id, archivo in cambiadas:
+        db.execute(
+            update(ProductoImagen).where(ProductoImagen.id == imagen_id).values(archivo=archivo, **VERSIONES_NULAS)
+        )
+    for inicio in range(0, len(sobrantes), 1000):
+        db.execute(
+            delete(ProductoImagen).where(ProductoImagen.id.in_(sobrantes[inicio:inicio + 1000]))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return {"nuevas": len(nuevas), "actualizadas": len(cambiadas), "borradas": len(sobrantes)}
+
+
+def generar_versiones(archivo: str, raiz: str = IMAGES_PATH) -> dict:
+    """Crea las versiones de una imagen y devuelve sus rutas relativas y el tamaño original"""
+    from PIL import Image, ImageOps
+
+    base, _ = os.path.splitext(archivo)
+    with Image.open(os.path.join(raiz, archivo)) as original:
+        imagen = ImageOps.exif_transpose(original)
+        resultado = {"ancho": imagen.width, "alto": imagen.height}
+        if imagen.mode not in ("RGB", "RGBA"):
+            imagen = imagen.convert("RGBA" if "transparency" in imagen.info else "RGB")
+
+        for nombre, lado in TAMANOS.items():
+            version = imagen.copy()
+            version.thumbnail((lado, lado), Image.LANCZOS)
+
+            jpeg = os.path.join(nombre, base + ".jpg")
+            webp = os.path.join(nombre, base + ".webp")
+            os.makedirs(os.path.dirname(os.path.join(raiz, jpeg)), exist_ok=True)
+
+            if version.mode == "RGBA":
+                # JPEG no tiene transparencia: fondo blanco como el sitio
+                fondo = Image.new("RGB", version.size, (255, 255, 255))
+                fondo.paste(version, mask=version.getchannel("A"))
+                fondo.save(os.path.join(raiz, jpeg), "JPEG", quality=CALIDAD_JPEG, optimize=True, progressive=True)
+            else:
+                version.save(os.path.join(raiz, jpeg), "JPEG", quality=CALIDAD_JPEG, optimize=True, progressive=True)
+            version.save(os.path.join(raiz, webp), "WEBP", quality=CALIDAD_WEBP, method=6)
+
+            resultado[nombre] = jpeg
+            resultado[f"{nombre}_webp"] = webp
+    return resultado
+
+
+def _procesar(fila):
+    imagen_id, archivo, raiz = fila
+    try:
+        return imagen_id, generar_versiones(archivo, raiz), None
+    except Exception as e:
+        return imagen_id, None, str(e)
+
+
+def procesar_pendientes(forzar: bool = False, procesos: int = None, raiz: str = IMAGES_PATH) -> dict:
+    db = SessionLocal()
+    try:
+        sincronizadas = sincronizar_desde_columnas(db)
+
+        query = select(ProductoImagen.id, ProductoImagen.archivo)
+        if not forzar:
+            query = query.where(ProductoImagen.miniatura.is_(None))
+        pendientes = [(imagen_id, archivo, raiz) for imagen_id, archivo in db.execute(query)]
+
+        procesadas, errores = 0, 0
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for imagen_id, valores, error in pool.map(_procesar, pendientes, chunksize=8):
+                if error:
+                    errores += 1
+                    log.warning("No se pudo procesar la imagen", extra={"imagen_id": imagen_id, "error": error})
+                    continue
+                db.execute(update(ProductoImagen).where(ProductoImagen.id == imagen_id).values(**valores))
+                procesadas += 1
+                if procesadas % 100 == 0:
+                    db.commit()
+        db.commit()
+    finally:
+        db.close()
+
+    return {**sincronizadas, "procesadas": procesadas, "errores": errores}
+
+
+if __name__ == "__main__":
+    from logger import configurar_logging, detener_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--forzar", action="store_true", help="Regenerar también las ya procesadas")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--raiz", default=IMAGES_PATH, help="Directorio de las imágenes originales")
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        log.info("Imágenes procesadas", extra=procesar_pendientes(args.forzar, args.procesos, args.raiz))
+    finally:
+        detener_logging()
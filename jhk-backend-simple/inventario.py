@@ -0,0 +1,202 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, select, update
+
+from models import SessionLocal, Producto, ReservaStock
+
+log = logging.getLogger("jhk.inventario")
+
+
+class SinStock(Exception):
+    def __init__(self, producto_id: int, unidades: int):
+        super().__init__(f"Sin stock suficiente para el producto {producto_id} ({unidades} unidades)")
+        self.producto_id = producto_id
+        self.unidades = unidades
+
+
+# Los cambios de stock no tocan `actualizado_en`: asignarlo a sí mismo evita el
+# ON UPDATE de MySQL (y el onupdate del modelo), y la búsqueda no reindexa el producto
+_SIN_MARCA = {"actualizado_en": Producto.actualizado_en}
+
+
+def _hay_stock(unidades: int):
+    return or_(Producto.stock.is_(None), Producto.stock - Producto.stock_reservado >= unidades)
+
+
+def reservar_stock(db, numero_orden: str, lineas: dict, minutos: float) -> None:
+    """Apartar `lineas` ({producto_id: unidades}) para la orden, sin hacer commit.
+
+    Cada producto es un único UPDATE condicional: la fila solo se bloquea
+    mientras dura la transacción y dos checkouts simultáneos no pueden tomar
+    la misma unidad. Los productos se recorren por id para que dos órdenes con
+    los mismos productos bloqueen en el mismo orden. Si falta stock de alguno,
+    lanza SinStock y quien llama debe hacer rollback.
+
+    Los productos sin control de stock (`stock` NULL) no se reservan: no hay
+    nada que apartar y el UPDATE solo bloquearía su fila durante todo el pago.
+    """
+    controlados = set(db.scalars(
+        select(Producto.id).where(Producto.id.in_(list(lineas)), Producto.stock.is_not(None))
+    )) if lineas else set()
+    lineas = {producto_id: unidades for producto_id, unidades in lineas.items() if producto_id in controlados}
+    if not lineas:
+        return
+
+    for producto_id in sorted(lineas):
+        unidades = lineas[producto_id]
+        resultado = db.execute(
+            update(Producto)
+            .where(Producto.id == producto_id, _hay_stock(unidades))
+            .values(stock_reservado=Producto.stock_reservado + unidades, **_SIN_MARCA)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount != 1:
+            raise SinStock(producto_id, unidades)
+
+    expira_en = datetime.now() + timedelta(minutes=minutos)
+    db.execute(insert(ReservaStock), [
+        {"numero_orden": numero_orden, "producto_id": producto_id, "unidades": unidades,
+         "estado": "activa", "expira_en": expira_en}
+        for producto_id, unidades in sorted(lineas.items())
+    ])
+
+
+def extender_reservas(db, numero_orden: str, minutos: float) -> int:
+    """Dar más plazo a las reservas activas de la orden (al iniciar el pago), sin commit"""
+    return db.execute(
+        update(ReservaStock)
+        .where(ReservaStock.numero_orden == numero_orden, ReservaStock.estado == "activa")
+        .values(expira_en=datetime.now() + timedelta(minutes=minutos))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def confirmar_reservas(db, numero_orden: str) -> list:
+    """Descontar del stock las unidades reservadas por una orden pagada, sin commit.
+
+    Si una reserva alcanzó a vencer antes del pago, se vuelve a descontar del
+    stock disponible; si ya no alcanza, se descuenta igual (el stock queda
+    negativo) y se devuelve el producto en la lista de sobreventas.
+    """
+    reservas = db.execute(
+        select(ReservaStock.id, ReservaStock.producto_id, ReservaStock.unidades)
+        .where(ReservaStock.numero_orden == numero_orden, ReservaStock.estado.in_(("activa", "expirada")))
+        .order_by(ReservaStock.producto_id)
+    ).all()
+
+    sobreventas = []
+    for reserva in reservas:
+        if _cambiar_estado(db, reserva.id, "activa", "confirmada"):
+            db.execute(
+                update(Producto)
+                .where(Producto.id == reserva.producto_id)
+                .values(stock=Producto.stock - reserva.unidades,
+                        stock_reservado=Producto.stock_reservado - reserva.unidades, **_SIN_MARCA)
+                .execution_options(synchronize_session=False)
+            )
+        elif _cambiar_estado(db, reserva.id, "expirada", "confirmada"):
+            descontado = db.execute(
+                update(Producto)
+                .where(Producto.id == reserva.producto_id, _hay_stock(reserva.unidades))
+                .values(stock=Producto.stock - reserva.unidades, **_SIN_MARCA)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not descontado:
+                db.execute(
+                    update(Producto)
+                    .where(Producto.id == reserva.producto_id)
+                    .values(stock=Producto.stock - reserva.unidades, **_SIN_MARCA)
+                    .execution_options(synchronize_session=False)
+                )
+                sobreventas.append(reserva.producto_id)
+    return sobreventas
+
+
+def _cambiar_estado(db, reserva_id: int, desde: str, hacia: str) -> bool:
+    # Condicional sobre el estado: confirmación y vencimiento nunca aplican los dos
+    return db.execute(
+        update(ReservaStock)
+        .where(ReservaStock.id == reserva_id, ReservaStock.estado == desde)
+        .values(estado=hacia)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def liberar_vencidas(ahora: datetime = None, limite: int = 500) -> int:
+    """Devolver al stock disponible las reservas activas vencidas; retorna cuántas se liberaron.
+
+    Cada reserva se libera en su propia transacción corta para no retener
+    bloqueos de productos mientras se espera otra fila.
+    """
+    ahora = ahora or datetime.now()
+    db = SessionLocal()
+    liberadas = 0
+    try:
+        vencidas = db.execute(
+            select(ReservaStock.id, ReservaStock.producto_id, ReservaStock.unidades)
+            .where(ReservaStock.estado == "activa", ReservaStock.expira_en < ahora)
+            .order_by(ReservaStock.expira_en)
+            .limit(limite)
+        ).all()
+        db.commit()
+
+        for reserva in vencidas:
+            try:
+                if _cambiar_estado(db, reserva.id, "activa", "expirada"):
+                    db.execute(
+                        update(Producto)
+                        .where(Producto.id == reserva.producto_id)
+                        .values(stock_reservado=Producto.stock_reservado - reserva.unidades, **_SIN_MARCA)
+                        .execution_options(synchronize_session=False)
+                    )
+                    liberadas += 1
+                db.commit()
+            except Exception:
+                db.rollback()
+                log.exception("Error liberando reserva", extra={"reserva_id": reserva.id})
+    finally:
+        db.close()
+    return liberadas
+
+
+class LiberadorReservas:
+    """Hilo que cada `intervalo` segundos libera las reservas vencidas"""
+
+    def __init__(self, intervalo: float = 60.0):
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo = None
+        self.ejecuciones = 0
+        self.liberadas = 0
+
+    def liberar(self) -> int:
+        liberadas = liberar_vencidas()
+        self.ejecuciones += 1
+        self.liberadas += liberadas
+        if liberadas:
+            log.info("Reservas vencidas liberadas", extra={"reservas": liberadas})
+        return liberadas
+
+    def _loop(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.liberar()
+            except Exception:
+                log.exception("Error liberando reservas vencidas")
+
+    def iniciar(self) -> None:
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="liberador-reservas", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def estado(self) -> dict:
+        return {"intervalo": self.intervalo, "ejecuciones": self.ejecuciones, "liberadas": self.liberadas}
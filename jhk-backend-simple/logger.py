@@ -0,0 +1,94 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Atributos estándar de LogRecord; todo lo demás viene de `extra=` y va al JSON
+_ATRIBUTOS_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por evento, con los campos de `extra` al mismo nivel"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith("_"):
+                evento[clave] = valor
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class ColaSinBloqueo(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (y cuenta) eventos si la cola está llena"""
+
+    descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolver el mensaje aquí y dejar los campos de `extra` intactos para el JSON
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.excepcion = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            ColaSinBloqueo.descartados += 1
+
+
+_listener = None
+
+
+def configurar_logging(nivel: str = None) -> logging.Logger:
+    """Configura el logger `jhk` para escribir vía una cola y un hilo en segundo plano.
+
+    Los handlers de request solo encolan el registro; la escritura a stdout la
+    hace el QueueListener, así que el hot path nunca bloquea en I/O.
+    """
+    global _listener
+    logger = logging.getLogger("jhk")
+    logger.setLevel((nivel or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if _listener is not None:
+        return logger
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(JSONFormatter())
+
+    cola = queue.Queue(maxsize=int(os.getenv("LOG_COLA_MAX", "10000")))
+    logger.handlers = [ColaSinBloqueo(cola)]
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def detener_logging() -> None:
+    """Vacía la cola y detiene el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def reiniciar_logging() -> None:
+    """Tras un fork: el hilo de escritura quedó en el proceso padre, crear uno nuevo con su propia cola"""
+    global _listener
+    _listener = None
+    configurar_logging()
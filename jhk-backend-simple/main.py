@@ -1,15 +1,22 @@
+# Primero: el arranque mide desde aquí el import del resto (SDK de Transbank, SQLAlchemy, ...)
+from arranque import arranque, abrir_conexiones, abrir_conexiones_async, congelar_memoria
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, case, false, insert, select, update
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
-import string
 import os
+import time
 import json
+import base64
+import hmac
+from types import SimpleNamespace
 from typing import List
 from pydantic import BaseModel
 from fastapi import Query
@@ -21,13 +28,42 @@ from fastapi import Request, Depends, HTTPException
 from sqlalchemy.orm import Session
 from fastapi.responses import RedirectResponse
 
-from models import get_db, Producto, VentaRetail, LogsWebpay, TransaccionesWebpay
+from models import (
+    get_db, get_async_db, engine, async_engine, replica_engine, estado_pool, SessionLocal, ReplicaSessionLocal,
+    DB_POOL_SIZE, DB_REPLICA_POOL_SIZE,
+    Producto, ProductoImagen, VentaRetail, TransaccionesWebpay, ReservaStock, Feriado, PlazoEntrega, VersionCatalogo,
+    precio_efectivo
+)
+from cache import TTLCache, VersionCompartida
+from cache_http import RespuestaCacheable
+from compresion import CompresionMiddleware
+from metricas import MetricasMiddleware, colector_estado, exportar
+from busqueda import IndiceBusqueda, SincronizadorBusqueda
+from replicas import EnrutadorLecturas
+from visitas import ContadorVisitas
+from logger import configurar_logging, detener_logging, reiniciar_logging
+from auditoria import AuditoriaWebpay
+from ordenes import GeneradorIds, formatear as formatear_orden
+from entregas import CalendarioEntregas
+from inventario import SinStock, LiberadorReservas, reservar_stock, extender_reservas, confirmar_reservas
+from pasarela import ClienteTransbank, CircuitBreaker, PasarelaNoDisponible, TransaccionLocal
+from trabajos import ProcesadorTrabajos, resumen as resumen_trabajos, muertos as trabajos_muertos, reintentar as reintentar_trabajo
+from postventa import encolar_postpago, registrar as registrar_postventa
+from imagenes import VERSIONES_NULAS
+from reportes import (
+    registrar_ventas, mover_estado_pago, lineas_orden as lineas_orden_reporte,
+    consultar as consultar_reporte_ventas, reconstruir as reconstruir_reporte_ventas
+)
+
+# Logging estructurado (JSON) escrito por un hilo en segundo plano; nivel vía LOG_LEVEL
+log = configurar_logging()
 
 # Crear aplicación FastAPI
 app = FastAPI(
     title="JHK Muebles API",
     description="API simple para tienda de muebles JHK",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
@@ -39,16 +75,309 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión brotli/gzip de respuestas JSON desde COMPRESION_MINIMO bytes
+app.add_middleware(CompresionMiddleware, minimo=int(os.getenv("COMPRESION_MINIMO", "1024")))
+
+# Latencia, consultas SQL y tiempo de base por ruta (ver /metrics); METRICAS_LENTO_MS > 0 activa
+# el log de requests lentos con su SQL. Se agrega al final para que mida también la compresión
+app.add_middleware(MetricasMiddleware, umbral_lento_ms=float(os.getenv("METRICAS_LENTO_MS", "0")))
+
 COMMERCE_CODE = "597055555532"
 API_KEY = "579B532A7440BB0C9079DED94D31EA1615BACEB56610332264630D42D0A36B1C"
 
+# Tiempo máximo por llamada a Transbank (también limita el request HTTP del SDK)
+WEBPAY_TIMEOUT = float(os.getenv("WEBPAY_TIMEOUT", "10"))
+# URL de un Transbank falso local para pruebas (ver benchmarks/fake_transbank.py)
+WEBPAY_FAKE_URL = os.getenv("WEBPAY_FAKE_URL")
+
 webpay_options = WebpayOptions(
     commerce_code=COMMERCE_CODE,
     api_key=API_KEY,
-    integration_type=IntegrationType.TEST
+    integration_type=IntegrationType.TEST,
+    timeout=WEBPAY_TIMEOUT
+)
+
+transaction = TransaccionLocal(webpay_options, WEBPAY_FAKE_URL) if WEBPAY_FAKE_URL else Transaction(webpay_options)
+
+# Llamadas a Transbank en un pool de hilos acotado, con reintentos y circuit breaker
+cliente_transbank = ClienteTransbank(
+    transaction,
+    max_workers=int(os.getenv("WEBPAY_MAX_WORKERS", "8")),
+    timeout=WEBPAY_TIMEOUT,
+    reintentos=int(os.getenv("WEBPAY_REINTENTOS", "2")),
+    breaker=CircuitBreaker(
+        umbral=int(os.getenv("WEBPAY_CIRCUITO_UMBRAL", "5")),
+        espera=float(os.getenv("WEBPAY_CIRCUITO_ESPERA", "30"))
+    )
+)
+
+# Generador de números de orden (WORKER_ID distinto por máquina si hay más de una)
+generador_ordenes = GeneradorIds(
+    worker_id=int(os.environ["WORKER_ID"]) if os.getenv("WORKER_ID") else None
 )
 
-transaction = Transaction(webpay_options)
+# Calendario de días hábiles (feriados de Chile + plazos por región/comuna)
+calendario_entregas = CalendarioEntregas()
+
+def cargar_calendario_entregas():
+    db = SessionLocal()
+    try:
+        feriados = [(f.fecha, f.nombre) for f in db.query(Feriado)]
+        plazos = [(p.region, p.comuna, p.dias_habiles) for p in db.query(PlazoEntrega)]
+    finally:
+        db.close()
+    calendario_entregas.cargar(feriados, plazos)
+    return {"feriados_extra": len(feriados), "plazos": len(plazos)}
+
+# Cache del catálogo (payloads ya serializados de ProductoResponse)
+CATALOGO_CACHE_TTL = float(os.getenv("CATALOGO_CACHE_TTL", "300"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Cache HTTP (navegador y proxy_cache de nginx); las respuestas llevan ETag y Last-Modified
+CATALOGO_MAX_AGE = int(os.getenv("CATALOGO_MAX_AGE", "60"))
+CATALOGO_STALE = int(os.getenv("CATALOGO_STALE", "300"))
+CATALOGO_CACHE_CONTROL = f"public, max-age={CATALOGO_MAX_AGE}, stale-while-revalidate={CATALOGO_STALE}"
+# El detalle se revalida siempre (304 si no cambió) para que cada visita llegue al contador
+DETALLE_CACHE_CONTROL = f"public, no-cache, stale-while-revalidate={CATALOGO_STALE}"
+
+# Cada worker tiene sus caches: /admin/cache/invalidar sube catalogo_version y los demás
+# workers la ven a lo más CATALOGO_VERSION_INTERVALO segundos después, al consultar su cache
+def leer_version_catalogo() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(VersionCatalogo.version).filter(VersionCatalogo.id == 1).scalar() or 0
+    finally:
+        db.close()
+
+def incrementar_version_catalogo() -> None:
+    db = SessionLocal()
+    try:
+        actualizadas = db.query(VersionCatalogo).filter(VersionCatalogo.id == 1).update(
+            {VersionCatalogo.version: VersionCatalogo.version + 1, VersionCatalogo.actualizado_en: datetime.now()},
+            synchronize_session=False
+        )
+        if not actualizadas:
+            db.add(VersionCatalogo(id=1, version=1))
+        db.commit()
+    finally:
+        db.close()
+
+def vaciar_cache_catalogo():
+    cache_productos.invalidate()
+    cache_listados.invalidate()
+    cache_totales.invalidate()
+    # Corre dentro del get() de un request: la búsqueda se reindexa en su hilo, no aquí
+    sincronizador_busqueda.avisar()
+
+version_catalogo = VersionCompartida(
+    leer_version_catalogo, incrementar_version_catalogo, vaciar_cache_catalogo,
+    intervalo=float(os.getenv("CATALOGO_VERSION_INTERVALO", "2"))
+)
+cache_listados = TTLCache(ttl=CATALOGO_CACHE_TTL, version=version_catalogo)
+cache_productos = TTLCache(ttl=CATALOGO_CACHE_TTL, max_entries=10000, version=version_catalogo)
+cache_totales = TTLCache(ttl=CATALOGO_CACHE_TTL, version=version_catalogo)
+
+# Resumen de órdenes que consulta la página de éxito. Solo se cachean las pagadas:
+# el cache es de cada worker y una pendiente cacheada en otro worker seguiría
+# mostrándose sin pagar después de confirmar_webpay.
+ORDEN_CACHE_TTL = float(os.getenv("ORDEN_CACHE_TTL", "5"))
+ORDEN_CACHE_CONTROL = "private, no-cache"
+cache_ordenes = TTLCache(ttl=ORDEN_CACHE_TTL, max_entries=10000)
+
+# Visitas de productos: se acumulan en memoria y se escriben en lote
+contador_visitas = ContadorVisitas(intervalo=float(os.getenv("VISITAS_FLUSH_SEGUNDOS", "30")))
+
+@app.on_event("startup")
+def iniciar_contador_visitas():
+    contador_visitas.iniciar()
+
+@app.on_event("shutdown")
+def detener_contador_visitas():
+    contador_visitas.detener()
+
+@app.on_event("shutdown")
+def cerrar_cliente_transbank():
+    cliente_transbank.cerrar()
+
+# Auditoría de Webpay (logs_webpay) escrita en lotes fuera del request
+auditoria_webpay = AuditoriaWebpay(
+    max_pendientes=int(os.getenv("AUDITORIA_MAX_PENDIENTES", "10000")),
+    lote=int(os.getenv("AUDITORIA_LOTE", "200")),
+    intervalo=float(os.getenv("AUDITORIA_INTERVALO", "1")),
+    archivo_respaldo=os.getenv("AUDITORIA_RESPALDO", "logs_webpay_pendientes.jsonl")
+)
+
+@app.on_event("startup")
+def iniciar_auditoria_webpay():
+    auditoria_webpay.iniciar()
+
+@app.on_event("shutdown")
+def detener_auditoria_webpay():
+    auditoria_webpay.detener()
+
+@app.on_event("startup")
+def iniciar_calendario_entregas():
+    try:
+        log.info("Calendario de entregas cargado", extra=cargar_calendario_entregas())
+    except Exception:
+        # Sin las tablas se usan solo los feriados legales y el plazo por defecto
+        log.exception("No se pudo cargar feriados/plazos de entrega")
+
+# Reservas de stock: duran RESERVA_MINUTOS desde la compra (o desde que se inicia el pago)
+RESERVA_MINUTOS = float(os.getenv("RESERVA_MINUTOS", "20"))
+liberador_reservas = LiberadorReservas(intervalo=float(os.getenv("RESERVAS_INTERVALO", "60")))
+
+@app.on_event("startup")
+def iniciar_liberador_reservas():
+    liberador_reservas.iniciar()
+
+@app.on_event("shutdown")
+def detener_liberador_reservas():
+    liberador_reservas.detener()
+
+# Trabajos después del pago (correo, logística): se encolan en la transacción del pago.
+# Con TRABAJOS_HILOS=0 la API solo encola y los ejecuta `python trabajos.py`
+registrar_postventa()
+procesador_trabajos = ProcesadorTrabajos(
+    hilos=int(os.getenv("TRABAJOS_HILOS", "1")),
+    intervalo=float(os.getenv("TRABAJOS_INTERVALO", "2"))
+)
+
+@app.on_event("startup")
+def iniciar_procesador_trabajos():
+    procesador_trabajos.iniciar()
+
+@app.on_event("shutdown")
+def detener_procesador_trabajos():
+    procesador_trabajos.detener()
+
+# Lecturas del catálogo y de órdenes a la réplica (DB_REPLICA_HOST); las escrituras siguen en el primario
+enrutador_lecturas = EnrutadorLecturas(
+    SessionLocal,
+    ReplicaSessionLocal if replica_engine is not None else None,
+    pegajoso=float(os.getenv("DB_REPLICA_PEGAJOSO", "60"))
+)
+
+def get_db_lectura(request: Request):
+    db = enrutador_lecturas.sesion(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Arranque: abrir los pools y precargar catálogo, destacados e índice antes de recibir tráfico.
+# Con gunicorn --preload (gunicorn.conf.py) la precarga corre una vez en el maestro y los
+# workers la heredan al hacer fork; cada worker solo abre sus propias conexiones.
+PRECARGA_DESTACADOS = int(os.getenv("PRECARGA_DESTACADOS", "50"))
+
+def paginas_precargadas(db: Session):
+    """(limit, tipo, orden) de las páginas que pide el frontend al entrar: inicio y cada categoría"""
+    tipos = [
+        tipo for (tipo,) in db.query(Producto.tipo_producto)
+        .filter(Producto.tipo_producto_venta == "local").distinct() if tipo
+    ]
+    return [(8, None, None)] + [(100, tipo, "relevancia") for tipo in [None, *tipos]]
+
+def precargar_datos():
+    # Antes de llenar los caches: una invalidación posterior se detecta como cambio de versión
+    version_catalogo.revisar(forzar=True)
+    db = ReplicaSessionLocal()
+    try:
+        with arranque.fase("catalogo") as detalle:
+            paginas = paginas_precargadas(db)
+            for limit, tipo, orden in paginas:
+                pagina_catalogo(db, limit, None, tipo, None, None, None, orden)
+            detalle["paginas"] = len(paginas)
+
+        with arranque.fase("destacados") as detalle:
+            ids = [
+                producto_id for (producto_id,) in db.query(Producto.id)
+                .filter(Producto.tipo_producto_venta == "local")
+                .order_by(Producto.visitas.desc()).limit(PRECARGA_DESTACADOS)
+            ]
+            for producto_id in ids:
+                detalle_producto(db, producto_id)
+            detalle["productos"] = len(ids)
+    finally:
+        db.close()
+
+    with arranque.fase("busqueda") as detalle:
+        detalle["productos"] = sincronizador_busqueda.cargar_todo()
+
+def precargar_maestro():
+    """gunicorn (when_ready): precargar en el maestro y soltar las conexiones antes del fork"""
+    precargar_datos()
+    engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+    arranque.precargado = True
+    congelar_memoria()
+
+def despues_de_fork():
+    """gunicorn (post_fork), ya en el worker"""
+    arranque.despues_de_fork()
+    # El hilo de logs del maestro no existe en el hijo
+    reiniciar_logging()
+
+@app.on_event("startup")
+async def calentar_worker():
+    # Antes del sincronizador de búsqueda, para que su hilo encuentre el índice ya cargado.
+    # Bloquear el loop aquí no importa, todavía no se atienden requests
+    with arranque.fase("pool_sync") as detalle:
+        detalle["conexiones"] = abrir_conexiones(engine, DB_POOL_SIZE)
+    if replica_engine is not None:
+        with arranque.fase("pool_replica") as detalle:
+            detalle["conexiones"] = abrir_conexiones(replica_engine, DB_REPLICA_POOL_SIZE)
+    with arranque.fase("pool_async") as detalle:
+        detalle["conexiones"] = await abrir_conexiones_async(async_engine, DB_POOL_SIZE)
+    if not arranque.precargado:
+        precargar_datos()
+
+# Búsqueda del catálogo: índice invertido en memoria, sincronizado por actualizado_en
+indice_busqueda = IndiceBusqueda()
+# Máximo de coincidencias que /productos y /productos/pagina filtran y ordenan con ?search=
+BUSQUEDA_MAX_CANDIDATOS = int(os.getenv("BUSQUEDA_MAX_CANDIDATOS", "1000"))
+sincronizador_busqueda = SincronizadorBusqueda(
+    indice_busqueda,
+    intervalo=float(os.getenv("BUSQUEDA_INTERVALO", "10")),
+    reconstruir_cada=float(os.getenv("BUSQUEDA_RECONSTRUIR", "3600"))
+)
+
+@app.on_event("startup")
+def iniciar_sincronizador_busqueda():
+    sincronizador_busqueda.iniciar()
+
+@app.on_event("shutdown")
+def detener_sincronizador_busqueda():
+    sincronizador_busqueda.detener()
+
+# Estado interno expuesto como gauges en /metrics (el mismo de los endpoints /admin)
+colector_estado.registrar("cache", cache_listados.stats, cache="listados")
+colector_estado.registrar("cache", cache_productos.stats, cache="productos")
+colector_estado.registrar("cache", cache_totales.stats, cache="totales")
+colector_estado.registrar("cache", cache_ordenes.stats, cache="ordenes")
+colector_estado.registrar("db_pool", lambda: estado_pool(engine), pool="sync")
+colector_estado.registrar("db_pool", lambda: estado_pool(async_engine.sync_engine), pool="async")
+if replica_engine is not None:
+    colector_estado.registrar("db_pool", lambda: estado_pool(replica_engine), pool="replica")
+colector_estado.registrar("lecturas", enrutador_lecturas.estado)
+colector_estado.registrar("arranque", arranque.estado)
+colector_estado.registrar("visitas", contador_visitas.pendientes)
+colector_estado.registrar("auditoria", auditoria_webpay.estado)
+colector_estado.registrar("webpay", cliente_transbank.estado)
+colector_estado.registrar("reservas", liberador_reservas.estado)
+colector_estado.registrar("busqueda", sincronizador_busqueda.estado)
+colector_estado.registrar("trabajos", procesador_trabajos.estado)
+
+@app.on_event("startup")
+def terminar_arranque():
+    # Último startup registrado: el worker ya puede atender
+    arranque.terminar()
+
+@app.on_event("shutdown")
+def cerrar_logging():
+    # Último en cerrarse: vacía la cola de logs pendientes
+    detener_logging()
 
 # Servir imágenes estáticas
 IMAGES_PATH = os.getenv("IMAGES_PATH", "/var/www/imagenes_jhk/productos")
@@ -56,6 +385,15 @@ if os.path.exists(IMAGES_PATH):
     app.mount("/static/productos", StaticFiles(directory=IMAGES_PATH), name="productos")
 
 # Esquemas Pydantic básicos
+class ImagenProducto(BaseModel):
+    original: str
+    miniatura: str
+    mediana: str
+    miniatura_webp: Optional[str] = None
+    mediana_webp: Optional[str] = None
+    ancho: Optional[int] = None
+    alto: Optional[int] = None
+
 class ProductoResponse(BaseModel):
     id: int
     sku: Optional[str] = None
@@ -68,7 +406,15 @@ class ProductoResponse(BaseModel):
     dimensiones: Optional[str] = None
     material: Optional[str] = None
     tiempo_entrega: Optional[str] = None
+    # En listados son miniaturas; en el detalle, los originales
     imagenes: List[str] = []
+    imagenes_webp: List[str] = []
+    imagenes_detalle: Optional[List[ImagenProducto]] = None
+
+class ProductoPagina(BaseModel):
+    productos: List[ProductoResponse]
+    total: int
+    next_cursor: Optional[str] = None
 
 class VentaCreate(BaseModel):
     cliente_final: str
@@ -91,6 +437,27 @@ class VentaResponse(BaseModel):
     estado_pago: str
     fecha_compra: datetime
 
+class LineaOrden(BaseModel):
+    id: int
+    producto: Optional[str] = None
+    sku: Optional[str] = None
+    precio: float
+    unidades: int
+    subtotal: float
+
+class OrdenResumen(BaseModel):
+    numero_orden: str
+    cliente_final: Optional[str] = None
+    estado: Optional[str] = None
+    estado_pago: Optional[str] = None
+    fecha_compra: Optional[datetime] = None
+    fecha_entrega: Optional[datetime] = None
+    fecha_pago: Optional[datetime] = None
+    codigo_autorizacion: Optional[str] = None
+    unidades: int
+    total: float
+    items: List[LineaOrden]
+
 class WebpayRequest(BaseModel):
     numero_orden: str
     monto: float
@@ -111,45 +478,91 @@ class VentaMultipleCreate(BaseModel):
     productos: List[ProductoEnVenta]
 
 @app.post("/ventas/multiple")
-def crear_venta_multiple(data: VentaMultipleCreate, db: Session = Depends(get_db)):
+def crear_venta_multiple(data: VentaMultipleCreate, response: Response, db: Session = Depends(get_db)):
     fecha_compra = datetime.now()
     numero_orden = generar_numero_orden()
-    ventas_creadas = []
+    # Igual que POST /ventas; una vez por orden, así todas las líneas quedan con el mismo cliente
+    cliente_id = generar_cliente_id(data.rut_documento)
 
+    # Un solo SELECT ... IN (...) para todos los productos del carrito
+    ids = {item.producto_id for item in data.productos}
+    productos = {p.id: p for p in db.query(Producto).filter(Producto.id.in_(ids)).all()} if ids else {}
+
+    # Una fila por línea del carrito, con las unidades en la columna `unidades`
+    filas = []
+    lineas = {}
     for item in data.productos:
-        producto = db.query(Producto).filter(Producto.id == item.producto_id).first()
-        if not producto:
+        producto = productos.get(item.producto_id)
+        if not producto or item.cantidad <= 0:
             continue
+        lineas[producto.id] = lineas.get(producto.id, 0) + item.cantidad
 
-        for _ in range(item.cantidad):
-            venta = VentaRetail(
-                cliente_id=9,
-                numero_orden=numero_orden,
-                cliente_final=data.cliente_final,
-                rut_documento=data.rut_documento,
-                email=data.email,
-                telefono=data.telefono,
-                fecha_compra=fecha_compra,
-                fecha_entrega=calcular_fecha_entrega(fecha_compra),
-                producto=producto.nombre,
-                precio=producto.precio_descuento or producto.precio_venta,
-                comuna=data.comuna,
-                direccion=data.direccion,
-                region=data.region,
-                sku=producto.sku,
-                metodo_pago=data.metodo_pago,
-                estado="nueva",
-                estado_pago="pendiente"
-            )
-            db.add(venta)
-            ventas_creadas.append(venta)
+        filas.append({
+            "cliente_id": cliente_id,
+            "numero_orden": numero_orden,
+            "cliente_final": data.cliente_final,
+            "rut_documento": data.rut_documento,
+            "email": data.email,
+            "telefono": data.telefono,
+            "fecha_compra": fecha_compra,
+            "fecha_entrega": calcular_fecha_entrega(fecha_compra, data.region, data.comuna, producto.tiempo_entrega),
+            "producto": producto.nombre,
+            "precio": producto.precio_descuento or producto.precio_venta,
+            "comuna": data.comuna,
+            "direccion": data.direccion,
+            "region": data.region,
+            "sku": producto.sku,
+            "unidades": item.cantidad,
+            "metodo_pago": data.metodo_pago,
+            "estado": "nueva",
+            "estado_pago": "pendiente"
+        })
+
+    ids_ventas = []
+    if filas:
+        try:
+            reservar_stock(db, numero_orden, lineas, RESERVA_MINUTOS)
+        except SinStock as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"Sin stock suficiente para {productos[e.producto_id].nombre}")
+
+        db.execute(insert(VentaRetail), filas)
+        registrar_ventas(db, filas)
+        ids_ventas = [
+            v.id for v in db.query(VentaRetail.id)
+            .filter(VentaRetail.numero_orden == numero_orden)
+            .order_by(VentaRetail.id)
+        ]
 
     db.commit()
-    return {"numero_orden": numero_orden, "ventas": [v.id for v in ventas_creadas]}
+    enrutador_lecturas.marcar_escritura(response)
+    return {"numero_orden": numero_orden, "ventas": ids_ventas}
+
+def consultar_lineas_orden(db: Session, numero_orden: str):
+    """Líneas de una orden con solo las columnas que se muestran (sin dirección ni RUT)"""
+    return db.execute(
+        select(
+            VentaRetail.id,
+            VentaRetail.numero_orden,
+            VentaRetail.cliente_final,
+            VentaRetail.producto,
+            VentaRetail.sku,
+            VentaRetail.precio,
+            VentaRetail.unidades,
+            VentaRetail.estado,
+            VentaRetail.estado_pago,
+            VentaRetail.fecha_compra,
+            VentaRetail.fecha_entrega,
+            VentaRetail.fecha_pago,
+            VentaRetail.codigo_autorizacion
+        )
+        .where(VentaRetail.numero_orden == numero_orden)
+        .order_by(VentaRetail.id)
+    ).all()
 
 @app.get("/ventas")
-def obtener_ventas_por_numero_orden(numero_orden: str = Query(...), db: Session = Depends(get_db)):
-    ventas = db.query(VentaRetail).filter(VentaRetail.numero_orden == numero_orden).all()
+def obtener_ventas_por_numero_orden(numero_orden: str = Query(...), db: Session = Depends(get_db_lectura)):
+    ventas = consultar_lineas_orden(db, numero_orden)
     if not ventas:
         raise HTTPException(status_code=404, detail="No se encontraron ventas con ese número de orden")
 
@@ -160,6 +573,7 @@ def obtener_ventas_por_numero_orden(numero_orden: str = Query(...), db: Session
             "cliente_final": v.cliente_final,
             "producto": v.producto,
             "precio": v.precio,
+            "unidades": v.unidades,
             "estado": v.estado,
             "estado_pago": v.estado_pago,
             "fecha_compra": v.fecha_compra,
@@ -170,23 +584,23 @@ def obtener_ventas_por_numero_orden(numero_orden: str = Query(...), db: Session
 
 # Funciones de utilidad
 def generar_numero_orden():
-    return ''.join(random.choices(string.digits, k=9))
+    # Único y creciente entre workers (ver ordenes.GeneradorIds)
+    return formatear_orden(generador_ordenes.siguiente())
 
-def generar_cliente_id():
+def generar_cliente_id(rut_documento: str):
+    """Id de cliente a partir del cuerpo del RUT (único por persona y cabe en INT)"""
+    cuerpo = rut_documento.split("-")[0].replace(".", "").strip()
+    if cuerpo.isdigit() and 0 < int(cuerpo) < 2**31:
+        return int(cuerpo)
     return random.randint(100000000, 999999999)
 
-def calcular_fecha_entrega(fecha_compra: datetime):
-    dias_agregados = 0
-    fecha_actual = fecha_compra
-    
-    while dias_agregados < 3:
-        fecha_actual += timedelta(days=1)
-        if fecha_actual.weekday() < 5:  # No es fin de semana
-            dias_agregados += 1
-    
-    return fecha_actual
+def calcular_fecha_entrega(fecha_compra: datetime, region: str = None, comuna: str = None,
+                           tiempo_entrega: str = None):
+    # Días hábiles según comuna/región y producto, sin fines de semana ni feriados
+    return calendario_entregas.fecha_entrega(fecha_compra, region, comuna, tiempo_entrega)
 
 def obtener_imagenes_producto(producto):
+    # Productos aún sin filas en producto_imagenes (ver imagenes.py)
     imagenes = []
     for i in range(1, 11):
         img = getattr(producto, f'img_{i}')
@@ -194,6 +608,198 @@ def obtener_imagenes_producto(producto):
             imagenes.append(f"/static/productos/{img}")
     return imagenes
 
+def cargar_imagenes(db: Session, producto_ids):
+    """Imágenes de varios productos en una sola consulta, agrupadas por producto"""
+    imagenes = {}
+    if producto_ids:
+        filas = (
+            db.query(ProductoImagen)
+            .filter(ProductoImagen.producto_id.in_(set(producto_ids)))
+            .order_by(ProductoImagen.producto_id, ProductoImagen.posicion)
+        )
+        for imagen in filas:
+            imagenes.setdefault(imagen.producto_id, []).append(imagen)
+    return imagenes
+
+def imagenes_vigentes(producto, imagenes):
+    """Filas de producto_imagenes que siguen iguales a las columnas img_N.
+
+    producto_imagenes solo se actualiza al correr imagenes.py: hasta entonces un
+    img_N cambiado o nuevo se sirve como original (sin versiones) y uno vaciado
+    deja de aparecer, en vez de seguir mostrando la fila vieja.
+    """
+    por_posicion = {imagen.posicion: imagen for imagen in imagenes}
+    vigentes = []
+    for posicion in range(1, 11):
+        archivo = getattr(producto, f"img_{posicion}")
+        if not archivo:
+            continue
+        imagen = por_posicion.get(posicion)
+        if imagen is None or imagen.archivo != archivo:
+            imagen = SimpleNamespace(archivo=archivo, **VERSIONES_NULAS)
+        vigentes.append(imagen)
+    return vigentes
+
+def url_imagen(ruta):
+    return f"/static/productos/{ruta}" if ruta else None
+
+def serializar_imagenes(imagenes, listado: bool):
+    """(imagenes, imagenes_webp, imagenes_detalle) a partir de filas de producto_imagenes"""
+    if listado:
+        return (
+            [url_imagen(i.miniatura or i.archivo) for i in imagenes],
+            [url_imagen(i.miniatura_webp or i.miniatura or i.archivo) for i in imagenes],
+            None
+        )
+    # Mismos campos que ImagenProducto
+    detalle = [
+        {
+            "original": url_imagen(i.archivo),
+            "miniatura": url_imagen(i.miniatura or i.archivo),
+            "mediana": url_imagen(i.mediana or i.archivo),
+            "miniatura_webp": url_imagen(i.miniatura_webp),
+            "mediana_webp": url_imagen(i.mediana_webp),
+            "ancho": i.ancho,
+            "alto": i.alto
+        }
+        for i in imagenes
+    ]
+    return [d["original"] for d in detalle], [d["mediana_webp"] or d["mediana"] for d in detalle], detalle
+
+def serializar_producto(producto, imagenes=None, listado: bool = True):
+    """Dict con los campos de ProductoResponse, armado directo desde la fila.
+
+    Los tipos ya vienen de las columnas, así que no se pasa por Pydantic: el
+    resultado va a RespuestaCacheable sin una segunda validación.
+    """
+    if imagenes:
+        imagenes = imagenes_vigentes(producto, imagenes)
+    if imagenes:
+        urls, urls_webp, detalle = serializar_imagenes(imagenes, listado)
+    else:
+        urls = obtener_imagenes_producto(producto)
+        urls_webp, detalle = urls, None
+    return {
+        "id": producto.id,
+        "sku": producto.sku,
+        "nombre": producto.nombre,
+        "precio_venta": producto.precio_venta,
+        "tipo_producto": producto.tipo_producto,
+        "descripcion_producto": producto.descripcion_producto,
+        "precio_descuento": producto.precio_descuento,
+        "visitas": producto.visitas,
+        "dimensiones": producto.dimensiones,
+        "material": producto.material,
+        "tiempo_entrega": producto.tiempo_entrega,
+        "imagenes": urls,
+        "imagenes_webp": urls_webp,
+        "imagenes_detalle": detalle
+    }
+
+# Ordenamientos del catálogo (mismos valores que usa el frontend).
+# Cada clave es (expresión, descendente); Producto.id desempata en orden ascendente.
+ORDENES_CATALOGO = {
+    "relevancia": [(case((func.nullif(Producto.precio_descuento, 0).is_(None), 1), else_=0), False), (Producto.visitas, True)],
+    "precio_asc": [(precio_efectivo, False)],
+    "precio_desc": [(precio_efectivo, True)],
+    "nombre_asc": [(Producto.nombre, False)],
+    "visitas_desc": [(Producto.visitas, True)],
+}
+
+def validar_orden(orden: Optional[str]):
+    if orden and orden not in ORDENES_CATALOGO:
+        raise HTTPException(status_code=400, detail=f"Orden no válido. Opciones: {', '.join(ORDENES_CATALOGO)}")
+
+def consultar_catalogo(db: Session, tipo, search, precio_min, precio_max, *columnas):
+    """Query base del catálogo local con los filtros de búsqueda y precio"""
+    query = db.query(Producto, *columnas).filter(Producto.tipo_producto_venta == "local")
+
+    if tipo:
+        query = query.filter(Producto.tipo_producto == tipo)
+
+    if search and indice_busqueda.listo:
+        # Mismas coincidencias que /productos/buscar (plurales, tildes, prefijos, errores de tipeo).
+        # Tipo y precio se filtran también en el índice, y si aún quedan más de
+        # BUSQUEDA_MAX_CANDIDATOS se listan solo los más relevantes (el IN no crece con el catálogo)
+        ids = indice_busqueda.ids(search, tipo, precio_min, precio_max, limite=BUSQUEDA_MAX_CANDIDATOS)
+        query = query.filter(Producto.id.in_(ids) if ids else false())
+    elif search:
+        query = query.filter(
+            Producto.nombre.icontains(search, autoescape=True)
+            | Producto.descripcion_producto.icontains(search, autoescape=True)
+            | Producto.sku.icontains(search, autoescape=True)
+        )
+
+    if precio_min is not None:
+        query = query.filter(precio_efectivo >= precio_min)
+    if precio_max is not None:
+        query = query.filter(precio_efectivo <= precio_max)
+
+    return query
+
+def ordenar_catalogo(query, claves):
+    orden = [expr.desc() if descendente else expr.asc() for expr, descendente in claves]
+    return query.order_by(*orden, Producto.id.asc())
+
+def contar_catalogo(db: Session, tipo, search, precio_min, precio_max):
+    """Total de productos para los filtros dados (cacheado aparte de las páginas)"""
+    clave = (tipo, search, precio_min, precio_max)
+    total = cache_totales.get(clave)
+    if total is None:
+        total = consultar_catalogo(db, tipo, search, precio_min, precio_max).with_entities(
+            func.count(Producto.id)
+        ).scalar()
+        cache_totales.set(clave, total)
+    return total
+
+def codificar_cursor(valores):
+    datos = json.dumps(valores, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, n_valores: int):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        valores = None
+    if not isinstance(valores, list) or len(valores) != n_valores:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valores
+
+def condicion_keyset(claves, valores):
+    """Filas posteriores a `valores` según el orden (claves..., id asc).
+
+    MySQL ordena los NULL primero en ASC y al final en DESC; las comparaciones
+    respetan ese orden para no saltarse filas con claves nulas.
+    """
+    exprs = [expr for expr, _ in claves] + [Producto.id]
+    direcciones = [descendente for _, descendente in claves] + [False]
+    condiciones = []
+    for i, (expr, descendente) in enumerate(zip(exprs, direcciones)):
+        iguales = [exprs[j].is_(None) if valores[j] is None else exprs[j] == valores[j] for j in range(i)]
+        if valores[i] is None:
+            siguiente = false() if descendente else expr.is_not(None)
+        elif descendente:
+            siguiente = or_(expr < valores[i], expr.is_(None))
+        else:
+            siguiente = expr > valores[i]
+        condiciones.append(and_(*iguales, siguiente))
+    return or_(*condiciones)
+
+def verificar_admin(request: Request):
+    # Sin ADMIN_TOKEN los endpoints de administración no existen (no quedan abiertos)
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # También como Bearer, que es lo que envía Prometheus (`authorization` en el scrape_config)
+    recibidos = (
+        request.headers.get("X-Admin-Token") or "",
+        request.headers.get("Authorization", "").removeprefix("Bearer "),
+    )
+    # Comparación en tiempo constante; se evalúan ambos headers siempre
+    validos = [hmac.compare_digest(recibido.encode(), ADMIN_TOKEN.encode()) for recibido in recibidos]
+    if not any(validos):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
 # ENDPOINTS
 
 @app.get("/")
@@ -202,72 +808,159 @@ def root():
 
 @app.get("/productos", response_model=List[ProductoResponse]) 
 def listar_productos(
+    request: Request,
     skip: int = 0, 
     limit: int = 50, 
     tipo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    search: Optional[str] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+    orden: Optional[str] = None,
+    db: Session = Depends(get_db_lectura)
 ):
     """Listar productos del catálogo (solo tipo_producto_venta = 'local')"""
-    query = db.query(Producto).filter(Producto.tipo_producto_venta == "local")
-    
-    if tipo:
-        query = query.filter(Producto.tipo_producto == tipo)
+    validar_orden(orden)
+
+    search = search.strip() if search else None
+    clave = (tipo, skip, limit, search, precio_min, precio_max, orden)
+    respuesta = cache_listados.get(clave)
+    if respuesta is not None:
+        return respuesta.responder(request, CATALOGO_CACHE_CONTROL)
+
+    query = consultar_catalogo(db, tipo, search, precio_min, precio_max)
+
+    if orden:
+        query = ordenar_catalogo(query, ORDENES_CATALOGO[orden])
     
     productos = query.offset(skip).limit(limit).all()
     
-    productos_response = []
-    for producto in productos:
-        producto_dict = {
-            "id": producto.id,
-            "sku": producto.sku,
-            "nombre": producto.nombre,
-            "precio_venta": producto.precio_venta,
-            "tipo_producto": producto.tipo_producto,
-            "descripcion_producto": producto.descripcion_producto,
-            "precio_descuento": producto.precio_descuento,
-            "visitas": producto.visitas,
-            "dimensiones": producto.dimensiones,
-            "material": producto.material,
-            "tiempo_entrega": producto.tiempo_entrega,
-            "imagenes": obtener_imagenes_producto(producto)
-        }
-        productos_response.append(producto_dict)
+    imagenes = cargar_imagenes(db, [producto.id for producto in productos])
+    productos_response = [serializar_producto(producto, imagenes.get(producto.id)) for producto in productos]
+    respuesta = RespuestaCacheable(productos_response)
+    cache_listados.set(clave, respuesta)
     
-    return productos_response
+    return respuesta.responder(request, CATALOGO_CACHE_CONTROL)
+
+@app.get("/productos/pagina", response_model=ProductoPagina)
+def paginar_productos(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    tipo: Optional[str] = None,
+    search: Optional[str] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+    orden: Optional[str] = None,
+    db: Session = Depends(get_db_lectura)
+):
+    """Listar el catálogo paginando por cursor (clave de orden, id) en vez de offset"""
+    validar_orden(orden)
+
+    search = search.strip() if search else None
+    respuesta = pagina_catalogo(db, limit, cursor, tipo, search, precio_min, precio_max, orden)
+    return respuesta.responder(request, CATALOGO_CACHE_CONTROL)
+
+def pagina_catalogo(db: Session, limit, cursor, tipo, search, precio_min, precio_max, orden):
+    """Página de /productos/pagina desde el cache o la base (también la usa la precarga)"""
+    clave = ("pagina", tipo, limit, cursor, search, precio_min, precio_max, orden)
+    respuesta = cache_listados.get(clave)
+    if respuesta is not None:
+        return respuesta
+
+    claves = ORDENES_CATALOGO[orden] if orden else []
+    # Las columnas extra (claves de orden + id) forman el cursor de la última fila
+    columnas = [expr for expr, _ in claves] + [Producto.id]
+    query = consultar_catalogo(db, tipo, search, precio_min, precio_max, *columnas)
+    if cursor:
+        query = query.filter(condicion_keyset(claves, decodificar_cursor(cursor, len(columnas))))
+
+    filas = ordenar_catalogo(query, claves).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        next_cursor = codificar_cursor(list(filas[-1][1:]))
+
+    imagenes = cargar_imagenes(db, [fila[0].id for fila in filas])
+    pagina = {
+        "productos": [serializar_producto(fila[0], imagenes.get(fila[0].id)) for fila in filas],
+        "total": contar_catalogo(db, tipo, search, precio_min, precio_max),
+        "next_cursor": next_cursor
+    }
+    respuesta = RespuestaCacheable(pagina)
+    cache_listados.set(clave, respuesta)
+    return respuesta
+
+@app.get("/productos/buscar", response_model=ProductoPagina)
+def buscar_productos(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(24, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    tipo: Optional[str] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+    db: Session = Depends(get_db_lectura)
+):
+    """Buscar en el catálogo ordenando por relevancia (coincidencia ponderada por visitas)"""
+    q = q.strip()
+    clave = ("buscar", q, limit, offset, tipo, precio_min, precio_max)
+    respuesta = cache_listados.get(clave)
+    if respuesta is not None:
+        return respuesta.responder(request, CATALOGO_CACHE_CONTROL)
+
+    if indice_busqueda.listo:
+        ids, total = indice_busqueda.buscar(q, limit, offset, tipo, precio_min, precio_max)
+        filas = {producto.id: producto for producto in db.query(Producto).filter(Producto.id.in_(ids))} if ids else {}
+        # El índice puede ir unos segundos atrás: se omiten los que ya no están en la tabla
+        productos = [filas[producto_id] for producto_id in ids if producto_id in filas]
+    else:
+        # Índice aún cargando (recién iniciado): búsqueda por substring, más visitados primero
+        query = consultar_catalogo(db, tipo, q, precio_min, precio_max)
+        total = contar_catalogo(db, tipo, q, precio_min, precio_max)
+        productos = query.order_by(Producto.visitas.desc(), Producto.id.asc()).offset(offset).limit(limit).all()
+
+    imagenes = cargar_imagenes(db, [producto.id for producto in productos])
+    respuesta = RespuestaCacheable({
+        "productos": [serializar_producto(producto, imagenes.get(producto.id)) for producto in productos],
+        "total": total
+    })
+    if indice_busqueda.listo:
+        cache_listados.set(clave, respuesta)
+
+    return respuesta.responder(request, CATALOGO_CACHE_CONTROL)
 
 @app.get("/productos/{producto_id}", response_model=ProductoResponse)
-def obtener_producto(producto_id: int, db: Session = Depends(get_db)):
+def obtener_producto(producto_id: int, request: Request, db: Session = Depends(get_db_lectura)):
     """Obtener detalle de un producto (solo si tipo_producto_venta = 'local')"""
-    producto = db.query(Producto).filter(
-        Producto.id == producto_id,
-        Producto.tipo_producto_venta == "local"
-    ).first()
-    
-    if not producto:
+    respuesta = detalle_producto(db, producto_id)
+    if respuesta is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado o no disponible para venta local")
+
+    # Incrementar visitas (se escriben en lote por el contador), también en los 304
+    contador_visitas.registrar(producto_id)
     
-    # Incrementar visitas
-    producto.visitas += 1
-    db.commit()
-    
-    return {
-        "id": producto.id,
-        "sku": producto.sku,
-        "nombre": producto.nombre,
-        "precio_venta": producto.precio_venta,
-        "tipo_producto": producto.tipo_producto,
-        "descripcion_producto": producto.descripcion_producto,
-        "precio_descuento": producto.precio_descuento,
-        "visitas": producto.visitas,
-        "dimensiones": producto.dimensiones,
-        "material": producto.material,
-        "tiempo_entrega": producto.tiempo_entrega,
-        "imagenes": obtener_imagenes_producto(producto)
-    }
+    return respuesta.responder(request, DETALLE_CACHE_CONTROL)
 
 
+def detalle_producto(db: Session, producto_id: int):
+    """Detalle serializado desde el cache o la base; None si no existe o no es local"""
+    respuesta = cache_productos.get(producto_id)
+    if respuesta is None:
+        producto = db.query(Producto).filter(
+            Producto.id == producto_id,
+            Producto.tipo_producto_venta == "local"
+        ).first()
+        if not producto:
+            return None
+
+        imagenes = cargar_imagenes(db, [producto_id]).get(producto_id)
+        respuesta = RespuestaCacheable(serializar_producto(producto, imagenes, listado=False))
+        cache_productos.set(producto_id, respuesta)
+    return respuesta
+
 @app.post("/ventas", response_model=VentaResponse)
-def crear_venta(venta: VentaCreate, db: Session = Depends(get_db)):
+def crear_venta(venta: VentaCreate, response: Response, db: Session = Depends(get_db)):
     """Crear orden pendiente de pago"""
     producto = db.query(Producto).filter(Producto.id == venta.producto_id).first()
     if not producto:
@@ -276,15 +969,21 @@ def crear_venta(venta: VentaCreate, db: Session = Depends(get_db)):
     numero_orden = generar_numero_orden()
     fecha_compra = datetime.now()
 
+    try:
+        reservar_stock(db, numero_orden, {producto.id: 1}, RESERVA_MINUTOS)
+    except SinStock:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Sin stock suficiente para {producto.nombre}")
+
     nueva_venta = VentaRetail(
-        cliente_id=generar_cliente_id(),
+        cliente_id=generar_cliente_id(venta.rut_documento),
         numero_orden=numero_orden,
         cliente_final=venta.cliente_final,
         rut_documento=venta.rut_documento,
         email=venta.email,
         telefono=venta.telefono,
         fecha_compra=fecha_compra,
-        fecha_entrega=calcular_fecha_entrega(fecha_compra),
+        fecha_entrega=calcular_fecha_entrega(fecha_compra, venta.region, venta.comuna, producto.tiempo_entrega),
         producto=producto.nombre,
         precio=producto.precio_descuento or producto.precio_venta,
         comuna=venta.comuna,
@@ -297,8 +996,13 @@ def crear_venta(venta: VentaCreate, db: Session = Depends(get_db)):
     )
 
     db.add(nueva_venta)
+    registrar_ventas(db, [{
+        "fecha_compra": fecha_compra, "sku": nueva_venta.sku, "region": nueva_venta.region,
+        "comuna": nueva_venta.comuna, "estado_pago": "pendiente", "unidades": 1, "precio": nueva_venta.precio
+    }])
     db.commit()
     db.refresh(nueva_venta)
+    enrutador_lecturas.marcar_escritura(response)
 
     return {
         "id": nueva_venta.id,
@@ -312,9 +1016,10 @@ def crear_venta(venta: VentaCreate, db: Session = Depends(get_db)):
     }
 
 @app.get("/ventas/{numero_orden}", response_model=VentaResponse)
-def obtener_venta(numero_orden: str, db: Session = Depends(get_db)):
-    """Obtener estado de una orden"""
-    venta = db.query(VentaRetail).filter(VentaRetail.numero_orden == numero_orden).first()
+def obtener_venta(numero_orden: str, db: Session = Depends(get_db_lectura)):
+    """Obtener estado de una orden (primera línea; ver /ordenes/{numero_orden} para el resumen completo)"""
+    ventas = consultar_lineas_orden(db, numero_orden)
+    venta = ventas[0] if ventas else None
     
     if not venta:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
@@ -330,8 +1035,51 @@ def obtener_venta(numero_orden: str, db: Session = Depends(get_db)):
         "fecha_compra": venta.fecha_compra
     }
 
+@app.get("/ordenes/{numero_orden}", response_model=OrdenResumen)
+def resumen_orden(numero_orden: str, request: Request, db: Session = Depends(get_db_lectura)):
+    """Resumen de una orden con todas sus líneas y totales (lo consulta la página de éxito)"""
+    # Quien acaba de pagar lee del primario; el cache pudo llenarse desde la réplica atrasada
+    respuesta = None if enrutador_lecturas.es_pegajoso(request) else cache_ordenes.get(numero_orden)
+    if respuesta is None:
+        lineas = consultar_lineas_orden(db, numero_orden)
+        if not lineas:
+            raise HTTPException(status_code=404, detail="Orden no encontrada")
+
+        # Los datos de la orden se escriben igual en todas sus líneas
+        primera = lineas[0]
+        items = [
+            {
+                "id": l.id,
+                "producto": l.producto,
+                "sku": l.sku,
+                "precio": l.precio or 0,
+                "unidades": l.unidades or 1,
+                "subtotal": (l.precio or 0) * (l.unidades or 1)
+            }
+            for l in lineas
+        ]
+        respuesta = RespuestaCacheable({
+            "numero_orden": numero_orden,
+            "cliente_final": primera.cliente_final,
+            "estado": primera.estado,
+            "estado_pago": primera.estado_pago,
+            "fecha_compra": primera.fecha_compra,
+            "fecha_entrega": primera.fecha_entrega,
+            "fecha_pago": primera.fecha_pago,
+            "codigo_autorizacion": primera.codigo_autorizacion,
+            "unidades": sum(item["unidades"] for item in items),
+            "total": sum(item["subtotal"] for item in items),
+            "items": items
+        })
+        if primera.estado_pago == "pagada":
+            cache_ordenes.set(numero_orden, respuesta)
+
+    return respuesta.responder(request, ORDEN_CACHE_CONTROL)
+
 @app.post("/webpay/iniciar")
-async def iniciar_webpay(request: Request, db: Session = Depends(get_db)):
+async def iniciar_webpay(request: Request, respuesta: Response, db: AsyncSession = Depends(get_async_db)):
+    inicio = time.perf_counter()
+    numero_orden = None
     try:
         body = await request.json()
         numero_orden = body.get("numero_orden")
@@ -340,20 +1088,20 @@ async def iniciar_webpay(request: Request, db: Session = Depends(get_db)):
         if not numero_orden or monto <= 0:
             raise HTTPException(status_code=400, detail="Número de orden o monto inválido")
 
-        print(f"🔍 Iniciando transacción para orden: {numero_orden}")
+        log.debug("Iniciando transacción", extra={"numero_orden": numero_orden, "monto": monto})
         session_id = f"session_{numero_orden}_{datetime.now().timestamp()}"
         return_url = "http://localhost:3000/webpay/callback"  # Ajusta si estás en prod
 
         try:
-            # Crear transacción en WebPay
-            response = transaction.create(
+            # Crear transacción en WebPay (fuera del event loop)
+            t_pasarela = time.perf_counter()
+            response = await cliente_transbank.crear(
                 buy_order=numero_orden,
                 session_id=session_id,
                 amount=monto,
                 return_url=return_url
             )
-            
-            print(f"✅ Transacción WebPay creada. Token: {response.get('token')}")
+            pasarela_ms = round((time.perf_counter() - t_pasarela) * 1000, 1)
             
             # Guardar la transacción en la base de datos
             nueva_transaccion = TransaccionesWebpay(
@@ -365,135 +1113,221 @@ async def iniciar_webpay(request: Request, db: Session = Depends(get_db)):
             )
             
             db.add(nueva_transaccion)
-            db.commit()
-            db.refresh(nueva_transaccion)
+            # El cliente está pagando: que la reserva no venza mientras tanto
+            await db.run_sync(extender_reservas, numero_orden, RESERVA_MINUTOS)
+            await db.commit()
+            await db.refresh(nueva_transaccion)
             
-            print(f"✅ Transacción guardada en BD con ID: {nueva_transaccion.id}")
+            auditoria_webpay.registrar(
+                "info", f"Transacción iniciada por {monto}", numero_orden=numero_orden, token=response.get('token')
+            )
+            log.info("Transacción Webpay iniciada", extra={
+                "numero_orden": numero_orden,
+                "token": response.get('token'),
+                "transaccion_id": nueva_transaccion.id,
+                "monto": monto,
+                "pasarela_ms": pasarela_ms,
+                "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1)
+            })
             
+            enrutador_lecturas.marcar_escritura(respuesta)
             return response
+
+        except PasarelaNoDisponible as e:
+            error_msg = f"❌ Webpay no disponible: {str(e)}"
+            log.warning("Webpay no disponible", extra={"numero_orden": numero_orden, "error": str(e)})
+            auditoria_webpay.registrar("error_inicio", error_msg, numero_orden=numero_orden)
+            raise HTTPException(status_code=503, detail=error_msg)
             
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             error_msg = f"❌ Error creando transacción: {str(e)}"
-            print(error_msg)
+            log.exception("Error creando transacción", extra={"numero_orden": numero_orden})
+            auditoria_webpay.registrar("error_inicio", error_msg, numero_orden=numero_orden)
             raise HTTPException(status_code=500, detail=error_msg)
+
+    except HTTPException as http_error:
+        if http_error.status_code < 500:
+            auditoria_webpay.registrar("error_inicio", http_error.detail, numero_orden=numero_orden)
+        raise
             
     except Exception as e:
         error_msg = f"❌ Error en iniciar_webpay: {str(e)}"
-        print(error_msg)
+        log.exception("Error en iniciar_webpay", extra={"numero_orden": numero_orden})
+        auditoria_webpay.registrar("error_inicio", error_msg, numero_orden=numero_orden)
         raise HTTPException(status_code=500, detail=error_msg)
 
+async def buscar_transaccion(db: AsyncSession, token: str):
+    """Solo las columnas necesarias para confirmar (búsqueda por índice de token)"""
+    return (await db.execute(
+        select(
+            TransaccionesWebpay.numero_orden,
+            TransaccionesWebpay.monto,
+            TransaccionesWebpay.estado,
+            TransaccionesWebpay.authorization_code
+        ).where(TransaccionesWebpay.token == token)
+    )).first()
+
+def respuesta_confirmacion(transaccion, codigo_autorizacion: str = None):
+    # La página de éxito lee la orden enseguida: que vaya al primario
+    respuesta = JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "numero_orden": transaccion.numero_orden,
+            "codigo_autorizacion": codigo_autorizacion or transaccion.authorization_code,
+            "monto": transaccion.monto,
+            "redirect_url": f"http://localhost:3000/checkout/exito?orden={transaccion.numero_orden}"
+        }
+    )
+    enrutador_lecturas.marcar_escritura(respuesta)
+    return respuesta
+
 @app.api_route("/webpay/confirmar", methods=["GET", "POST"])
-async def confirmar_webpay(request: Request, db: Session = Depends(get_db)):
+async def confirmar_webpay(request: Request, db: AsyncSession = Depends(get_async_db)):
+    inicio = time.perf_counter()
+    token_ws = None
     try:
-        print("🔍 Iniciando confirmación de pago...")
-        
         # Obtener el token de los parámetros de consulta (tanto para GET como POST)
         token_ws = request.query_params.get("token")
-        print(f"🔑 Token de la URL: {token_ws}")
+        origen_token = "url"
         
         # Si no hay token en la URL y es POST, intentar obtenerlo del body
         if not token_ws and request.method == "POST":
-            print("📥 Intentando obtener token del body...")
             try:
                 form_data = await request.form()
                 token_ws = form_data.get("token_ws")
-                if token_ws:
-                    print(f"🔑 Token_ws del formulario: {token_ws}")
+                origen_token = "formulario"
             except Exception as form_error:
-                print(f"⚠️ No se pudo obtener el token del formulario: {str(form_error)}")
+                log.debug("No se pudo leer el token del formulario", extra={"error": str(form_error)})
                 # Intentar obtener el token del body como JSON
                 try:
                     json_data = await request.json()
                     token_ws = json_data.get("token_ws") or json_data.get("token")
-                    if token_ws:
-                        print(f"🔑 Token del JSON: {token_ws}")
+                    origen_token = "json"
                 except Exception as json_error:
-                    print(f"⚠️ No se pudo obtener el token del JSON: {str(json_error)}")
+                    log.debug("No se pudo leer el token del JSON", extra={"error": str(json_error)})
 
         if not token_ws:
             error_msg = " No se recibió el token_ws en la petición"
-            print(error_msg)
+            log.warning("Confirmación sin token_ws", extra={"metodo": request.method})
             raise HTTPException(status_code=400, detail=error_msg)
 
-        print(f" Buscando transacción con token: {token_ws}")
-        transaccion = db.query(TransaccionesWebpay).filter(TransaccionesWebpay.token == token_ws).first()
+        log.debug("Confirmando pago", extra={"token": token_ws, "origen_token": origen_token})
+        transaccion = await buscar_transaccion(db, token_ws)
 
         if not transaccion:
             error_msg = f" No se encontró transacción con token: {token_ws}"
-            print(error_msg)
+            log.warning("Transacción no encontrada", extra={"token": token_ws})
             raise HTTPException(status_code=404, detail=error_msg)
 
-        print(f" Transacción encontrada - Orden: {transaccion.numero_orden}")
+        # Callback repetido: devolver el resultado guardado sin escribir nada
+        if transaccion.estado == "completada":
+            log.info("Confirmación repetida", extra={"numero_orden": transaccion.numero_orden, "token": token_ws})
+            return respuesta_confirmacion(transaccion)
 
         try:
             # Confirmación simulada
             codigo_autorizacion = f"AUTH{random.randint(100000, 999999)}"
-            print(f" Generado código de autorización: {codigo_autorizacion}")
             
-            # Actualizar transacción
-            transaccion.estado = "completada"
-            transaccion.authorization_code = codigo_autorizacion
+            # Actualizar transacción solo si sigue iniciada: de varios callbacks
+            # simultáneos, solo uno aplica el cambio
+            resultado = await db.execute(
+                update(TransaccionesWebpay)
+                .where(TransaccionesWebpay.token == token_ws, TransaccionesWebpay.estado == "iniciada")
+                .values(estado="completada", authorization_code=codigo_autorizacion)
+                .execution_options(synchronize_session=False)
+            )
+
+            if resultado.rowcount != 1:
+                # Otro request la confirmó (o ya no es confirmable): leer el estado ya guardado
+                await db.rollback()
+                transaccion = await buscar_transaccion(db, token_ws)
+                if transaccion.estado == "completada":
+                    return respuesta_confirmacion(transaccion)
+                error_msg = f" La transacción está en estado '{transaccion.estado}' y no se puede confirmar"
+                auditoria_webpay.registrar(
+                    "error_confirmacion", error_msg, numero_orden=transaccion.numero_orden, token=token_ws
+                )
+                return JSONResponse(status_code=409, content={"success": False, "error": error_msg})
+
+            # Estado de pago anterior de cada línea, para moverla en ventas_diarias
+            lineas_reporte = await db.run_sync(lineas_orden_reporte, transaccion.numero_orden)
 
-            # Actualizar ventas asociadas
-            print(f" Buscando ventas para la orden: {transaccion.numero_orden}")
-            ventas = db.query(VentaRetail).filter(VentaRetail.numero_orden == transaccion.numero_orden).all()
+            # Actualizar ventas asociadas en un solo UPDATE
+            ventas = (await db.execute(
+                update(VentaRetail)
+                .where(VentaRetail.numero_orden == transaccion.numero_orden)
+                .values(
+                    estado_pago="pagada",
+                    estado="nueva",
+                    fecha_pago=datetime.now(),
+                    codigo_autorizacion=codigo_autorizacion
+                )
+                .execution_options(synchronize_session=False)
+            )).rowcount
             
             if not ventas:
-                print(" No se encontraron ventas asociadas a esta transacción")
-            else:
-                print(f" Actualizando {len(ventas)} venta(s) asociada(s)")
-                
-            for venta in ventas:
-                venta.estado_pago = "pagada"
-                venta.estado = "nueva"
-                venta.fecha_pago = datetime.now()
-                venta.codigo_autorizacion = codigo_autorizacion
-
-            # Registrar en logs
-            log_msg = f" Pago confirmado con código {codigo_autorizacion}"
-            print(log_msg)
-            db.add(LogsWebpay(
-                numero_orden=transaccion.numero_orden,
-                token=token_ws,
-                tipo="confirmacion",
-                mensaje=log_msg
-            ))
-
-            db.commit()
-            print(" Base de datos actualizada correctamente")
+                log.warning("Transacción sin ventas asociadas", extra={
+                    "numero_orden": transaccion.numero_orden, "token": token_ws
+                })
 
-            # Devolver respuesta JSON en lugar de redireccionar
-            print(f" Transacción {transaccion.numero_orden} confirmada exitosamente")
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "numero_orden": transaccion.numero_orden,
-                    "codigo_autorizacion": codigo_autorizacion,
-                    "monto": transaccion.monto,
-                    "redirect_url": f"http://localhost:3000/checkout/exito?orden={transaccion.numero_orden}"
-                }
+            # Descontar el stock reservado, en la misma transacción que el pago
+            sobreventas = await db.run_sync(confirmar_reservas, transaccion.numero_orden)
+            if sobreventas:
+                log.warning("Pago confirmado sin stock disponible (reserva vencida)", extra={
+                    "numero_orden": transaccion.numero_orden, "productos": sobreventas
+                })
+
+            # Después de las reservas: los checkouts bloquean productos y luego ventas_diarias, en ese orden
+            await db.run_sync(mover_estado_pago, lineas_reporte, "pagada")
+
+            # Correo y despacho quedan en la cola: si el pago hace rollback, tampoco se envían
+            await db.run_sync(encolar_postpago, transaccion.numero_orden)
+
+            await db.commit()
+            procesador_trabajos.avisar()
+
+            # Registrar en logs (se escribe en lote, fuera de esta transacción)
+            auditoria_webpay.registrar(
+                "info", f"Pago confirmado con código {codigo_autorizacion}",
+                numero_orden=transaccion.numero_orden, token=token_ws
             )
 
+            log.info("Pago confirmado", extra={
+                "numero_orden": transaccion.numero_orden,
+                "token": token_ws,
+                "codigo_autorizacion": codigo_autorizacion,
+                "ventas": ventas,
+                "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1)
+            })
+
+            # Devolver respuesta JSON en lugar de redireccionar
+            return respuesta_confirmacion(transaccion, codigo_autorizacion)
+
         except Exception as db_error:
-            db.rollback()
+            await db.rollback()
             error_msg = f" Error al actualizar la base de datos: {str(db_error)}"
-            print(error_msg)
+            log.exception("Error al actualizar la base de datos", extra={
+                "numero_orden": transaccion.numero_orden, "token": token_ws
+            })
+            auditoria_webpay.registrar(
+                "error_confirmacion", error_msg, numero_orden=transaccion.numero_orden, token=token_ws
+            )
             return JSONResponse(
                 status_code=500,
                 content={"error": error_msg}
             )
 
     except HTTPException as http_error:
+        auditoria_webpay.registrar("error_confirmacion", http_error.detail, token=token_ws)
         # Re-lanzar las excepciones HTTP
         raise http_error
         
     except Exception as e:
         error_msg = f" Error inesperado en confirmar_webpay: {str(e)}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        log.exception("Error inesperado en confirmar_webpay", extra={"token": token_ws})
+        auditoria_webpay.registrar("error_confirmacion", error_msg, token=token_ws)
         # Devolver error como JSON
         return JSONResponse(
             status_code=500,
@@ -513,11 +1347,172 @@ def formulario_webpay(token: str):
         "instrucciones": f"Para simular pago exitoso, llama a POST /webpay/confirmar con token={token}"
     }
 
+# Administración del cache del catálogo
+@app.get("/admin/cache", dependencies=[Depends(verificar_admin)])
+def estado_cache():
+    return {
+        "listados": cache_listados.stats(),
+        "productos": cache_productos.stats(),
+        "totales": cache_totales.stats(),
+        "ordenes": cache_ordenes.stats(),
+        "version_catalogo": version_catalogo.estado()
+    }
+
+@app.post("/admin/cache/invalidar", dependencies=[Depends(verificar_admin)])
+def invalidar_cache(producto_id: Optional[int] = None):
+    """Invalidar el cache del catálogo en todos los workers.
+
+    Este worker lo vacía de inmediato; los demás al ver la versión nueva (y
+    entonces vacían todo el catálogo, no solo `producto_id`).
+    """
+    cache_productos.invalidate(producto_id)
+    cache_listados.invalidate()
+    cache_totales.invalidate()
+    # Que la búsqueda refleje ya los cambios en vez de esperar la próxima pasada
+    sincronizador_busqueda.sincronizar()
+    version_catalogo.incrementar()
+    return {"invalidado": True, "producto_id": producto_id, "version": version_catalogo.version}
+
+@app.get("/admin/busqueda", dependencies=[Depends(verificar_admin)])
+def estado_busqueda():
+    return sincronizador_busqueda.estado()
+
+@app.post("/admin/busqueda/reindexar", dependencies=[Depends(verificar_admin)])
+def reindexar_busqueda():
+    """Reconstruir el índice de búsqueda completo (p. ej. tras borrar productos)"""
+    return {"productos": sincronizador_busqueda.cargar_todo()}
+
+@app.get("/admin/arranque", dependencies=[Depends(verificar_admin)])
+def estado_arranque():
+    return arranque.estado()
+
+@app.get("/admin/trabajos", dependencies=[Depends(verificar_admin)])
+def estado_trabajos(db: Session = Depends(get_db)):
+    return {
+        "cola": resumen_trabajos(db),
+        "procesador": procesador_trabajos.estado()
+    }
+
+@app.get("/admin/trabajos/muertos", dependencies=[Depends(verificar_admin)])
+def listar_trabajos_muertos(limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db)):
+    return trabajos_muertos(db, limit)
+
+@app.post("/admin/trabajos/{trabajo_id}/reintentar", dependencies=[Depends(verificar_admin)])
+def reintentar_trabajo_muerto(trabajo_id: int, db: Session = Depends(get_db)):
+    if not reintentar_trabajo(db, trabajo_id):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado en la cola de muertos")
+    procesador_trabajos.avisar()
+    return {"trabajo_id": trabajo_id, "estado": "pendiente"}
+
+# Reportes de ventas sobre ventas_diarias (ver reportes.py)
+@app.get("/admin/reportes/ventas", dependencies=[Depends(verificar_admin)])
+def reporte_ventas(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    agrupar: str = "fecha",
+    estado_pago: Optional[str] = None,
+    sku: Optional[str] = None,
+    region: Optional[str] = None,
+    comuna: Optional[str] = None,
+    orden: str = "fecha",
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db_lectura)
+):
+    """Ventas por día de compra agrupadas por `agrupar` (fecha,sku,region,comuna,estado_pago); por defecto los últimos 30 días"""
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=30)
+    filtros = {"estado_pago": estado_pago, "sku": sku, "region": region, "comuna": comuna}
+    try:
+        return consultar_reporte_ventas(
+            db, desde, hasta,
+            agrupar=[d.strip() for d in agrupar.split(",") if d.strip()],
+            filtros={d: v for d, v in filtros.items() if v is not None},
+            orden=orden,
+            limite=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/reportes/ventas/reconstruir", dependencies=[Depends(verificar_admin)])
+def reconstruir_reporte(desde: date, hasta: date, db: Session = Depends(get_db)):
+    """Recalcular ventas_diarias desde ventas_retail para un rango de días (tras corregir ventas a mano)"""
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior o igual a hasta")
+    inicio = time.perf_counter()
+    filas = reconstruir_reporte_ventas(db, desde, hasta)
+    log.info("Reporte de ventas reconstruido", extra={
+        "desde": desde, "hasta": hasta, "filas": filas,
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1)
+    })
+    return {"desde": desde, "hasta": hasta, "filas": filas}
+
+@app.get("/admin/visitas", dependencies=[Depends(verificar_admin)])
+def estado_visitas():
+    return contador_visitas.pendientes()
+
+@app.post("/admin/visitas/flush", dependencies=[Depends(verificar_admin)])
+def flush_visitas():
+    return {"visitas_escritas": contador_visitas.flush()}
+
+@app.get("/admin/db/pool", dependencies=[Depends(verificar_admin)])
+def estado_pool_db():
+    return {
+        "sync": estado_pool(engine),
+        "async": estado_pool(async_engine.sync_engine),
+        "replica": estado_pool(replica_engine) if replica_engine is not None else None,
+        "lecturas": enrutador_lecturas.estado()
+    }
+
+@app.get("/admin/webpay", dependencies=[Depends(verificar_admin)])
+def estado_webpay():
+    return {
+        "pasarela": cliente_transbank.estado(),
+        "auditoria": auditoria_webpay.estado()
+    }
+
+@app.get("/admin/inventario", dependencies=[Depends(verificar_admin)])
+def estado_inventario(db: Session = Depends(get_db)):
+    activas = db.query(func.count(ReservaStock.id), func.coalesce(func.sum(ReservaStock.unidades), 0)).filter(
+        ReservaStock.estado == "activa"
+    ).one()
+    return {
+        "reservas_activas": activas[0],
+        "unidades_reservadas": int(activas[1]),
+        "reserva_minutos": RESERVA_MINUTOS,
+        "liberador": liberador_reservas.estado()
+    }
+
+@app.post("/admin/inventario/liberar", dependencies=[Depends(verificar_admin)])
+def liberar_reservas_vencidas():
+    return {"liberadas": liberador_reservas.liberar()}
+
+@app.get("/admin/entregas", dependencies=[Depends(verificar_admin)])
+def consultar_entrega(region: Optional[str] = None, comuna: Optional[str] = None,
+                      tiempo_entrega: Optional[str] = None):
+    """Fecha de entrega que se asignaría a una compra hecha ahora"""
+    fecha_compra = datetime.now()
+    return {
+        "dias_habiles": calendario_entregas.dias_entrega(region, comuna, tiempo_entrega),
+        "fecha_entrega": calcular_fecha_entrega(fecha_compra, region, comuna, tiempo_entrega)
+    }
+
+@app.post("/admin/entregas/recargar", dependencies=[Depends(verificar_admin)])
+def recargar_calendario_entregas():
+    return cargar_calendario_entregas()
+
+# Métricas para Prometheus
+@app.get("/metrics", dependencies=[Depends(verificar_admin)])
+def metricas():
+    cuerpo, content_type = exportar()
+    return Response(content=cuerpo, media_type=content_type)
+
 # Endpoint de salud
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "API JHK Muebles funcionando"}
 
+arranque.marcar("importar")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
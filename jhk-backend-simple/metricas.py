@@ -0,0 +1,199 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger("jhk.metricas")
+
+# Con varios workers de uvicorn cada proceso escribe sus métricas en este directorio
+MULTIPROCESO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_SEGUNDOS = Histogram(
+    "jhk_http_request_duration_seconds", "Duración de los requests HTTP por ruta",
+    ["metodo", "ruta", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS_EN_CURSO = Gauge(
+    "jhk_http_requests_en_curso", "Requests HTTP en curso", multiprocess_mode="livesum"
+)
+QUERIES_POR_REQUEST = Histogram(
+    "jhk_db_queries_por_request", "Consultas SQL ejecutadas por request",
+    ["metodo", "ruta"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+DB_SEGUNDOS_POR_REQUEST = Histogram(
+    "jhk_db_segundos_por_request", "Tiempo total en la base de datos por request",
+    ["metodo", "ruta"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+QUERIES_TOTAL = Counter("jhk_db_queries_total", "Consultas SQL ejecutadas (dentro o fuera de un request)")
+
+_medicion: ContextVar = ContextVar("jhk_medicion", default=None)
+
+
+class MedicionRequest:
+    """Consultas y tiempo de base de datos acumulados durante un request.
+
+    Vive en un ContextVar: los endpoints sync (threadpool) y `run_sync` de la
+    sesión async heredan el contexto, así que sus consultas se cuentan aquí.
+    """
+
+    __slots__ = ("queries", "segundos_db", "sentencias")
+
+    def __init__(self, guardar_sql: bool):
+        self.queries = 0
+        self.segundos_db = 0.0
+        # sql -> [veces, segundos]; solo si hay log de requests lentos
+        self.sentencias = {} if guardar_sql else None
+
+    def registrar(self, sql: str, segundos: float) -> None:
+        self.queries += 1
+        self.segundos_db += segundos
+        if self.sentencias is not None:
+            acumulado = self.sentencias.setdefault(sql, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+
+    def sql_mas_costosas(self, limite: int = 10) -> list:
+        # Una misma sentencia repetida muchas veces delata un N+1
+        ordenadas = sorted(self.sentencias.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        return [
+            {"sql": sql[:500], "veces": veces, "ms": round(segundos * 1000, 2)}
+            for sql, (veces, segundos) in ordenadas
+        ]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("jhk_inicio_consulta", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - conn.info["jhk_inicio_consulta"].pop()
+    QUERIES_TOTAL.inc()
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.registrar(statement, segundos)
+
+
+@event.listens_for(Engine, "handle_error")
+def _error_en_consulta(contexto):
+    inicios = contexto.connection.info.get("jhk_inicio_consulta") if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def _nombre_ruta(scope) -> str:
+    # Plantilla de la ruta (/productos/{producto_id}), no el path, para acotar las series
+    ruta = scope.get("route")
+    if ruta is not None:
+        return ruta.path
+    # Mount de archivos estáticos: el router deja el prefijo en root_path
+    return scope.get("root_path") or "sin_ruta"
+
+
+class MetricasMiddleware:
+    """Mide latencia, consultas SQL y tiempo de base de datos de cada request.
+
+    Con `umbral_lento_ms` > 0 los requests más lentos que eso se registran en el
+    log con las sentencias SQL que corrieron (sin parámetros), agrupadas.
+    """
+
+    def __init__(self, app, umbral_lento_ms: float = 0):
+        self.app = app
+        self.umbral_lento = umbral_lento_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionRequest(guardar_sql=self.umbral_lento > 0)
+        token = _medicion.set(medicion)
+        status = 500
+
+        async def enviar(mensaje):
+            nonlocal status
+            if mensaje["type"] == "http.response.start":
+                status = mensaje["status"]
+            await send(mensaje)
+
+        REQUESTS_EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            REQUESTS_EN_CURSO.dec()
+            _medicion.reset(token)
+
+            metodo, ruta = scope["method"], _nombre_ruta(scope)
+            REQUEST_SEGUNDOS.labels(metodo, ruta, str(status)).observe(duracion)
+            QUERIES_POR_REQUEST.labels(metodo, ruta).observe(medicion.queries)
+            DB_SEGUNDOS_POR_REQUEST.labels(metodo, ruta).observe(medicion.segundos_db)
+
+            if self.umbral_lento and duracion >= self.umbral_lento:
+                log.warning("Request lento", extra={
+                    "metodo": metodo,
+                    "ruta": ruta,
+                    "path": scope["path"],
+                    "status": status,
+                    "duracion_ms": round(duracion * 1000, 1),
+                    "queries": medicion.queries,
+                    "db_ms": round(medicion.segundos_db * 1000, 1),
+                    "sql": medicion.sql_mas_costosas()
+                })
+
+
+class ColectorEstado:
+    """Expone como gauges los valores numéricos de los `estado()` que ya usan los endpoints /admin"""
+
+    def __init__(self):
+        self._fuentes = []
+
+    def registrar(self, prefijo: str, funcion, **etiquetas) -> None:
+        self._fuentes.append((prefijo, funcion, etiquetas))
+
+    def describe(self):
+        # Sin esto prometheus_client llamaría a collect() al registrar el colector
+        return []
+
+    def collect(self):
+        familias = {}
+        for prefijo, funcion, etiquetas in self._fuentes:
+            try:
+                valores = funcion()
+            except Exception:
+                log.exception("Error leyendo estado para métricas", extra={"prefijo": prefijo})
+                continue
+            for clave, valor in valores.items():
+                if not isinstance(valor, (int, float)):
+                    continue
+                nombre = f"jhk_{prefijo}_{clave}"
+                if nombre not in familias:
+                    familias[nombre] = GaugeMetricFamily(nombre, f"{prefijo}: {clave}", labels=list(etiquetas))
+                familias[nombre].add_metric(list(etiquetas.values()), float(valor))
+        return list(familias.values())
+
+
+colector_estado = ColectorEstado()
+if not MULTIPROCESO:
+    # En modo multiproceso el estado en memoria es de cada worker y no se suma bien
+    REGISTRY.register(colector_estado)
+
+
+def exportar():
+    """(cuerpo, content-type) en el formato de texto de Prometheus"""
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,98 @@
+"""Aplica en orden los scripts de migrations/*.sql que aún no se aplicaron.
+
+Cada script aplicado queda registrado en la tabla `migraciones_aplicadas`, así
+que correrlo de nuevo solo aplica los nuevos (deploy.sh lo corre en cada
+despliegue, antes de levantar la API). MySQL confirma cada DDL por separado: si
+una sentencia falla, el script queda a medias y sin registrar; corregir a mano
+y volver a correr, o marcarlo como aplicado con --marcar.
+
+Uso:
+    python migrar.py                    # aplicar las pendientes
+    python migrar.py --listar           # solo mostrar el estado
+    python migrar.py --marcar --hasta 006_stock_reservas.sql
+                                        # registrar sin ejecutar (base migrada a mano)
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+
+from sqlalchemy import text
+
+from models import engine
+
+log = logging.getLogger("jhk.migraciones")
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+CREAR_REGISTRO = """
+CREATE TABLE IF NOT EXISTS migraciones_aplicadas (
+    nombre VARCHAR(255) NOT NULL PRIMARY KEY,
+    aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def sentencias(ruta: str) -> list:
+    """Sentencias del script, sin las líneas de comentario (que pueden traer `;`)"""
+    with open(ruta, encoding="utf-8") as f:
+        lineas = [linea for linea in f if not linea.lstrip().startswith("--")]
+    return [sentencia.strip() for sentencia in "".join(lineas).split(";") if sentencia.strip()]
+
+
+def pendientes(conexion, hasta: str = None) -> list:
+    aplicadas = set(conexion.execute(text("SELECT nombre FROM migraciones_aplicadas")).scalars())
+    archivos = sorted(glob.glob(os.path.join(DIRECTORIO, "*.sql")))
+    nombres = [os.path.basename(archivo) for archivo in archivos]
+    if hasta is not None and hasta not in nombres:
+        raise SystemExit(f"No existe migrations/{hasta}")
+    return [
+        archivo for archivo, nombre in zip(archivos, nombres)
+        if nombre not in aplicadas and (hasta is None or nombre <= hasta)
+    ]
+
+
+def migrar(hasta: str = None, marcar: bool = False, listar: bool = False) -> list:
+    """Aplicar (o solo registrar, con `marcar`) las migraciones pendientes; retorna sus nombres"""
+    with engine.begin() as conexion:
+        conexion.exec_driver_sql(CREAR_REGISTRO)
+    with engine.connect() as conexion:
+        archivos = pendientes(conexion, hasta)
+        if listar:
+            return [os.path.basename(archivo) for archivo in archivos]
+        aplicadas = []
+        for archivo in archivos:
+            nombre = os.path.basename(archivo)
+            if not marcar:
+                for sentencia in sentencias(archivo):
+                    # Por el driver: los scripts pueden traer `:` y `%` literales
+                    conexion.exec_driver_sql(sentencia)
+            conexion.execute(text("INSERT INTO migraciones_aplicadas (nombre) VALUES (:nombre)"), {"nombre": nombre})
+            conexion.commit()
+            aplicadas.append(nombre)
+            log.info("Migración registrada" if marcar else "Migración aplicada", extra={"migracion": nombre})
+        return aplicadas
+
+
+if __name__ == "__main__":
+    from logger import configurar_logging, detener_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hasta", help="Última migración a considerar (nombre del archivo)")
+    parser.add_argument("--marcar", action="store_true", help="Registrar como aplicadas sin ejecutarlas")
+    parser.add_argument("--listar", action="store_true", help="Mostrar las pendientes sin aplicar nada")
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        nombres = migrar(args.hasta, args.marcar, args.listar)
+        if args.listar:
+            print("\n".join(nombres) or "Sin migraciones pendientes")
+        elif not nombres:
+            log.info("Sin migraciones pendientes")
+    except Exception:
+        log.exception("Migración fallida: corregir y volver a correr (las anteriores quedaron registradas)")
+        sys.exit(1)
+    finally:
+        detener_logging()
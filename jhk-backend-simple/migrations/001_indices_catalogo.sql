@@ -0,0 +1,7 @@
+-- Índices para filtros y ordenamientos del catálogo (GET /productos)
+-- Requiere MySQL 8.0.13+ para el índice funcional de precio efectivo.
+
+CREATE INDEX ix_productos_venta_tipo ON productos (tipo_producto_venta, tipo_producto);
+CREATE INDEX ix_productos_venta_precio ON productos (tipo_producto_venta, (COALESCE(NULLIF(precio_descuento, 0), precio_venta)));
+CREATE INDEX ix_productos_venta_nombre ON productos (tipo_producto_venta, nombre);
+CREATE INDEX ix_productos_venta_visitas ON productos (tipo_producto_venta, visitas);
@@ -0,0 +1,5 @@
+-- Índices para las búsquedas de confirmación de Webpay (POST /webpay/confirmar)
+
+CREATE UNIQUE INDEX ix_transacciones_webpay_token ON transacciones_webpay (token);
+CREATE INDEX ix_transacciones_webpay_numero_orden ON transacciones_webpay (numero_orden);
+-- ventas_retail.numero_orden ya tiene índice (ix_ventas_retail_numero_orden)
@@ -0,0 +1,6 @@
+-- Una orden de /ventas/multiple tiene una fila por producto con el mismo numero_orden.
+-- Reemplaza el índice único por uno normal (los números nuevos son crecientes,
+-- así que los inserts en el índice van al final).
+
+ALTER TABLE ventas_retail DROP INDEX ix_ventas_retail_numero_orden;
+CREATE INDEX ix_ventas_retail_numero_orden ON ventas_retail (numero_orden);
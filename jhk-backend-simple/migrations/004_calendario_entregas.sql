@@ -0,0 +1,22 @@
+-- Feriados extraordinarios y plazos de despacho por región/comuna para entregas.CalendarioEntregas.
+-- Los feriados legales se calculan en código; aquí solo van los que se decretan cada año.
+-- Sin filas en plazos_entrega se usan 3 días hábiles para todo el país (comportamiento anterior).
+
+CREATE TABLE IF NOT EXISTS feriados (
+    fecha DATE NOT NULL PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS plazos_entrega (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    region VARCHAR(100) NOT NULL,
+    comuna VARCHAR(100) NOT NULL DEFAULT '',
+    dias_habiles INT NOT NULL,
+    UNIQUE KEY ux_plazos_entrega_region_comuna (region, comuna)
+);
+
+-- Ejemplo:
+-- INSERT INTO plazos_entrega (region, comuna, dias_habiles) VALUES
+--     ('Metropolitana', '', 3),
+--     ('Metropolitana', 'Colina', 4),
+--     ('Magallanes', '', 10);
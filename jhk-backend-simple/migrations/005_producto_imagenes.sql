@@ -0,0 +1,30 @@
+-- Imágenes de productos normalizadas (antes img_1 ... img_10 en productos).
+-- Las columnas img_N se mantienen: el backfill es idempotente (INSERT IGNORE sobre
+-- la clave única) y `python imagenes.py` lo vuelve a correr antes de generar las
+-- versiones miniatura/mediana/WebP de las imágenes nuevas.
+
+CREATE TABLE IF NOT EXISTS producto_imagenes (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    producto_id INT NOT NULL,
+    posicion INT NOT NULL,
+    archivo VARCHAR(255) NOT NULL,
+    ancho INT NULL,
+    alto INT NULL,
+    miniatura VARCHAR(255) NULL,
+    mediana VARCHAR(255) NULL,
+    miniatura_webp VARCHAR(255) NULL,
+    mediana_webp VARCHAR(255) NULL,
+    UNIQUE KEY ux_producto_imagenes_producto_posicion (producto_id, posicion)
+);
+
+INSERT IGNORE INTO producto_imagenes (producto_id, posicion, archivo)
+SELECT id, 1, img_1 FROM productos WHERE img_1 IS NOT NULL AND img_1 <> '' UNION ALL
+SELECT id, 2, img_2 FROM productos WHERE img_2 IS NOT NULL AND img_2 <> '' UNION ALL
+SELECT id, 3, img_3 FROM productos WHERE img_3 IS NOT NULL AND img_3 <> '' UNION ALL
+SELECT id, 4, img_4 FROM productos WHERE img_4 IS NOT NULL AND img_4 <> '' UNION ALL
+SELECT id, 5, img_5 FROM productos WHERE img_5 IS NOT NULL AND img_5 <> '' UNION ALL
+SELECT id, 6, img_6 FROM productos WHERE img_6 IS NOT NULL AND img_6 <> '' UNION ALL
+SELECT id, 7, img_7 FROM productos WHERE img_7 IS NOT NULL AND img_7 <> '' UNION ALL
+SELECT id, 8, img_8 FROM productos WHERE img_8 IS NOT NULL AND img_8 <> '' UNION ALL
+SELECT id, 9, img_9 FROM productos WHERE img_9 IS NOT NULL AND img_9 <> '' UNION ALL
+SELECT id, 10, img_10 FROM productos WHERE img_10 IS NOT NULL AND img_10 <> '';
@@ -0,0 +1,19 @@
+-- Stock por producto y reservas de unidades mientras la orden espera el pago.
+-- stock NULL = producto sin control de stock (se puede vender siempre, como antes).
+-- Las reservas y el stock se actualizan con UPDATE condicionales por fila (ver inventario.py).
+
+ALTER TABLE productos
+    ADD COLUMN stock INT NULL,
+    ADD COLUMN stock_reservado INT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS reservas_stock (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    numero_orden VARCHAR(20) NOT NULL,
+    producto_id INT NOT NULL,
+    unidades INT NOT NULL,
+    estado ENUM('activa', 'confirmada', 'expirada') NOT NULL DEFAULT 'activa',
+    expira_en DATETIME NOT NULL,
+    created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_reservas_stock_numero_orden (numero_orden),
+    KEY ix_reservas_stock_estado_expira (estado, expira_en)
+);
@@ -0,0 +1,9 @@
+-- Marca de modificación de productos para el índice de búsqueda (busqueda.py).
+-- ON UPDATE la mantiene al día aunque el producto se edite fuera de la API;
+-- el sincronizador reindexa cada BUSQUEDA_INTERVALO segundos lo modificado.
+-- Los UPDATE de contadores (visitas en visitas.py, stock en inventario.py) se
+-- asignan `actualizado_en = actualizado_en`, que no dispara el ON UPDATE.
+
+ALTER TABLE productos
+    ADD COLUMN actualizado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD INDEX ix_productos_actualizado_en (actualizado_en);
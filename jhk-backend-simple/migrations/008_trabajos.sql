@@ -0,0 +1,18 @@
+-- Cola de trabajos para después del pago (correo de confirmación, despacho a logística).
+-- confirmar_webpay inserta en la misma transacción que marca el pago y los workers
+-- de trabajos.py los toman con UPDATE condicionales (ver trabajos.py).
+
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    estado ENUM('pendiente', 'en_proceso', 'completado', 'muerto') NOT NULL DEFAULT 'pendiente',
+    intentos INT NOT NULL DEFAULT 0,
+    max_intentos INT NOT NULL DEFAULT 5,
+    disponible_en DATETIME NOT NULL,
+    tomado_por VARCHAR(100) NULL,
+    ultimo_error TEXT NULL,
+    created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+    terminado_en DATETIME NULL,
+    KEY ix_trabajos_estado_disponible (estado, disponible_en)
+);
@@ -0,0 +1,33 @@
+-- Ventas sumadas por día de compra, SKU, región, comuna y estado de pago, para
+-- los reportes sin recorrer ventas_retail. crear_venta* y confirmar_webpay las
+-- actualizan en la misma transacción que la venta (ver reportes.py).
+
+CREATE TABLE IF NOT EXISTS ventas_diarias (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    fecha DATE NOT NULL,
+    sku VARCHAR(255) NOT NULL DEFAULT '',
+    region VARCHAR(100) NOT NULL DEFAULT '',
+    comuna VARCHAR(100) NOT NULL DEFAULT '',
+    estado_pago VARCHAR(50) NOT NULL,
+    lineas INT NOT NULL DEFAULT 0,
+    unidades INT NOT NULL DEFAULT 0,
+    monto DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    actualizado_en DATETIME NOT NULL,
+    UNIQUE KEY uq_ventas_diarias_clave (fecha, sku, region, comuna, estado_pago)
+);
+
+-- Carga inicial con las ventas existentes (lo mismo que POST /admin/reportes/ventas/reconstruir)
+INSERT INTO ventas_diarias (fecha, sku, region, comuna, estado_pago, lineas, unidades, monto, actualizado_en)
+SELECT
+    DATE(fecha_compra),
+    COALESCE(sku, ''),
+    COALESCE(region, ''),
+    COALESCE(comuna, ''),
+    COALESCE(estado_pago, 'pendiente'),
+    COUNT(*),
+    SUM(COALESCE(unidades, 1)),
+    SUM(COALESCE(precio, 0) * COALESCE(unidades, 1)),
+    NOW()
+FROM ventas_retail
+WHERE fecha_compra IS NOT NULL
+GROUP BY DATE(fecha_compra), COALESCE(sku, ''), COALESCE(region, ''), COALESCE(comuna, ''), COALESCE(estado_pago, 'pendiente');
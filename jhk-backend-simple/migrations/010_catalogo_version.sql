@@ -0,0 +1,11 @@
+-- Versión del cache del catálogo, compartida por todos los workers (ver cache.py).
+-- /admin/cache/invalidar la incrementa y cada worker la lee cada
+-- CATALOGO_VERSION_INTERVALO segundos; si cambió, vacía su cache del catálogo.
+
+CREATE TABLE IF NOT EXISTS catalogo_version (
+    id INT NOT NULL PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    actualizado_en DATETIME NOT NULL
+);
+
+INSERT IGNORE INTO catalogo_version (id, version, actualizado_en) VALUES (1, 0, NOW());
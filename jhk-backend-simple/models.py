@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, create_engine
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from datetime import datetime
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import Column, Integer, String, Text, Enum as SQLEnum, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, Text, Enum as SQLEnum, TIMESTAMP, Index, Numeric, UniqueConstraint, func
 
 
 # Cargar variables de entorno
@@ -17,12 +22,91 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "integracion")
 DB_PORT = os.getenv("DB_PORT", "3306")
 
-# URL de conexión a MySQL
+# Configuración del pool de conexiones
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# MySQL cierra conexiones inactivas (wait_timeout); reciclarlas antes evita errores en la mañana
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# URL de conexión a MySQL (sync con PyMySQL, async con aiomysql)
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Réplica de lectura (opcional) para el catálogo y la consulta de órdenes; ver replicas.py.
+# Con varias réplicas, apuntar DB_REPLICA_HOST a un balanceador (ProxySQL, MaxScale, HAProxy)
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+# Vacíos = los mismos del primario
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT") or DB_PORT
+DB_REPLICA_USER = os.getenv("DB_REPLICA_USER") or DB_USER
+DB_REPLICA_PASSWORD = os.getenv("DB_REPLICA_PASSWORD") or DB_PASSWORD
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE") or DB_POOL_SIZE)
+# Si la réplica no responde en este tiempo, la lectura va al primario
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+REPLICA_DATABASE_URL = (
+    f"mysql+pymysql://{DB_REPLICA_USER}:{DB_REPLICA_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+    if DB_REPLICA_HOST else None
+)
+
+class MedicionPool:
+    """Mide el tiempo que se tarda en obtener una conexión del pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reiniciar_medicion()
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super().connect()
+        except PoolTimeoutError:
+            with self._lock_medicion:
+                self.timeouts += 1
+            raise
+        espera = time.perf_counter() - inicio
+        with self._lock_medicion:
+            self.checkouts += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+        return conexion
+
+    def reiniciar_medicion(self):
+        self._lock_medicion = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+class QueuePoolMedido(MedicionPool, QueuePool):
+    pass
+
+class AsyncQueuePoolMedido(MedicionPool, AsyncAdaptedQueuePool):
+    pass
+
+OPCIONES_POOL = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
 
 # Crear engine y sesión
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, echo=False, poolclass=QueuePoolMedido, **OPCIONES_POOL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Sin réplica configurada, las sesiones de lectura usan el primario
+replica_engine = create_engine(
+    REPLICA_DATABASE_URL, echo=False, poolclass=QueuePoolMedido,
+    connect_args={"connect_timeout": DB_REPLICA_CONNECT_TIMEOUT},
+    **{**OPCIONES_POOL, "pool_size": DB_REPLICA_POOL_SIZE}
+) if REPLICA_DATABASE_URL else None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
+
+# Engine y sesión async para los endpoints `async def`
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, poolclass=AsyncQueuePoolMedido, **OPCIONES_POOL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # Modelos de base de datos
@@ -53,13 +137,51 @@ class Producto(Base):
     colores_disponibles = Column(Text)
     tiempo_entrega = Column(String(255))
     colores_hex = Column(Text)
+    # NULL = sin control de stock. Disponible = stock - stock_reservado (ver inventario.py)
+    stock = Column(Integer, nullable=True)
+    stock_reservado = Column(Integer, nullable=False, default=0, server_default="0")
+    # Marca de la última modificación: el índice de búsqueda reindexa lo que cambió (ver busqueda.py).
+    # Visitas y stock no la mueven (ver inventario._SIN_MARCA)
+    actualizado_en = Column(TIMESTAMP, nullable=False, server_default=func.current_timestamp(),
+                            onupdate=func.current_timestamp(), index=True)
+
+# Precio efectivo del producto: precio_descuento si existe, si no precio_venta
+precio_efectivo = func.coalesce(func.nullif(Producto.precio_descuento, 0), Producto.precio_venta)
+
+# Índices del catálogo (ver migrations/001_indices_catalogo.sql)
+Index("ix_productos_venta_tipo", Producto.tipo_producto_venta, Producto.tipo_producto)
+Index("ix_productos_venta_precio", Producto.tipo_producto_venta, precio_efectivo)
+Index("ix_productos_venta_nombre", Producto.tipo_producto_venta, Producto.nombre)
+Index("ix_productos_venta_visitas", Producto.tipo_producto_venta, Producto.visitas)
+
+class ProductoImagen(Base):
+    """Imágenes de un producto en orden, con sus versiones reducidas (ver imagenes.py).
+
+    Las rutas son relativas a IMAGES_PATH; las versiones quedan en NULL hasta
+    que corre el proceso offline y entonces se usa el original.
+    """
+    __tablename__ = "producto_imagenes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    producto_id = Column(Integer, nullable=False)
+    posicion = Column(Integer, nullable=False)
+    archivo = Column(String(255), nullable=False)
+    ancho = Column(Integer)
+    alto = Column(Integer)
+    miniatura = Column(String(255))
+    mediana = Column(String(255))
+    miniatura_webp = Column(String(255))
+    mediana_webp = Column(String(255))
+
+Index("ux_producto_imagenes_producto_posicion", ProductoImagen.producto_id, ProductoImagen.posicion, unique=True)
 
 class VentaRetail(Base):
     __tablename__ = "ventas_retail"
     
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer)
-    numero_orden = Column(String(20), unique=True, index=True)
+    # Una orden tiene una fila por producto, así que numero_orden no es único
+    numero_orden = Column(String(20), index=True)
     cliente_final = Column(String(255))
     rut_documento = Column(String(50))
     email = Column(String(255))
@@ -80,6 +202,66 @@ class VentaRetail(Base):
     codigo_autorizacion = Column(String(255))
     estado_pago = Column(String(50), default="pendiente")
 
+class ReservaStock(Base):
+    """Unidades apartadas por una orden hasta que se paga o vence"""
+    __tablename__ = "reservas_stock"
+
+    id = Column(Integer, primary_key=True, index=True)
+    numero_orden = Column(String(20), nullable=False, index=True)
+    producto_id = Column(Integer, nullable=False)
+    unidades = Column(Integer, nullable=False)
+    estado = Column(SQLEnum('activa', 'confirmada', 'expirada'), nullable=False, default='activa')
+    expira_en = Column(DateTime, nullable=False)
+    created_at = Column(TIMESTAMP, default=func.current_timestamp())
+
+Index("ix_reservas_stock_estado_expira", ReservaStock.estado, ReservaStock.expira_en)
+
+class Trabajo(Base):
+    """Trabajo en cola para después del pago (correo, logística); ver trabajos.py"""
+    __tablename__ = "trabajos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    estado = Column(SQLEnum('pendiente', 'en_proceso', 'completado', 'muerto'), nullable=False, default='pendiente')
+    intentos = Column(Integer, nullable=False, default=0)
+    max_intentos = Column(Integer, nullable=False, default=5)
+    # Pendiente: desde cuándo se puede tomar. En proceso: vence la toma (el worker murió)
+    disponible_en = Column(DateTime, nullable=False)
+    tomado_por = Column(String(100), nullable=True)
+    ultimo_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, default=func.current_timestamp())
+    terminado_en = Column(DateTime, nullable=True)
+
+Index("ix_trabajos_estado_disponible", Trabajo.estado, Trabajo.disponible_en)
+
+class VentaDiaria(Base):
+    """Ventas sumadas por día de compra, SKU, región, comuna y estado de pago; ver reportes.py"""
+    __tablename__ = "ventas_diarias"
+    __table_args__ = (
+        UniqueConstraint("fecha", "sku", "region", "comuna", "estado_pago", name="uq_ventas_diarias_clave"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(Date, nullable=False)
+    # '' en vez de NULL: un índice único de MySQL no considera iguales dos NULL
+    sku = Column(String(255), nullable=False, default="")
+    region = Column(String(100), nullable=False, default="")
+    comuna = Column(String(100), nullable=False, default="")
+    estado_pago = Column(String(50), nullable=False)
+    lineas = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    monto = Column(Numeric(14, 2, asdecimal=False), nullable=False, default=0)
+    actualizado_en = Column(DateTime, nullable=False, default=datetime.now)
+
+class VersionCatalogo(Base):
+    """Una fila (id=1): sube con cada invalidación del cache del catálogo, para todos los workers"""
+    __tablename__ = "catalogo_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    actualizado_en = Column(DateTime, nullable=False, default=datetime.now)
+
 class LogsWebpay(Base):
     __tablename__ = "logs_webpay"
     
@@ -94,8 +276,8 @@ class TransaccionesWebpay(Base):
     __tablename__ = "transacciones_webpay"
     
     id = Column(Integer, primary_key=True, index=True)
-    numero_orden = Column(String(50), nullable=False)
-    token = Column(String(100), nullable=True)
+    numero_orden = Column(String(50), nullable=False, index=True)
+    token = Column(String(100), nullable=True, unique=True, index=True)
     session_id = Column(String(100), nullable=True)
     monto = Column(Integer, nullable=False)
     estado = Column(SQLEnum('iniciada', 'completada', 'fallida', 'anulada'), nullable=True, default='iniciada')
@@ -106,10 +288,53 @@ class TransaccionesWebpay(Base):
     created_at = Column(TIMESTAMP, default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
+class Feriado(Base):
+    """Feriados extraordinarios (elecciones, interferiados) que se suman a los legales de entregas.py"""
+    __tablename__ = "feriados"
+
+    fecha = Column(Date, primary_key=True)
+    nombre = Column(String(100), nullable=False)
+
+class PlazoEntrega(Base):
+    """Días hábiles de despacho por región; comuna vacía = plazo de toda la región"""
+    __tablename__ = "plazos_entrega"
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(100), nullable=False)
+    comuna = Column(String(100), nullable=False, default="")
+    dias_habiles = Column(Integer, nullable=False)
+
+Index("ux_plazos_entrega_region_comuna", PlazoEntrega.region, PlazoEntrega.comuna, unique=True)
+
+def estado_pool(engine):
+    """Conexiones en uso, inactivas y overflow del pool, más tiempos de espera"""
+    pool = engine.pool
+    estado = {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "inactivas": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+    if isinstance(pool, MedicionPool):
+        with pool._lock_medicion:
+            estado.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "espera_promedio_ms": round(pool.espera_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                "espera_max_ms": round(pool.espera_max * 1000, 3),
+            })
+    return estado
+
 # Función para obtener sesión de base de datos
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Función para obtener sesión async de base de datos
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
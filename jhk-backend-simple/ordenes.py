@@ -0,0 +1,87 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+# Época propia (2024-01-01 UTC) para que los ids quepan en 19 dígitos por décadas
+EPOCA_MS = 1704067200000
+
+BITS_WORKER = 10
+BITS_SECUENCIA = 12
+MAX_WORKER = (1 << BITS_WORKER) - 1
+MAX_SECUENCIA = (1 << BITS_SECUENCIA) - 1
+# Ancho fijo del número de orden: numero_orden es VARCHAR y se compara como texto,
+# así que solo con el mismo largo el orden alfabético es el del tiempo (2**63 - 1 tiene 19)
+DIGITOS = len(str((1 << 63) - 1))
+
+
+def formatear(id_: int) -> str:
+    return str(id_).zfill(DIGITOS)
+
+
+class GeneradorIds:
+    """Ids de 63 bits: milisegundos desde EPOCA_MS | worker_id | secuencia.
+
+    Son únicos sin coordinar con la base de datos y crecen con el tiempo, así
+    que los inserts en el índice de numero_orden siempre van al final.
+
+    El worker_id sale de WORKER_ID o, si no está definido, se reserva el primer
+    slot libre con un lock de archivo en `directorio`, lo que separa a los
+    workers de uvicorn de una misma máquina. Con varias máquinas hay que
+    asignar WORKER_ID distinto a cada una.
+    """
+
+    def __init__(self, worker_id: int = None, directorio: str = None):
+        self._worker_id_fijo = worker_id
+        self.directorio = directorio or os.path.join(tempfile.gettempdir(), "jhk_worker_ids")
+        self._lock = threading.Lock()
+        self._pid = None
+        self._archivo_lock = None
+        self.worker_id = None
+        self._ultimo_ms = -1
+        self._secuencia = 0
+
+    def _reservar_worker_id(self) -> int:
+        if self._worker_id_fijo is not None:
+            if not 0 <= self._worker_id_fijo <= MAX_WORKER:
+                raise ValueError(f"WORKER_ID debe estar entre 0 y {MAX_WORKER}")
+            return self._worker_id_fijo
+
+        os.makedirs(self.directorio, exist_ok=True)
+        for candidato in range(MAX_WORKER + 1):
+            archivo = open(os.path.join(self.directorio, f"{candidato}.lock"), "w")
+            try:
+                fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                archivo.close()
+                continue
+            # El lock se mantiene mientras viva el proceso
+            self._archivo_lock = archivo
+            return candidato
+        raise RuntimeError("No hay worker_id libres para generar números de orden")
+
+    def siguiente(self) -> int:
+        with self._lock:
+            # Tras un fork (uvicorn --workers / gunicorn --preload) cada proceso reserva su propio id
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.worker_id = self._reservar_worker_id()
+                self._ultimo_ms = -1
+
+            ahora = int(time.time() * 1000)
+            if ahora < self._ultimo_ms:
+                # El reloj retrocedió: seguir sobre el último milisegundo usado
+                ahora = self._ultimo_ms
+            if ahora == self._ultimo_ms:
+                self._secuencia = (self._secuencia + 1) & MAX_SECUENCIA
+                if self._secuencia == 0:
+                    # Secuencia agotada en este milisegundo: esperar al siguiente
+                    while ahora <= self._ultimo_ms:
+                        time.sleep(0.0001)
+                        ahora = int(time.time() * 1000)
+            else:
+                self._secuencia = 0
+            self._ultimo_ms = ahora
+
+            return ((ahora - EPOCA_MS) << (BITS_WORKER + BITS_SECUENCIA)) | (self.worker_id << BITS_SECUENCIA) | self._secuencia
@@ -0,0 +1,169 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from transbank.webpay.webpay_plus.transaction import Transaction
+from transbank.webpay.webpay_plus.schema import TransactionCreateRequestSchema
+from transbank.webpay.webpay_plus.request import TransactionCreateRequest
+from transbank.common.headers_builder import HeadersBuilder
+from transbank.common.request_service import RequestService
+from transbank.error.transbank_error import TransbankError
+
+
+class PasarelaNoDisponible(Exception):
+    """Transbank no respondió a tiempo o el circuito está abierto"""
+
+
+class TransaccionLocal(Transaction):
+    """Transaction del SDK apuntando a un Transbank falso local (WEBPAY_FAKE_URL)"""
+
+    def __init__(self, options, base_url: str):
+        super().__init__(options)
+        self.base_url = base_url.rstrip("/")
+
+    def create(self, buy_order: str, session_id: str, amount: float, return_url: str):
+        request = TransactionCreateRequest(buy_order, session_id, amount, return_url)
+        response = requests.post(
+            self.base_url + Transaction.CREATE_ENDPOINT,
+            data=TransactionCreateRequestSchema().dumps(request),
+            headers=HeadersBuilder.build(self.options),
+            timeout=self.options.timeout
+        )
+        return RequestService.process_response(response)
+
+
+class CircuitBreaker:
+    """Abre el circuito tras `umbral` fallas seguidas y lo mantiene abierto `espera` segundos"""
+
+    def __init__(self, umbral: int = 5, espera: float = 30.0):
+        self.umbral = umbral
+        self.espera = espera
+        self.fallas = 0
+        self.abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        if self.fallas < self.umbral:
+            return "cerrado"
+        return "abierto" if time.monotonic() < self.abierto_hasta else "semiabierto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            estado = self.estado
+            if estado == "cerrado":
+                return True
+            if estado == "semiabierto" and not self._prueba_en_curso:
+                # Dejar pasar una sola llamada de prueba
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def exito(self) -> None:
+        with self._lock:
+            self.fallas = 0
+            self._prueba_en_curso = False
+
+    def falla(self) -> None:
+        with self._lock:
+            self.fallas += 1
+            self._prueba_en_curso = False
+            if self.fallas >= self.umbral:
+                self.abierto_hasta = time.monotonic() + self.espera
+
+    def liberar(self) -> None:
+        """La llamada se canceló sin resultado: no cuenta, pero la prueba queda libre para otra"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+
+def es_falla_transitoria(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    return isinstance(error, TransbankError) and isinstance(error.code, int) and error.code >= 500
+
+
+def no_llego_a_transbank(error: Exception) -> bool:
+    """La request no llegó a enviarse (conexión rechazada, DNS, timeout al conectar)"""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, ConnectionRefusedError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # requests envuelve el error de urllib3: MaxRetryError(reason=NewConnectionError)
+        return isinstance(getattr(error.args[0], "reason", None), urllib3.exceptions.NewConnectionError)
+    return False
+
+
+class ClienteTransbank:
+    """Llamadas al SDK de Transbank fuera del event loop.
+
+    Cada llamada corre en un executor acotado con timeout propio, se reintenta
+    con backoff exponencial ante fallas transitorias y pasa por un circuit
+    breaker para no acumular requests esperando a un proveedor caído.
+
+    Las llamadas no idempotentes (`crear`) solo se reintentan si la request no
+    salió: tras un timeout el hilo del executor sigue corriendo y la transacción
+    puede crearse igual, así que reintentar daría dos tokens para una orden.
+    """
+
+    def __init__(self, transaction, max_workers: int = 8, timeout: float = 10.0,
+                 reintentos: int = 2, backoff: float = 0.5, breaker: CircuitBreaker = None):
+        self.transaction = transaction
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transbank")
+
+    async def _llamar(self, funcion, *args, idempotente: bool = True, **kwargs):
+        loop = asyncio.get_running_loop()
+        for intento in range(self.reintentos + 1):
+            if not self.breaker.permitir():
+                raise PasarelaNoDisponible("Circuito abierto: Transbank no disponible temporalmente")
+            # Con el circuito semiabierto solo pasa la llamada de prueba
+            prueba = self.breaker.estado != "cerrado"
+            try:
+                resultado = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, lambda: funcion(*args, **kwargs)),
+                    timeout=self.timeout
+                )
+            except Exception as e:
+                if not es_falla_transitoria(e):
+                    # Errores de negocio (4xx, validación) no cuentan para el circuito
+                    self.breaker.exito()
+                    raise
+                self.breaker.falla()
+                if intento == self.reintentos or not (idempotente or no_llego_a_transbank(e)):
+                    raise PasarelaNoDisponible(f"Transbank no respondió: {type(e).__name__}") from e
+                await asyncio.sleep(self.backoff * (2 ** intento) * (1 + random.random() / 2))
+            except BaseException:
+                # Cancelada (cliente desconectado): sin esto la prueba quedaría en curso para siempre
+                if prueba:
+                    self.breaker.liberar()
+                raise
+            else:
+                self.breaker.exito()
+                return resultado
+
+    async def crear(self, buy_order: str, session_id: str, amount: float, return_url: str):
+        return await self._llamar(
+            self.transaction.create, idempotente=False,
+            buy_order=buy_order, session_id=session_id, amount=amount, return_url=return_url
+        )
+
+    def estado(self) -> dict:
+        return {
+            "circuito": self.breaker.estado,
+            "fallas_consecutivas": self.breaker.fallas,
+            "max_workers": self.max_workers,
+            "timeout": self.timeout,
+            "reintentos": self.reintentos,
+        }
+
+    def cerrar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+"""Trabajos que siguen a un pago confirmado; confirmar_webpay los encola (ver trabajos.py)"""
+import logging
+import os
+import smtplib
+from email.message import EmailMessage
+
+import requests
+from sqlalchemy import select
+
+from models import SessionLocal, VentaRetail
+from trabajos import encolar, manejador
+
+log = logging.getLogger("jhk.postventa")
+
+# Sin SMTP_HOST el correo solo se registra en el log
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_REMITENTE = os.getenv("SMTP_REMITENTE", "ventas@jhkmuebles.cl")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+# Sin LOGISTICA_URL no se encola el despacho
+LOGISTICA_URL = os.getenv("LOGISTICA_URL")
+LOGISTICA_TIMEOUT = float(os.getenv("LOGISTICA_TIMEOUT", "10"))
+
+
+def encolar_postpago(db, numero_orden: str) -> None:
+    """Trabajos de una orden recién pagada, en la misma transacción que el pago"""
+    encolar(db, "correo_confirmacion", {"numero_orden": numero_orden})
+    if LOGISTICA_URL:
+        encolar(db, "despacho_logistica", {"numero_orden": numero_orden}, max_intentos=10)
+
+
+def _lineas_orden(numero_orden: str) -> list:
+    # Del primario: la réplica podría no tener aún el pago
+    db = SessionLocal()
+    try:
+        lineas = db.execute(
+            select(
+                VentaRetail.cliente_final, VentaRetail.email, VentaRetail.telefono, VentaRetail.direccion,
+                VentaRetail.comuna, VentaRetail.region, VentaRetail.fecha_entrega, VentaRetail.codigo_autorizacion,
+                VentaRetail.producto, VentaRetail.sku, VentaRetail.precio, VentaRetail.unidades
+            )
+            .where(VentaRetail.numero_orden == numero_orden)
+            .order_by(VentaRetail.id)
+        ).all()
+    finally:
+        db.close()
+    if not lineas:
+        raise LookupError(f"Orden {numero_orden} sin ventas")
+    return lineas
+
+
+def enviar_correo_confirmacion(payload: dict) -> None:
+    numero_orden = payload["numero_orden"]
+    lineas = _lineas_orden(numero_orden)
+    primera = lineas[0]
+    if not primera.email:
+        log.warning("Orden pagada sin email", extra={"numero_orden": numero_orden})
+        return
+
+    total = sum((l.precio or 0) * (l.unidades or 1) for l in lineas)
+    detalle = "\n".join(f"- {l.unidades or 1} x {l.producto} (${(l.precio or 0):,.0f})" for l in lineas)
+    mensaje = EmailMessage()
+    mensaje["Subject"] = f"JHK Muebles: confirmamos tu compra {numero_orden}"
+    mensaje["From"] = SMTP_REMITENTE
+    mensaje["To"] = primera.email
+    entrega = f"Entrega estimada: {primera.fecha_entrega:%d-%m-%Y}\n" if primera.fecha_entrega else ""
+    mensaje.set_content(
+        f"Hola {primera.cliente_final},\n\n"
+        f"Recibimos el pago de tu orden {numero_orden} (autorización {primera.codigo_autorizacion}).\n\n"
+        f"{detalle}\n\nTotal: ${total:,.0f}\n{entrega}"
+    )
+
+    if not SMTP_HOST:
+        log.info("Correo de confirmación no enviado (sin SMTP_HOST)", extra={
+            "numero_orden": numero_orden, "email": primera.email
+        })
+        return
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as smtp:
+        smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        smtp.send_message(mensaje)
+    log.info("Correo de confirmación enviado", extra={"numero_orden": numero_orden, "email": primera.email})
+
+
+def enviar_a_logistica(payload: dict) -> None:
+    numero_orden = payload["numero_orden"]
+    lineas = _lineas_orden(numero_orden)
+    primera = lineas[0]
+    respuesta = requests.post(
+        LOGISTICA_URL,
+        json={
+            "numero_orden": numero_orden,
+            "cliente": primera.cliente_final,
+            "telefono": primera.telefono,
+            "direccion": primera.direccion,
+            "comuna": primera.comuna,
+            "region": primera.region,
+            "fecha_entrega": primera.fecha_entrega.isoformat() if primera.fecha_entrega else None,
+            "items": [{"sku": l.sku, "producto": l.producto, "unidades": l.unidades or 1} for l in lineas],
+        },
+        # El trabajo puede repetirse: la orden identifica el envío
+        headers={"Idempotency-Key": numero_orden},
+        timeout=LOGISTICA_TIMEOUT,
+    )
+    respuesta.raise_for_status()
+    log.info("Orden enviada a logística", extra={"numero_orden": numero_orden, "status": respuesta.status_code})
+
+
+def registrar() -> None:
+    """Registrar los manejadores en la cola (lo llaman la API y `python trabajos.py` al iniciar)"""
+    manejador("correo_confirmacion")(enviar_correo_confirmacion)
+    manejador("despacho_logistica")(enviar_a_logistica)
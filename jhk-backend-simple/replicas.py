@@ -0,0 +1,78 @@
+import logging
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from pasarela import CircuitBreaker
+
+log = logging.getLogger("jhk.replicas")
+
+# Cookie que marca a un cliente que acaba de escribir (checkout, pago)
+COOKIE_PRIMARIO = "jhk_primario"
+
+
+class EnrutadorLecturas:
+    """Reparte las sesiones de los endpoints de solo lectura entre réplica y primario.
+
+    - Sin réplica configurada todo va al primario.
+    - Read-your-writes: tras una escritura el cliente recibe la cookie
+      `jhk_primario` por `pegajoso` segundos y mientras la tenga sus lecturas
+      van al primario, así no ve su orden atrasada por el retraso de replicación.
+    - Si la réplica no entrega conexión, el circuit breaker manda las lecturas
+      al primario durante `espera` segundos antes de volver a probar.
+    """
+
+    def __init__(self, primario, replica=None, pegajoso: float = 60.0, breaker: CircuitBreaker = None):
+        self.primario = primario
+        self.replica = replica
+        self.pegajoso = pegajoso
+        self.breaker = breaker or CircuitBreaker(umbral=3, espera=30.0)
+        self._lock = threading.Lock()
+        self.lecturas_replica = 0
+        self.lecturas_primario = 0
+        self.fallas_replica = 0
+
+    def es_pegajoso(self, request) -> bool:
+        return COOKIE_PRIMARIO in request.cookies
+
+    def marcar_escritura(self, response) -> None:
+        """Mandar las próximas lecturas de este cliente al primario"""
+        if self.replica is not None:
+            response.set_cookie(COOKIE_PRIMARIO, "1", max_age=int(self.pegajoso), httponly=True, samesite="lax")
+
+    def _contar(self, atributo: str) -> None:
+        with self._lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def sesion(self, request):
+        """Sesión de lectura para este request (réplica salvo las excepciones de arriba)"""
+        if self.replica is None or self.es_pegajoso(request) or not self.breaker.permitir():
+            self._contar("lecturas_primario")
+            return self.primario()
+
+        db = self.replica()
+        try:
+            # Pedir la conexión ahora para poder caer al primario si la réplica no responde
+            db.connection()
+        except OperationalError as e:
+            db.close()
+            self.breaker.falla()
+            self._contar("fallas_replica")
+            self._contar("lecturas_primario")
+            log.warning("Réplica no disponible, leyendo del primario", extra={
+                "error": str(e.orig), "circuito": self.breaker.estado
+            })
+            return self.primario()
+        self.breaker.exito()
+        self._contar("lecturas_replica")
+        return db
+
+    def estado(self) -> dict:
+        return {
+            "replica": self.replica is not None,
+            "circuito": self.breaker.estado,
+            "pegajoso_segundos": self.pegajoso,
+            "lecturas_replica": self.lecturas_replica,
+            "lecturas_primario": self.lecturas_primario,
+            "fallas_replica": self.fallas_replica,
+        }
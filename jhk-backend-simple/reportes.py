@@ -0,0 +1,193 @@
+"""Reportes de ventas sobre la tabla `ventas_diarias` en vez de recorrer `ventas_retail`.
+
+Cada escritura de ventas suma su diferencia en la misma transacción:
+
+- `registrar_ventas` al crear una orden (crear_venta y crear_venta_multiple);
+- `mover_estado_pago` al cambiar el estado de pago (confirmar_webpay): resta
+  las líneas del estado anterior y las suma al nuevo, en el mismo día.
+
+El día es el de la compra (`fecha_compra`), así que una orden pagada al día
+siguiente sigue en el día en que se creó. Las filas se actualizan con un
+upsert en orden de clave, así dos checkouts que tocan las mismas filas las
+bloquean en el mismo orden y no hay deadlock entre ellos.
+
+`reconstruir` recalcula un rango de días desde `ventas_retail` (carga inicial
+o reparación tras editar ventas a mano).
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, DateTime, bindparam, delete, func, insert, select, text
+
+from models import VentaDiaria, VentaRetail
+
+DIMENSIONES = ("fecha", "sku", "region", "comuna", "estado_pago")
+ORDENES = ("fecha", "monto", "unidades", "lineas")
+
+# SQL escrito a mano: el insert().on_duplicate_key_update() de SQLAlchemy no entra
+# al cache de sentencias y se compilaba en cada checkout (~1 ms)
+_INSERT = (
+    "INSERT INTO ventas_diarias (fecha, sku, region, comuna, estado_pago, lineas, unidades, monto, actualizado_en) "
+    "VALUES (:fecha, :sku, :region, :comuna, :estado_pago, :lineas, :unidades, :monto, :actualizado_en) "
+)
+_TIPOS = (bindparam("fecha", type_=Date), bindparam("actualizado_en", type_=DateTime))
+UPSERT = {
+    "mysql": text(
+        _INSERT + "ON DUPLICATE KEY UPDATE lineas = lineas + VALUES(lineas), unidades = unidades + VALUES(unidades), "
+        "monto = monto + VALUES(monto), actualizado_en = VALUES(actualizado_en)"
+    ).bindparams(*_TIPOS),
+    # SQLite: benchmarks y pruebas locales
+    "sqlite": text(
+        _INSERT + "ON CONFLICT (fecha, sku, region, comuna, estado_pago) DO UPDATE SET "
+        "lineas = lineas + excluded.lineas, unidades = unidades + excluded.unidades, "
+        "monto = monto + excluded.monto, actualizado_en = excluded.actualizado_en"
+    ).bindparams(*_TIPOS),
+}
+
+
+def _clave(fecha_compra, sku, region, comuna, estado_pago) -> tuple:
+    return (fecha_compra.date(), sku or "", region or "", comuna or "", estado_pago or "pendiente")
+
+
+def _acumular(deltas: dict, clave: tuple, signo: int, unidades, precio) -> None:
+    unidades = unidades or 1
+    lineas_, unidades_, monto_ = deltas.get(clave, (0, 0, 0.0))
+    deltas[clave] = (lineas_ + signo, unidades_ + signo * unidades, monto_ + signo * (precio or 0) * unidades)
+
+
+def _sumar(db, deltas: dict) -> None:
+    """Sumar las diferencias a `ventas_diarias`, creando las filas que falten"""
+    filas = [
+        {
+            "fecha": clave[0], "sku": clave[1], "region": clave[2], "comuna": clave[3], "estado_pago": clave[4],
+            "lineas": lineas, "unidades": unidades, "monto": round(monto, 2), "actualizado_en": datetime.now(),
+        }
+        for clave, (lineas, unidades, monto) in sorted(deltas.items())
+        if lineas or unidades or monto
+    ]
+    if not filas:
+        return
+
+    db.execute(UPSERT.get(db.get_bind().dialect.name, UPSERT["mysql"]), filas)
+
+
+def registrar_ventas(db, filas: list) -> None:
+    """Sumar ventas recién creadas (dicts con las columnas de ventas_retail), sin commit"""
+    deltas = {}
+    for fila in filas:
+        clave = _clave(fila["fecha_compra"], fila.get("sku"), fila.get("region"), fila.get("comuna"),
+                       fila.get("estado_pago"))
+        _acumular(deltas, clave, 1, fila.get("unidades"), fila.get("precio"))
+    _sumar(db, deltas)
+
+
+def lineas_orden(db, numero_orden: str) -> list:
+    """Líneas de la orden con lo que necesita `mover_estado_pago`, bloqueadas hasta el commit.
+
+    Se leen antes de cambiar `estado_pago` en ventas_retail; el bloqueo hace
+    que dos confirmaciones de la misma orden no muevan las líneas dos veces.
+    """
+    return db.execute(
+        select(
+            VentaRetail.fecha_compra, VentaRetail.sku, VentaRetail.region, VentaRetail.comuna,
+            VentaRetail.estado_pago, VentaRetail.unidades, VentaRetail.precio
+        )
+        .where(VentaRetail.numero_orden == numero_orden, VentaRetail.fecha_compra.isnot(None))
+        .with_for_update()
+    ).all()
+
+
+def mover_estado_pago(db, lineas: list, estado_pago: str) -> None:
+    """Pasar las líneas (de `lineas_orden`) de su estado de pago anterior a `estado_pago`, sin commit"""
+    deltas = {}
+    for linea in lineas:
+        anterior = _clave(linea.fecha_compra, linea.sku, linea.region, linea.comuna, linea.estado_pago)
+        if anterior[4] == estado_pago:
+            continue
+        _acumular(deltas, anterior, -1, linea.unidades, linea.precio)
+        _acumular(deltas, anterior[:4] + (estado_pago,), 1, linea.unidades, linea.precio)
+    _sumar(db, deltas)
+
+
+def reconstruir(db, desde: date, hasta: date) -> int:
+    """Recalcular desde ventas_retail los días entre `desde` y `hasta` (inclusive); retorna las filas escritas"""
+    db.execute(
+        delete(VentaDiaria)
+        .where(VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta)
+        .execution_options(synchronize_session=False)
+    )
+    dia = func.date(VentaRetail.fecha_compra)
+    columnas = (
+        dia,
+        func.coalesce(VentaRetail.sku, ""),
+        func.coalesce(VentaRetail.region, ""),
+        func.coalesce(VentaRetail.comuna, ""),
+        func.coalesce(VentaRetail.estado_pago, "pendiente"),
+    )
+    unidades = func.coalesce(VentaRetail.unidades, 1)
+    resultado = db.execute(insert(VentaDiaria).from_select(
+        ["fecha", "sku", "region", "comuna", "estado_pago", "lineas", "unidades", "monto", "actualizado_en"],
+        select(
+            *columnas,
+            func.count(VentaRetail.id),
+            func.sum(unidades),
+            func.sum(func.coalesce(VentaRetail.precio, 0) * unidades),
+            func.now(),
+        )
+        .where(
+            VentaRetail.fecha_compra >= datetime.combine(desde, datetime.min.time()),
+            VentaRetail.fecha_compra < datetime.combine(hasta + timedelta(days=1), datetime.min.time()),
+        )
+        .group_by(*columnas)
+    ))
+    db.commit()
+    return resultado.rowcount
+
+
+def consultar(db, desde: date, hasta: date, agrupar: list, filtros: dict,
+              orden: str = "fecha", limite: int = 1000) -> dict:
+    """Ventas entre `desde` y `hasta` sumadas por las dimensiones de `agrupar`.
+
+    `filtros` restringe por igualdad en cualquier dimensión (p. ej. estado_pago).
+    Lanza ValueError si una dimensión u orden no existe.
+    """
+    desconocidas = [d for d in [*agrupar, *filtros] if d not in DIMENSIONES]
+    if desconocidas:
+        raise ValueError(f"Dimensiones desconocidas: {', '.join(desconocidas)} (válidas: {', '.join(DIMENSIONES)})")
+    if orden not in ORDENES:
+        raise ValueError(f"Orden desconocido: {orden} (válidos: {', '.join(ORDENES)})")
+
+    condiciones = [VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta]
+    condiciones += [getattr(VentaDiaria, dimension) == valor for dimension, valor in filtros.items()]
+    sumas = (
+        func.sum(VentaDiaria.lineas).label("lineas"),
+        func.sum(VentaDiaria.unidades).label("unidades"),
+        func.sum(VentaDiaria.monto).label("monto"),
+    )
+
+    grupos = [getattr(VentaDiaria, dimension) for dimension in agrupar]
+    consulta = (
+        select(*grupos, *sumas)
+        .where(*condiciones)
+        .group_by(*grupos)
+        # Filas que quedaron en cero tras mover sus líneas a otro estado de pago
+        .having(func.sum(VentaDiaria.lineas) != 0)
+        .limit(limite)
+    )
+    if orden == "fecha":
+        consulta = consulta.order_by(*grupos)
+    else:
+        consulta = consulta.order_by(func.sum(getattr(VentaDiaria, orden)).desc())
+
+    filas = [
+        {**{d: getattr(fila, d) for d in agrupar},
+         "lineas": int(fila.lineas), "unidades": int(fila.unidades), "monto": float(fila.monto)}
+        for fila in db.execute(consulta)
+    ]
+    if len(filas) < limite:
+        # Están todas las filas: los totales salen de ellas sin otra pasada por el rango
+        totales = {campo: sum(fila[campo] for fila in filas) for campo in ("lineas", "unidades", "monto")}
+    else:
+        suma = db.execute(select(*sumas).where(*condiciones)).one()
+        totales = {"lineas": int(suma.lineas or 0), "unidades": int(suma.unidades or 0), "monto": float(suma.monto or 0)}
+    totales["monto"] = round(totales["monto"], 2)
+    return {"desde": desde, "hasta": hasta, "agrupar": agrupar, "totales": totales, "filas": filas}
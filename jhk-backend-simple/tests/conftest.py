@@ -0,0 +1,55 @@
+"""Las pruebas corren contra un SQLite temporal: se enlaza antes de importar main"""
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import models
+
+_ARCHIVO = os.path.join(tempfile.mkdtemp(prefix="jhk_pruebas_"), "pruebas.db")
+engine = create_engine(f"sqlite:///{_ARCHIVO}", connect_args={"check_same_thread": False})
+models.engine = engine
+models.SessionLocal.configure(bind=engine)
+models.ReplicaSessionLocal.configure(bind=engine)
+models.async_engine = create_async_engine(f"sqlite+aiosqlite:///{_ARCHIVO}")
+models.AsyncSessionLocal.configure(bind=models.async_engine)
+
+
+@pytest.fixture
+def db():
+    """Esquema vacío para cada prueba"""
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    sesion = models.SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def app(db):
+    """main con los caches del catálogo vacíos"""
+    import main
+
+    for cache in (main.cache_listados, main.cache_productos, main.cache_totales, main.cache_ordenes):
+        cache.invalidate()
+    return main
+
+
+def _producto(id_, **campos):
+    valores = {
+        "sku": f"SKU{id_}", "nombre": f"Sofá {id_}", "precio_venta": 1000.0 * id_, "tipo_producto": "sofas",
+        "descripcion_producto": "desc", "tipo_producto_venta": "local", "visitas": 0, "material": "tela",
+        "tiempo_entrega": "5 días",
+    }
+    valores.update(campos)
+    return models.Producto(id=id_, **valores)
+
+
+@pytest.fixture
+def producto():
+    """Fábrica de productos locales con valores por defecto"""
+    return _producto
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+import busqueda
+from busqueda import IndiceBusqueda
+
+
+def _producto(id_, nombre, tipo="sofas", material="tela", descripcion="", visitas=0, precio=1000.0,
+              descuento=None, venta="local"):
+    return SimpleNamespace(
+        id=id_, nombre=nombre, sku=f"SKU{id_}", tipo_producto=tipo, material=material,
+        descripcion_producto=descripcion, visitas=visitas, precio_venta=precio, precio_descuento=descuento,
+        tipo_producto_venta=venta,
+    )
+
+
+@pytest.fixture
+def productos():
+    return {p.id: p for p in [
+        _producto(1, "Sofá Milano 3 cuerpos", descripcion="Sofá de tela gris", visitas=40, precio=300000.0),
+        _producto(2, "Sofás modulares Roma", descripcion="Sofá esquinero", visitas=5, precio=450000.0),
+        _producto(3, "Mesa de centro Nórdica", tipo="mesas", material="madera", visitas=12, precio=80000.0),
+        _producto(4, "Mesa comedor Roble", tipo="mesas", material="roble", visitas=12, precio=80000.0),
+        _producto(5, "Cama americana", tipo="camas", visitas=0, precio=200000.0, descuento=150000.0),
+        _producto(6, "Sitial Milano", tipo="sitiales", material="cuero", visitas=7, precio=120000.0),
+    ]}
+
+
+def _estructuras(indice):
+    """Estado interno comparable; el orden entre precios iguales no importa"""
+    return {
+        "postings": indice._postings,
+        "productos": indice._productos,
+        "terminos_producto": {i: set(t) for i, t in indice._terminos_producto.items()},
+        "por_tipo": {tipo: ids for tipo, ids in indice._por_tipo.items() if ids},
+        "precios": sorted(zip(indice._precios, indice._ids_por_precio)),
+        "vocabulario": indice._vocabulario,
+    }
+
+
+def _revisar(indice, productos):
+    nuevo = IndiceBusqueda()
+    nuevo.cargar(productos.values())
+    assert _estructuras(indice) == _estructuras(nuevo)
+    assert indice._precios == sorted(indice._precios)
+    assert indice._vocabulario == sorted(indice._postings)
+    # Las listas ordenadas que se mantienen al reindexar siguen en el orden de una recién armada
+    for termino, lista in indice._ordenados.items():
+        assert lista == sorted(indice._postings[termino], key=indice._clave_orden(termino)), termino
+    # Las formas de un término que sigue existiendo no se limpian (solo agregan candidatos
+    # de tipeo que igual calzan con un término del índice); el resto debe quedar igual
+    for termino, formas in nuevo._formas.items():
+        assert formas <= indice._formas[termino]
+    assert set(indice._formas) == set(nuevo._formas)
+    for variante, palabras in nuevo._variantes.items():
+        assert palabras <= indice._variantes[variante]
+    for consulta in ("sofa", "mesa", "milano", "sofaz", "rom", "tela gris", "roble", "cama", "sitial"):
+        for tipo, precio_min, precio_max in ((None, None, None), ("mesas", None, None), (None, 100000.0, 400000.0)):
+            esperado = nuevo.buscar(consulta, limite=10, tipo=tipo, precio_min=precio_min, precio_max=precio_max)
+            assert indice.buscar(consulta, limite=10, tipo=tipo, precio_min=precio_min,
+                                 precio_max=precio_max) == esperado, consulta
+
+
+@pytest.fixture
+def indice(productos, monkeypatch):
+    # Todas las listas ordenadas armadas desde la carga, para que se ejerciten al reindexar
+    monkeypatch.setattr(busqueda, "PREORDENAR_DESDE", 1)
+    indice = IndiceBusqueda()
+    indice.cargar(productos.values())
+    return indice
+
+
+def test_actualizar_igual_a_cargar_de_nuevo(indice, productos):
+    cambios = [
+        _producto(1, "Sofá Milano 2 cuerpos", descripcion="Sofá de lino", visitas=40, precio=280000.0),
+        _producto(2, "Sofás modulares Roma", descripcion="Sofá esquinero", visitas=500, precio=450000.0),
+        _producto(3, "Mesa de centro Nórdica", tipo="mesas", material="madera", visitas=12, precio=80000.0,
+                  descuento=60000.0),
+        _producto(5, "Cama americana", tipo="camas", visitas=0, precio=200000.0, venta="online"),
+        _producto(6, "Poltrona Milano", tipo="sillones", material="cuero", visitas=7, precio=120000.0),
+        _producto(7, "Sofá cama Roma", descripcion="Futón", visitas=1, precio=80000.0),
+    ]
+    for producto in cambios:
+        indice.actualizar(producto)
+        if producto.tipo_producto_venta == "local":
+            productos[producto.id] = producto
+        else:
+            del productos[producto.id]
+        _revisar(indice, productos)
+
+
+def test_eliminar_igual_a_cargar_de_nuevo(indice, productos):
+    for producto_id in (4, 2, 99, 1):
+        indice.eliminar(producto_id)
+        productos.pop(producto_id, None)
+        _revisar(indice, productos)
+    # Sin productos que los usen, los términos desaparecen del vocabulario y de las variantes
+    assert "roble" not in indice._postings and "roble" not in indice._variantes
+    assert indice.buscar("roma") == ([], 0)
+
+
+def test_reindexar_sin_cambios_no_duplica(indice, productos):
+    antes = _estructuras(indice)
+    for producto in productos.values():
+        indice.actualizar(producto)
+    assert _estructuras(indice) == antes
+    assert all(len(lista) == len(set(lista)) for lista in indice._ordenados.values())
@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import models
+
+
+@pytest.fixture
+def cliente(app, db, producto):
+    # Claves repetidas y nulas en cada orden, para los desempates por id y la posición de los NULL
+    db.add_all([
+        producto(1, nombre="Mesa", precio_venta=5000.0, visitas=10),
+        producto(2, nombre=None, precio_venta=None, visitas=None),
+        producto(3, nombre="Arrimo", precio_venta=5000.0, precio_descuento=3000.0, visitas=10),
+        producto(4, nombre="Mesa", precio_venta=None, visitas=None),
+        producto(5, nombre="Cama", precio_venta=2000.0, precio_descuento=0.0, visitas=3),
+        producto(6, nombre=None, precio_venta=2000.0, visitas=10),
+        producto(7, nombre="Sofá", precio_venta=9000.0, precio_descuento=1000.0, visitas=0),
+        producto(8, nombre="Silla", precio_venta=1.0, tipo_producto_venta="online"),
+    ])
+    db.commit()
+    # El ORM reemplaza el None por el default de la columna
+    db.execute(update(models.Producto).where(models.Producto.id.in_([2, 4])).values(visitas=None))
+    db.commit()
+    return TestClient(app.app)
+
+
+def test_cursor_ida_y_vuelta(app):
+    valores = [None, 10, 2.5, "Mesa ñandú", 7]
+    assert app.decodificar_cursor(app.codificar_cursor(valores), len(valores)) == valores
+    for invalido in ("no-es-base64!", app.codificar_cursor([1, 2])):
+        with pytest.raises(HTTPException) as error:
+            app.decodificar_cursor(invalido, 3)
+        assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("orden", [None, "relevancia", "precio_asc", "precio_desc", "nombre_asc", "visitas_desc"])
+def test_paginas_por_cursor_igual_a_una_sola_consulta(cliente, orden):
+    parametros = {"orden": orden} if orden else {}
+    completo = [p["id"] for p in cliente.get("/productos", params={**parametros, "limit": 100}).json()]
+    assert sorted(completo) == [1, 2, 3, 4, 5, 6, 7]
+
+    paginado, cursor = [], None
+    while True:
+        pagina = cliente.get("/productos/pagina", params={**parametros, "limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        assert pagina["total"] == 7
+        paginado += [p["id"] for p in pagina["productos"]]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            break
+    # Sin orden el listado no trae ORDER BY; el paginado ordena por id
+    assert paginado == (completo if orden else sorted(completo))
+
+
+def test_orden_de_los_nulos(cliente):
+    # Como en MySQL: NULL primero en ascendente y al final en descendente
+    ids = lambda orden: [p["id"] for p in cliente.get("/productos", params={"orden": orden}).json()]
+    assert ids("nombre_asc")[:2] == [2, 6]
+    assert ids("precio_asc")[:2] == [2, 4]
+    assert ids("precio_desc")[-2:] == [2, 4]
+    assert ids("visitas_desc")[-2:] == [2, 4]
+
+
+def test_cursor_invalido(cliente):
+    assert cliente.get("/productos/pagina", params={"cursor": "xyz", "orden": "precio_asc"}).status_code == 400
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import pytest
+
+from entregas import CalendarioEntregas, domingo_de_pascua, feriados_chile, parsear_tiempo_entrega
+
+
+@pytest.mark.parametrize("anio, pascua", [(2023, date(2023, 4, 9)), (2024, date(2024, 3, 31)),
+                                          (2025, date(2025, 4, 20)), (2026, date(2026, 4, 5))])
+def test_domingo_de_pascua(anio, pascua):
+    assert domingo_de_pascua(anio) == pascua
+
+
+def test_feriados_2025():
+    feriados = feriados_chile(2025)
+    assert set(feriados) == {
+        date(2025, 1, 1), date(2025, 4, 18), date(2025, 4, 19), date(2025, 5, 1), date(2025, 5, 21),
+        date(2025, 6, 20), date(2025, 6, 29), date(2025, 7, 16), date(2025, 8, 15), date(2025, 9, 18),
+        date(2025, 9, 19), date(2025, 10, 12), date(2025, 10, 31), date(2025, 11, 1), date(2025, 12, 8),
+        date(2025, 12, 25),
+    }
+
+
+def test_traslados_a_lunes():
+    # 2023: San Pedro y San Pablo (jueves 29/6) y Encuentro de Dos Mundos (jueves 12/10) pasan al lunes anterior
+    feriados = feriados_chile(2023)
+    assert date(2023, 6, 26) in feriados and date(2023, 6, 29) not in feriados
+    assert date(2023, 10, 9) in feriados and date(2023, 10, 12) not in feriados
+    # 2026: 29/6 y 12/10 caen lunes y se quedan
+    assert {date(2026, 6, 29), date(2026, 10, 12)} <= set(feriados_chile(2026))
+
+
+def test_fiestas_patrias_adicionales():
+    assert feriados_chile(2018)[date(2018, 9, 17)] == "Fiestas Patrias"  # 18 en martes
+    assert feriados_chile(2019)[date(2019, 9, 20)] == "Fiestas Patrias"  # 19 en jueves
+    assert date(2025, 9, 17) not in feriados_chile(2025)
+
+
+def test_iglesias_evangelicas():
+    assert "Iglesias" in feriados_chile(2023)[date(2023, 10, 27)]  # martes 31 -> viernes anterior
+    assert "Iglesias" in feriados_chile(2029)[date(2029, 11, 2)]  # miércoles 31 -> viernes siguiente
+    assert "Iglesias" in feriados_chile(2025)[date(2025, 10, 31)]
+
+
+def test_sumar_dias_habiles_salta_fines_de_semana_y_feriados():
+    calendario = CalendarioEntregas()
+    assert calendario.sumar_dias_habiles(date(2025, 9, 12), 3) == date(2025, 9, 17)
+    # Miércoles 17/9: jueves 18 y viernes 19 feriados, luego fin de semana
+    assert calendario.sumar_dias_habiles(date(2025, 9, 17), 1) == date(2025, 9, 22)
+    # Fuera de la ventana precalculada se recalcula
+    assert calendario.sumar_dias_habiles(date(2040, 12, 24), 1) == date(2040, 12, 26)
+
+
+def test_feriados_extra_y_plazos():
+    calendario = CalendarioEntregas()
+    calendario.cargar([(date(2025, 9, 22), "Extraordinario")], [("Aysén", "", 10), ("RM", "Santiago", 2)])
+    assert calendario.sumar_dias_habiles(date(2025, 9, 17), 1) == date(2025, 9, 23)
+    assert calendario.dias_entrega("aysén", "Coyhaique") == 10
+    assert calendario.dias_entrega("RM", "Santiago", "7-10 días") == 10
+    assert calendario.dias_entrega("RM", "Santiago") == 2
+    assert calendario.dias_entrega("Valparaíso", "Viña") == 3
+    entrega = calendario.fecha_entrega(datetime(2025, 9, 12, 15, 30), "RM", "Santiago")
+    assert entrega == datetime(2025, 9, 16, 15, 30)
+
+
+@pytest.mark.parametrize("texto, dias", [("5 días", 5), ("7-10 días hábiles", 10), ("2 semanas", 10),
+                                         ("inmediato", None), (None, None)])
+def test_parsear_tiempo_entrega(texto, dias):
+    assert parsear_tiempo_entrega(texto) == dias
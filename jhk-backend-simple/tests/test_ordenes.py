@@ -0,0 +1,54 @@
+import pytest
+
+import ordenes
+from ordenes import BITS_SECUENCIA, MAX_SECUENCIA, GeneradorIds, formatear
+
+
+class RelojFalso:
+    """Reemplaza time.time/time.sleep del módulo: el reloj solo avanza al dormir"""
+
+    def __init__(self, ms: int):
+        self.ms = ms
+
+    def time(self):
+        return self.ms / 1000
+
+    def sleep(self, segundos):
+        self.ms += 1
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso(ordenes.EPOCA_MS + 10_000)
+    monkeypatch.setattr(ordenes.time, "time", reloj.time)
+    monkeypatch.setattr(ordenes.time, "sleep", reloj.sleep)
+    return reloj
+
+
+def test_crecientes_al_agotar_la_secuencia(reloj):
+    generador = GeneradorIds(worker_id=3)
+    ids = [generador.siguiente() for _ in range(3 * (MAX_SECUENCIA + 1) + 10)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    # Al agotar la secuencia espera al milisegundo siguiente en vez de repetir
+    assert reloj.ms == ordenes.EPOCA_MS + 10_003
+    assert all((i >> BITS_SECUENCIA) & ((1 << ordenes.BITS_WORKER) - 1) == 3 for i in ids)
+
+
+def test_crecientes_si_el_reloj_retrocede(reloj):
+    generador = GeneradorIds(worker_id=0)
+    primero = generador.siguiente()
+    reloj.ms -= 5000
+    assert generador.siguiente() > primero
+
+
+def test_worker_id_fuera_de_rango():
+    with pytest.raises(ValueError):
+        GeneradorIds(worker_id=ordenes.MAX_WORKER + 1).siguiente()
+
+
+def test_formato_de_ancho_fijo():
+    # Como texto (VARCHAR) deben ordenar igual que como número, también al pasar de 18 a 19 dígitos
+    numeros = [10 ** 17 - 1, 10 ** 17, 10 ** 18 - 1, 10 ** 18, (1 << 63) - 1]
+    textos = [formatear(n) for n in numeros]
+    assert {len(t) for t in textos} == {ordenes.DIGITOS}
+    assert sorted(textos) == textos
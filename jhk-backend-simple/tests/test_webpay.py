@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import models
+
+
+@pytest.fixture
+def orden(app, db, producto):
+    """Orden con dos líneas (una con stock controlado) y su transacción iniciada"""
+    db.add_all([producto(1, stock=5, stock_reservado=0), producto(2)])
+    db.commit()
+    cliente = TestClient(app.app)
+    venta = cliente.post("/ventas/multiple", json={
+        "cliente_final": "Ana Pérez", "rut_documento": "11.111.111-1", "email": "ana@example.cl",
+        "telefono": "+56911111111", "comuna": "Ñuñoa", "direccion": "Irarrázaval 1000",
+        "region": "Metropolitana",
+        "productos": [{"producto_id": 1, "cantidad": 2}, {"producto_id": 2, "cantidad": 1}],
+    })
+    assert venta.status_code == 200
+    numero_orden = venta.json()["numero_orden"]
+    db.add(models.TransaccionesWebpay(numero_orden=numero_orden, token="tok-1", monto=4000, estado="iniciada"))
+    db.commit()
+    return cliente, numero_orden
+
+
+def efectos(db, numero_orden):
+    """Lo que el pago escribe: debe quedar igual después de confirmar una o varias veces"""
+    db.expire_all()
+    return {
+        "stock": db.execute(select(models.Producto.stock, models.Producto.stock_reservado)
+                            .where(models.Producto.id == 1)).one()._tuple(),
+        "ventas": sorted(db.execute(select(models.VentaRetail.estado_pago, models.VentaRetail.codigo_autorizacion)
+                                    .where(models.VentaRetail.numero_orden == numero_orden)).all()),
+        "trabajos": sorted(db.execute(select(models.Trabajo.tipo)).scalars()),
+        "reporte": sorted(db.execute(select(models.VentaDiaria.estado_pago, func.sum(models.VentaDiaria.lineas),
+                                            func.sum(models.VentaDiaria.unidades))
+                                     .group_by(models.VentaDiaria.estado_pago)).all()),
+    }
+
+
+def test_confirmar_dos_veces(orden, db):
+    cliente, numero_orden = orden
+    primera = cliente.post("/webpay/confirmar", params={"token": "tok-1"})
+    assert primera.status_code == 200
+    codigo = primera.json()["codigo_autorizacion"]
+    despues = efectos(db, numero_orden)
+    assert despues["stock"] == (3, 0)
+    assert despues["ventas"] == [("pagada", codigo), ("pagada", codigo)]
+    assert despues["trabajos"] == ["correo_confirmacion"]
+    assert despues["reporte"] == [("pagada", 2, 3), ("pendiente", 0, 0)]
+
+    segunda = cliente.get("/webpay/confirmar", params={"token": "tok-1"})
+    assert segunda.status_code == 200
+    assert segunda.json()["codigo_autorizacion"] == codigo
+    assert efectos(db, numero_orden) == despues
+
+
+def test_confirmaciones_simultaneas(orden, db, app):
+    _, numero_orden = orden
+
+    async def confirmar_varias():
+        transporte = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://prueba") as cliente:
+            return await asyncio.gather(*[
+                cliente.post("/webpay/confirmar", params={"token": "tok-1"}) for _ in range(4)
+            ])
+
+    respuestas = asyncio.run(confirmar_varias())
+    assert [r.status_code for r in respuestas] == [200] * 4
+    assert len({r.json()["codigo_autorizacion"] for r in respuestas}) == 1
+    despues = efectos(db, numero_orden)
+    assert despues["stock"] == (3, 0)
+    assert despues["trabajos"] == ["correo_confirmacion"]
+    assert despues["reporte"] == [("pagada", 2, 3), ("pendiente", 0, 0)]
+
+
+def test_token_desconocido(orden):
+    cliente, _ = orden
+    assert cliente.post("/webpay/confirmar", params={"token": "no-existe"}).status_code == 404
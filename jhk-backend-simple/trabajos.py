@@ -0,0 +1,302 @@
+"""Cola de trabajos en la tabla `trabajos` para lo que no tiene que pasar dentro del request.
+
+El request encola con `encolar(db, ...)` en su propia transacción (si hace
+rollback, el trabajo tampoco queda) y los workers lo ejecutan después:
+
+- cada trabajo se toma con un UPDATE condicional, así dos workers nunca
+  ejecutan el mismo; la toma vence a los `toma_segundos` y si el worker
+  murió, otro lo retoma;
+- si el manejador lanza una excepción se reintenta con backoff exponencial
+  hasta `max_intentos`, y después queda en estado `muerto` (cola de muertos)
+  para revisarlo y reintentarlo a mano desde /admin/trabajos.
+
+La entrega es al menos una vez: los manejadores deben tolerar ejecutarse dos
+veces para el mismo payload.
+
+Uso (worker aparte de la API; con TRABAJOS_HILOS=0 la API solo encola):
+    python trabajos.py --hilos 4
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+
+from models import SessionLocal, Trabajo
+
+log = logging.getLogger("jhk.trabajos")
+
+# tipo -> función(payload: dict); se registran con manejador() (ver postventa.registrar)
+MANEJADORES = {}
+
+
+def manejador(tipo: str):
+    def registrar(funcion):
+        MANEJADORES[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(db, tipo: str, payload: dict, max_intentos: int = 5, retraso: float = 0.0) -> None:
+    """Agregar un trabajo dentro de la transacción de `db`, sin commit"""
+    db.execute(insert(Trabajo).values(
+        tipo=tipo,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        estado="pendiente",
+        intentos=0,
+        max_intentos=max_intentos,
+        disponible_en=datetime.now() + timedelta(seconds=retraso),
+    ))
+
+
+def espera_reintento(intentos: int, base: float = 5.0, maximo: float = 3600.0) -> float:
+    """Backoff exponencial con jitter: ~5 s, 10 s, 20 s, ... hasta una hora"""
+    return min(base * 2 ** (intentos - 1), maximo) * random.uniform(0.8, 1.2)
+
+
+def tomar(db, worker: str, lote: int = 10, toma_segundos: float = 300.0) -> list:
+    """Reservar para `worker` hasta `lote` trabajos disponibles (pendientes o con la toma vencida)"""
+    ahora = datetime.now()
+    candidatos = db.execute(
+        select(Trabajo.id, Trabajo.estado, Trabajo.intentos)
+        .where(Trabajo.estado.in_(("pendiente", "en_proceso")), Trabajo.disponible_en <= ahora)
+        .order_by(Trabajo.disponible_en)
+        .limit(lote)
+    ).all()
+    db.commit()
+
+    tomados = []
+    for candidato in candidatos:
+        # Cada toma suma un intento: si otro worker lo tomó primero, `intentos` ya no calza
+        resultado = db.execute(
+            update(Trabajo)
+            .where(
+                Trabajo.id == candidato.id,
+                Trabajo.estado == candidato.estado,
+                Trabajo.intentos == candidato.intentos,
+            )
+            .values(
+                estado="en_proceso",
+                intentos=Trabajo.intentos + 1,
+                tomado_por=worker,
+                disponible_en=ahora + timedelta(seconds=toma_segundos),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if resultado.rowcount == 1:
+            tomados.append(candidato.id)
+
+    if not tomados:
+        return []
+    return db.execute(
+        select(Trabajo.id, Trabajo.tipo, Trabajo.payload, Trabajo.intentos, Trabajo.max_intentos)
+        .where(Trabajo.id.in_(tomados))
+        .order_by(Trabajo.id)
+    ).all()
+
+
+def _terminar(db, trabajo, **valores) -> bool:
+    """Guardar el resultado si el trabajo sigue tomado por este intento (no lo retomó otro worker)"""
+    resultado = db.execute(
+        update(Trabajo)
+        .where(Trabajo.id == trabajo.id, Trabajo.estado == "en_proceso", Trabajo.intentos == trabajo.intentos)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount == 1
+
+
+def ejecutar(db, trabajo) -> str:
+    """Correr un trabajo tomado; retorna 'completado', 'reintento' o 'muerto'"""
+    inicio = time.perf_counter()
+    datos = {"trabajo_id": trabajo.id, "tipo": trabajo.tipo, "intento": trabajo.intentos}
+    try:
+        funcion = MANEJADORES.get(trabajo.tipo)
+        if funcion is None:
+            raise LookupError(f"Sin manejador para el tipo '{trabajo.tipo}'")
+        if trabajo.intentos > trabajo.max_intentos:
+            raise RuntimeError("La toma anterior venció sin terminar y no quedan intentos")
+        funcion(json.loads(trabajo.payload))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if trabajo.intentos >= trabajo.max_intentos:
+            _terminar(db, trabajo, estado="muerto", ultimo_error=error, terminado_en=datetime.now())
+            log.error("Trabajo enviado a la cola de muertos", exc_info=True, extra={**datos, "error": error})
+            return "muerto"
+        espera = espera_reintento(trabajo.intentos)
+        _terminar(db, trabajo, estado="pendiente", ultimo_error=error,
+                  disponible_en=datetime.now() + timedelta(seconds=espera))
+        log.warning("Trabajo falló, se reintentará", extra={**datos, "error": error, "espera_s": round(espera, 1)})
+        return "reintento"
+
+    _terminar(db, trabajo, estado="completado", ultimo_error=None, terminado_en=datetime.now())
+    log.info("Trabajo completado", extra={**datos, "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1)})
+    return "completado"
+
+
+def resumen(db) -> dict:
+    """Cantidad de trabajos por estado y tipo"""
+    conteo = {}
+    for estado, tipo, cantidad in db.execute(
+        select(Trabajo.estado, Trabajo.tipo, func.count(Trabajo.id)).group_by(Trabajo.estado, Trabajo.tipo)
+    ):
+        conteo.setdefault(estado, {})[tipo] = cantidad
+    return conteo
+
+
+def muertos(db, limite: int = 50) -> list:
+    filas = db.execute(
+        select(Trabajo.id, Trabajo.tipo, Trabajo.payload, Trabajo.intentos, Trabajo.ultimo_error, Trabajo.terminado_en)
+        .where(Trabajo.estado == "muerto")
+        .order_by(Trabajo.id.desc())
+        .limit(limite)
+    ).all()
+    return [{**fila._asdict(), "payload": json.loads(fila.payload)} for fila in filas]
+
+
+def reintentar(db, trabajo_id: int) -> bool:
+    """Devolver un trabajo muerto a la cola con sus intentos en cero"""
+    resultado = db.execute(
+        update(Trabajo)
+        .where(Trabajo.id == trabajo_id, Trabajo.estado == "muerto")
+        .values(estado="pendiente", intentos=0, disponible_en=datetime.now(), terminado_en=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount == 1
+
+
+def limpiar_completados(dias: float) -> int:
+    """Borrar los completados hace más de `dias` días (los muertos se quedan)"""
+    db = SessionLocal()
+    try:
+        resultado = db.execute(
+            delete(Trabajo)
+            .where(Trabajo.estado == "completado", Trabajo.terminado_en < datetime.now() - timedelta(days=dias))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return resultado.rowcount
+    finally:
+        db.close()
+
+
+class ProcesadorTrabajos:
+    """Hilos que toman y ejecutan trabajos de la cola.
+
+    Sin trabajos disponibles cada hilo espera `intervalo` segundos o hasta que
+    `avisar()` lo despierte (la API avisa después de encolar). Cada hora borra
+    los completados con más de `retencion_dias`.
+    """
+
+    def __init__(self, hilos: int = 1, intervalo: float = 2.0, lote: int = 10,
+                 toma_segundos: float = 300.0, retencion_dias: float = 7.0):
+        self.hilos = hilos
+        self.intervalo = intervalo
+        self.lote = lote
+        self.toma_segundos = toma_segundos
+        self.retencion_dias = retencion_dias
+        self.worker = None
+        self._detener = threading.Event()
+        self._aviso = threading.Event()
+        self._hilos = []
+        self._lock = threading.Lock()
+        self._ultima_limpieza = time.monotonic()
+        self.resultados = {"completado": 0, "reintento": 0, "muerto": 0}
+
+    def avisar(self) -> None:
+        self._aviso.set()
+
+    def procesar(self) -> int:
+        """Una pasada: tomar un lote y ejecutarlo; retorna cuántos trabajos se tomaron"""
+        db = SessionLocal()
+        try:
+            trabajos = tomar(db, self.worker, self.lote, self.toma_segundos)
+            for trabajo in trabajos:
+                resultado = ejecutar(db, trabajo)
+                with self._lock:
+                    self.resultados[resultado] += 1
+            return len(trabajos)
+        finally:
+            db.close()
+
+    def _limpiar_si_toca(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._ultima_limpieza < 3600:
+                return
+            self._ultima_limpieza = time.monotonic()
+        borrados = limpiar_completados(self.retencion_dias)
+        if borrados:
+            log.info("Trabajos completados borrados", extra={"trabajos": borrados})
+
+    def _loop(self) -> None:
+        while not self._detener.is_set():
+            try:
+                tomados = self.procesar()
+                self._limpiar_si_toca()
+            except Exception:
+                log.exception("Error procesando trabajos")
+                tomados = 0
+            if not tomados:
+                self._aviso.wait(self.intervalo)
+                self._aviso.clear()
+
+    def iniciar(self) -> None:
+        if self._hilos or self.hilos <= 0:
+            return
+        # Aquí y no en __init__: con gunicorn --preload el objeto se crea antes del fork
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._detener.clear()
+        for n in range(self.hilos):
+            hilo = threading.Thread(target=self._loop, name=f"trabajos-{n}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._aviso.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {"hilos": len(self._hilos), "intervalo": self.intervalo, **self.resultados}
+
+
+if __name__ == "__main__":
+    from logger import configurar_logging, detener_logging
+    # Por nombre: postventa registra sus manejadores en el módulo `trabajos`, no en __main__
+    import trabajos
+    import postventa
+
+    postventa.registrar()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hilos", type=int, default=2)
+    parser.add_argument("--intervalo", type=float, default=float(os.getenv("TRABAJOS_INTERVALO", "2")))
+    args = parser.parse_args()
+
+    configurar_logging()
+    procesador = trabajos.ProcesadorTrabajos(hilos=args.hilos, intervalo=args.intervalo)
+    detenido = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detenido.set())
+    procesador.iniciar()
+    log.info("Worker de trabajos iniciado", extra={"worker": procesador.worker, "hilos": args.hilos})
+    try:
+        detenido.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        procesador.detener()
+        log.info("Worker de trabajos detenido", extra=procesador.estado())
+        detener_logging()
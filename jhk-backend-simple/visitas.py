@@ -0,0 +1,96 @@
+import logging
+import threading
+from collections import Counter
+
+from sqlalchemy import update, bindparam, func
+
+from models import SessionLocal, Producto
+
+log = logging.getLogger("jhk.visitas")
+
+
+class ContadorVisitas:
+    """Acumula visitas de productos en memoria y las escribe en lote.
+
+    Cada flush ejecuta un único `UPDATE productos SET visitas = visitas + n`
+    por producto dentro de una transacción, sin leer el valor anterior.
+    """
+
+    def __init__(self, intervalo: float = 30.0):
+        self.intervalo = intervalo
+        self._pendientes = Counter()
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.flushes = 0
+        self.visitas_escritas = 0
+
+    def registrar(self, producto_id: int, n: int = 1) -> None:
+        with self._lock:
+            self._pendientes[producto_id] += n
+
+    def pendientes(self) -> dict:
+        with self._lock:
+            return {
+                "visitas_pendientes": sum(self._pendientes.values()),
+                "productos_pendientes": len(self._pendientes),
+                "intervalo": self.intervalo,
+                "flushes": self.flushes,
+                "visitas_escritas": self.visitas_escritas,
+            }
+
+    def flush(self) -> int:
+        """Escribir las visitas acumuladas; devuelve cuántas se escribieron"""
+        with self._lock:
+            lote, self._pendientes = self._pendientes, Counter()
+        if not lote:
+            return 0
+
+        tabla = Producto.__table__
+        stmt = (
+            update(tabla)
+            .where(tabla.c.id == bindparam("b_id"))
+            .values(visitas=func.coalesce(tabla.c.visitas, 0) + bindparam("b_n"),
+                    # Sin mover la marca del índice de búsqueda (ver inventario._SIN_MARCA)
+                    actualizado_en=tabla.c.actualizado_en)
+        )
+        db = SessionLocal()
+        try:
+            db.execute(stmt, [{"b_id": pid, "b_n": n} for pid, n in lote.items()])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Devolver el lote al contador para reintentar en el próximo flush
+            with self._lock:
+                self._pendientes.update(lote)
+            raise
+        finally:
+            db.close()
+
+        total = sum(lote.values())
+        with self._lock:
+            self.flushes += 1
+            self.visitas_escritas += total
+        return total
+
+    def _loop(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Error escribiendo visitas")
+
+    def iniciar(self) -> None:
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="flush-visitas", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> None:
+        """Detener el hilo y escribir lo que quede pendiente"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self.flush()
+